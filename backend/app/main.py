@@ -3,6 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from app.routers import incidents, sources, auth, dashboard, analytics
 from app.utils.websocket_manager import WebSocketManager
+from app.utils.cache import dashboard_cache
+from app.utils.event_bus import INCIDENT_EVENTS, EventType, event_bus
+from app.services.dashboard_service import invalidate_dashboard_snapshot
+from scrapers.http_client import http_client
+from scrapers.scheduler import SCHEDULER_ENABLED, scrape_scheduler
+from scrapers.job_queue import API_WORKERS, SCRAPE_EMBEDDED_WORKER, scrape_job_queue
+from scrapers.fingerprint_index import fingerprint_index
+from scrapers.parsing import parse_pool
+from app.utils.near_duplicates import near_duplicate_index
+from scrapers.worker import ScrapeWorker
+from ml.threat_classifier import ML_WARMUP_ON_STARTUP, threat_classifier
 import structlog
 
 logger = structlog.get_logger()
@@ -26,6 +37,8 @@ app.add_middleware(
 
 # WebSocket manager
 websocket_manager = WebSocketManager()
+# Jobs on the shared queue are worked in this process too unless dedicated scrape workers take them
+embedded_worker = ScrapeWorker(scrape_job_queue) if scrape_job_queue and SCRAPE_EMBEDDED_WORKER else None
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
@@ -54,6 +67,36 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "Indian Cyber Threat Intelligence Platform"}
 
+@app.get("/api/health/ready")
+async def readiness_check():
+    # No API request uses the threat classifier (only ingest does, with heuristics until it loads),
+    # so its warm-up is reported here without taking the process out of rotation
+    return {
+        "ready": True,
+        "components": {
+            "ml_models": {"status": threat_classifier.status, "error": threat_classifier.warm_up_error}
+        }
+    }
+
+@app.get("/api/health/scrapers")
+async def scraper_health():
+    return {
+        "http_pool": http_client.get_stats(),
+        "dashboard_cache": dashboard_cache.get_stats(),
+        "event_bus": event_bus.get_stats(),
+        "fingerprint_index": fingerprint_index.get_stats(),
+        "near_duplicate_index": near_duplicate_index.get_stats(),
+        "scheduler": scrape_scheduler.get_stats(),
+        "job_queue": await scrape_job_queue.get_stats() if scrape_job_queue else None,
+        "embedded_worker": embedded_worker.get_stats() if embedded_worker else None,
+        "ingest_pipeline": (embedded_worker or scrape_scheduler).orchestrator.pipeline.get_stats(),
+        "parse_pool": parse_pool.get_stats()
+    }
+
+@app.get("/api/health/websockets")
+async def websocket_health():
+    return websocket_manager.get_stats()
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket_manager.connect(websocket)
@@ -62,6 +105,8 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             await websocket_manager.send_personal_message(f"Echo: {data}", websocket)
     except WebSocketDisconnect:
+        pass
+    finally:
         websocket_manager.disconnect(websocket)
 
 @app.websocket("/ws/incidents")
@@ -69,19 +114,53 @@ async def websocket_incidents(websocket: WebSocket):
     await websocket_manager.connect(websocket)
     try:
         while True:
-            # Keep connection alive and send real-time incident updates
-            await websocket.receive_text()
+            # Clients narrow the alerts they receive with subscribe messages
+            message = await websocket.receive_text()
+            await websocket_manager.handle_client_message(websocket, message)
     except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        # e.g. a resume while the backplane is down; the client reconnects and resumes again
+        logger.error(f"Error handling WebSocket client message: {e}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
         websocket_manager.disconnect(websocket)
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting Indian Cyber Threat Intelligence Platform")
-    # Initialize any startup tasks here
-    pass
+    await websocket_manager.start()
+    # Ingest and CRUD events reach clients and caches in batches
+    event_bus.subscribe(INCIDENT_EVENTS, invalidate_dashboard_snapshot)
+    event_bus.subscribe(INCIDENT_EVENTS + (EventType.source_scraped,), websocket_manager.handle_events)
+    event_bus.subscribe((EventType.incident_deleted,), near_duplicate_index.handle_events)
+    if scrape_job_queue is None and SCHEDULER_ENABLED:
+        if API_WORKERS > 1:
+            logger.warning("SCRAPE_JOB_BACKEND=scheduler with several API processes: manual scrapes and "
+                           "job lookups only work in the elected one; use postgres to share jobs")
+        # Starts scheduling once this process is elected; standby processes may take over later
+        await scrape_scheduler.start()
+    if embedded_worker:
+        await embedded_worker.start()
+    # Only processes that ingest, or may take over ingest, need the dedup index
+    if (scrape_job_queue is None and SCHEDULER_ENABLED) or embedded_worker:
+        fingerprint_index.start_warm_up()
+        event_bus.subscribe((EventType.incident_deleted,), fingerprint_index.handle_events)
+    # Warm the ML models off the event loop; health and CRUD are served meanwhile
+    if ML_WARMUP_ON_STARTUP:
+        threat_classifier.start_warm_up()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Indian Cyber Threat Intelligence Platform")
-    # Cleanup tasks here
-    pass
\ No newline at end of file
+    await scrape_scheduler.stop()
+    if embedded_worker:
+        await embedded_worker.stop()
+    await event_bus.drain()
+    fingerprint_index.save()
+    await websocket_manager.close()
+    await http_client.close()
+    parse_pool.shutdown()
\ No newline at end of file
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, Float, Enum, ForeignKey, ARRAY, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Date, Boolean, Text, Integer, Float, Enum, ForeignKey, ARRAY, JSON, Index, Computed, UniqueConstraint, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 import uuid
 import enum
@@ -65,6 +65,45 @@ class Source(Base):
 
     incidents = relationship("CyberIncident", back_populates="source")
 
+class SourceHTTPCache(Base):
+    __tablename__ = "source_http_cache"
+
+    source_id = Column(UUID(as_uuid=True), ForeignKey("sources.id", ondelete="CASCADE"), primary_key=True)
+    etag = Column(Text)
+    last_modified = Column(String(100))
+    content_hash = Column(String(64))
+    last_outcome = Column(String(50))
+    last_checked = Column(DateTime)
+    last_changed = Column(DateTime)
+
+class ScrapeJob(Base):
+    """A source scrape queued for, or leased by, a distributed scrape worker"""
+    __tablename__ = "scrape_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_id = Column(UUID(as_uuid=True), ForeignKey("sources.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, dead
+    trigger = Column(String(20), nullable=False, default="scheduled")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False, default=func.now())
+    leased_by = Column(String(255))
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    result = Column(JSON)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('idx_scrape_jobs_ready', 'available_at', postgresql_where=(status == 'queued')),
+        Index('idx_scrape_jobs_lease', 'lease_expires_at', postgresql_where=(status == 'running')),
+        Index('idx_scrape_jobs_source_finished', 'source_id', 'finished_at'),
+        Index('uq_scrape_jobs_active_source', 'source_id', unique=True,
+              postgresql_where=status.in_(['queued', 'running'])),
+    )
+
 class APTGroup(Base):
     __tablename__ = "apt_groups"
 
@@ -127,10 +166,73 @@ class CyberIncident(Base):
     is_verified = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    # Weighted full-text document maintained by the database (title A, description B, content C)
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'C')",
+        persisted=True
+    )))
+    # MinHash of title+description shingles, for near-duplicate detection at ingest
+    minhash_signature = deferred(Column(LargeBinary))
+
+    # Eager by default so incidents returned from async sessions serialize without lazy loads
+    source = relationship("Source", back_populates="incidents", lazy="joined")
+    apt_group = relationship("APTGroup", back_populates="incidents", lazy="joined")
+    sector = relationship("Sector", back_populates="incidents", lazy="joined")
+
+    __table_args__ = (
+        Index('uq_incidents_url', 'url', unique=True, postgresql_where=url.isnot(None)),
+        Index('uq_incidents_external_id', 'external_id', unique=True, postgresql_where=external_id.isnot(None)),
+        Index('idx_incidents_discovered_id', discovered_date.desc(), id.desc()),
+        Index('idx_incidents_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
+class IncidentDuplicate(Base):
+    """A near-duplicate report of an incident, linked to it instead of stored as another incident"""
+    __tablename__ = "incident_duplicates"
 
-    source = relationship("Source", back_populates="incidents")
-    apt_group = relationship("APTGroup", back_populates="incidents")
-    sector = relationship("Sector", back_populates="incidents")
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    canonical_incident_id = Column(UUID(as_uuid=True), ForeignKey("cyber_incidents.id", ondelete="CASCADE"), nullable=False)
+    source_id = Column(UUID(as_uuid=True), ForeignKey("sources.id", ondelete="CASCADE"))
+    title = Column(String(500), nullable=False)
+    url = Column(Text)
+    external_id = Column(String(255))
+    similarity = Column(Float, nullable=False)
+    detected_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('canonical_incident_id', 'source_id', 'title', name='uq_incident_duplicates_report'),
+        # Ingest dedup looks linked reports up like incidents
+        Index('idx_incident_duplicates_url', 'url'),
+        Index('idx_incident_duplicates_external_id', 'external_id'),
+        Index('idx_incident_duplicates_source_title', 'source_id', 'title'),
+    )
+
+class IncidentDailyRollup(Base):
+    """Per-day incident counts, maintained by database triggers on cyber_incidents"""
+    __tablename__ = "incident_daily_rollups"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date)  # discovered_date::date
+    sector_id = Column(UUID(as_uuid=True))
+    severity = Column(Enum(IncidentSeverity))
+    status = Column(Enum(IncidentStatus))
+    source_id = Column(UUID(as_uuid=True))
+    apt_group_id = Column(UUID(as_uuid=True))
+    location = Column(String(255))
+    incident_count = Column(Integer, nullable=False, default=0)
+    critical_count = Column(Integer, nullable=False, default=0)
+    relevance_sum = Column(Float, nullable=False, default=0.0)
+    last_incident_date = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint(
+            'day', 'sector_id', 'severity', 'status', 'source_id', 'apt_group_id', 'location',
+            name='uq_incident_daily_rollups', postgresql_nulls_not_distinct=True
+        ),
+        Index('idx_incident_rollups_day', 'day'),
+    )
 
 class IncidentClassification(Base):
     __tablename__ = "incident_classifications"
@@ -134,6 +134,23 @@ class CyberIncident(CyberIncidentBase):
     class Config:
         from_attributes = True
 
+class IncidentDuplicate(BaseModel):
+    id: UUID
+    canonical_incident_id: UUID
+    source_id: Optional[UUID] = None
+    title: str
+    url: Optional[str] = None
+    external_id: Optional[str] = None
+    similarity: float
+    detected_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class IncidentSearchResult(CyberIncident):
+    search_score: float
+    highlight: Optional[str] = None
+
 # Dashboard and analytics schemas
 class IncidentStats(BaseModel):
     total_incidents: int
@@ -185,10 +202,14 @@ class IncidentFilter(BaseModel):
 
 class PaginatedResponse(BaseModel):
     items: List[Any]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    # Keyset pagination
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total_is_estimate: bool = False
 
 # WebSocket message schemas
 class WSMessage(BaseModel):
@@ -201,4 +222,19 @@ class IncidentAlert(BaseModel):
     severity: IncidentSeverity
     sector: Optional[str] = None
     apt_group: Optional[str] = None
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+    # Attributes matched against client subscriptions
+    sector_id: Optional[UUID] = None
+    apt_group_id: Optional[UUID] = None
+    source_type: Optional[SourceType] = None
+    tags: List[str] = []
+    relevance_score: Optional[float] = None
+
+class IncidentSubscription(BaseModel):
+    """Filters a /ws/incidents client subscribes with; unset fields match everything"""
+    severity: Optional[List[IncidentSeverity]] = None
+    sector_ids: Optional[List[UUID]] = None
+    source_types: Optional[List[SourceType]] = None
+    tags: Optional[List[str]] = None
+    apt_group_ids: Optional[List[UUID]] = None
+    min_relevance_score: Optional[float] = Field(None, ge=0.0, le=1.0)
\ No newline at end of file
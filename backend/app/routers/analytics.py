@@ -1,57 +1,65 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime, timedelta
-from app.services.analytics_service import AnalyticsService
+from app.services.analytics_service import AsyncAnalyticsService
 from app.utils.auth import get_current_user
-from database.connection import get_db
+from database.connection import get_async_db
 from app.models.models import User
 
 router = APIRouter()
 
+# Hourly buckets are computed from cyber_incidents rather than the daily rollups
+MAX_HOURLY_TREND_DAYS = 31
+
 @router.get("/trends")
 async def get_incident_trends(
     days: int = Query(30, ge=1, le=365),
     sector_id: Optional[str] = None,
     severity: Optional[str] = None,
-    db: Session = Depends(get_db),
+    bucket: str = Query("day", pattern="^(hour|day|week)$"),
+    by_sector: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    analytics_service = AnalyticsService(db)
-    return analytics_service.get_incident_trends(days, sector_id, severity)
+    if bucket == "hour" and days > MAX_HOURLY_TREND_DAYS:
+        raise HTTPException(status_code=400, detail=f"Hourly trends are limited to {MAX_HOURLY_TREND_DAYS} days")
+    
+    analytics_service = AsyncAnalyticsService(db)
+    return await analytics_service.get_incident_trends(days, sector_id, severity, bucket, by_sector)
 
 @router.get("/apt-activity")
 async def get_apt_activity(
     days: int = Query(90, ge=1, le=365),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    analytics_service = AnalyticsService(db)
-    return analytics_service.get_apt_activity(days)
+    analytics_service = AsyncAnalyticsService(db)
+    return await analytics_service.get_apt_activity(days)
 
 @router.get("/sector-analysis")
 async def get_sector_analysis(
     days: int = Query(30, ge=1, le=365),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    analytics_service = AnalyticsService(db)
-    return analytics_service.get_sector_analysis(days)
+    analytics_service = AsyncAnalyticsService(db)
+    return await analytics_service.get_sector_analysis(days)
 
 @router.get("/threat-intelligence")
 async def get_threat_intelligence(
     days: int = Query(7, ge=1, le=30),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    analytics_service = AnalyticsService(db)
-    return analytics_service.get_threat_intelligence_summary(days)
+    analytics_service = AsyncAnalyticsService(db)
+    return await analytics_service.get_threat_intelligence_summary(days)
 
 @router.get("/geographic-distribution")
 async def get_geographic_distribution(
     days: int = Query(30, ge=1, le=365),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    analytics_service = AnalyticsService(db)
-    return analytics_service.get_geographic_distribution(days)
\ No newline at end of file
+    analytics_service = AsyncAnalyticsService(db)
+    return await analytics_service.get_geographic_distribution(days)
\ No newline at end of file
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.models import schemas, models
-from app.services.auth_service import AuthService
+from app.services.auth_service import AsyncAuthService
 from app.utils.security import create_access_token, verify_token
-from database.connection import get_db
+from database.connection import get_async_db
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
@@ -13,28 +13,28 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 @router.post("/register", response_model=schemas.User)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    auth_service = AuthService(db)
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    auth_service = AsyncAuthService(db)
     
     # Check if user already exists
-    if auth_service.get_user_by_username(user.username):
+    if await auth_service.get_user_by_username(user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    if auth_service.get_user_by_email(user.email):
+    if await auth_service.get_user_by_email(user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    return auth_service.create_user(user)
+    return await auth_service.create_user(user)
 
 @router.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    auth_service = AuthService(db)
-    user = auth_service.authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    auth_service = AsyncAuthService(db)
+    user = await auth_service.authenticate_user(form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
@@ -51,7 +51,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def read_users_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -59,8 +59,8 @@ async def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depen
     )
     
     username = verify_token(token, credentials_exception)
-    auth_service = AuthService(db)
-    user = auth_service.get_user_by_username(username)
+    auth_service = AsyncAuthService(db)
+    user = await auth_service.get_user_by_username(username)
     
     if user is None:
         raise credentials_exception
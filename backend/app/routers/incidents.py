@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 from app.models import schemas, models
-from app.services.incident_service import IncidentService
+from app.services.incident_service import AsyncIncidentService
 from app.utils.auth import get_current_user
-from database.connection import get_db
+from database.connection import get_async_db
 
 router = APIRouter()
 
@@ -18,10 +18,14 @@ async def get_incidents(
     sector_id: Optional[UUID] = None,
     apt_group_id: Optional[UUID] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+    direction: str = Query("next", pattern="^(next|prev)$"),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    incident_service = IncidentService(db)
+    incident_service = AsyncIncidentService(db)
     
     filters = schemas.IncidentFilter(
         severity=severity,
@@ -31,7 +35,26 @@ async def get_incidents(
         search_query=search
     )
     
-    incidents, total = incident_service.get_incidents_paginated(
+    # Keyset pagination when a cursor is supplied or explicitly requested
+    if cursor or pagination == "cursor":
+        try:
+            incidents, next_cursor, prev_cursor, total, estimated = await incident_service.get_incidents_keyset(
+                per_page=per_page, filters=filters, cursor=cursor,
+                direction=direction, include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return schemas.PaginatedResponse(
+            items=incidents,
+            total=total,
+            per_page=per_page,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+            total_is_estimate=estimated and total is not None
+        )
+    
+    incidents, total = await incident_service.get_incidents_paginated(
         page=page, per_page=per_page, filters=filters
     )
     
@@ -46,35 +69,44 @@ async def get_incidents(
 @router.get("/{incident_id}", response_model=schemas.CyberIncident)
 async def get_incident(
     incident_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    incident_service = IncidentService(db)
-    incident = incident_service.get_incident_by_id(incident_id)
+    incident_service = AsyncIncidentService(db)
+    incident = await incident_service.get_incident_by_id(incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
     return incident
 
+@router.get("/{incident_id}/duplicates", response_model=List[schemas.IncidentDuplicate])
+async def get_incident_duplicates(
+    incident_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    incident_service = AsyncIncidentService(db)
+    return await incident_service.get_duplicates(incident_id)
+
 @router.post("/", response_model=schemas.CyberIncident)
 async def create_incident(
     incident: schemas.CyberIncidentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    incident_service = IncidentService(db)
-    return incident_service.create_incident(incident)
+    incident_service = AsyncIncidentService(db)
+    return await incident_service.create_incident(incident)
 
 @router.put("/{incident_id}", response_model=schemas.CyberIncident)
 async def update_incident(
     incident_id: UUID,
     incident_update: schemas.CyberIncidentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    incident_service = IncidentService(db)
-    incident = incident_service.update_incident(incident_id, incident_update)
+    incident_service = AsyncIncidentService(db)
+    incident = await incident_service.update_incident(incident_id, incident_update)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -84,14 +116,14 @@ async def update_incident(
 @router.delete("/{incident_id}")
 async def delete_incident(
     incident_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    incident_service = IncidentService(db)
-    success = incident_service.delete_incident(incident_id)
+    incident_service = AsyncIncidentService(db)
+    success = await incident_service.delete_incident(incident_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -103,14 +135,23 @@ async def search_incidents(
     query: str = Query(..., min_length=3),
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    incident_service = IncidentService(db)
-    incidents, total = incident_service.full_text_search(query, page, per_page)
+    incident_service = AsyncIncidentService(db)
+    results, total = await incident_service.full_text_search(query, page, per_page)
+    
+    items = [
+        schemas.IncidentSearchResult(
+            **schemas.CyberIncident.model_validate(incident).model_dump(),
+            search_score=search_score,
+            highlight=highlight
+        )
+        for incident, search_score, highlight in results
+    ]
     
     return schemas.PaginatedResponse(
-        items=incidents,
+        items=items,
         total=total,
         page=page,
         per_page=per_page,
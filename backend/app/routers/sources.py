@@ -1,30 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
 from app.models import schemas, models
-from app.services.source_service import SourceService
+from app.services.source_service import AsyncSourceService
 from app.utils.auth import get_current_user
-from database.connection import get_db
+from app.services.scrape_job_service import scrape_job_to_dict
+from scrapers.job_queue import scrape_job_queue
+from scrapers.scheduler import scrape_scheduler
+from database.connection import get_async_db
 
 router = APIRouter()
 
+# Queued jobs are retried or dead-lettered; the in-process scheduler does not retry, so its failures are final
+JOB_STATUS_PATTERN = "^(queued|running|succeeded|dead)$" if scrape_job_queue else "^(queued|running|succeeded|failed)$"
+
+def require_scheduler():
+    """Scheduler jobs live in the elected process; elsewhere they cannot be triggered or looked up"""
+    if scrape_scheduler.running:
+        return
+    if scrape_scheduler.standby:
+        raise HTTPException(status_code=503, detail="Scrape scheduler runs in another worker process; "
+                                                    "set SCRAPE_JOB_BACKEND=postgres to share jobs across workers")
+    raise HTTPException(status_code=503, detail="Scrape scheduler is not running")
+
 @router.get("/", response_model=List[schemas.Source])
 async def get_sources(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    source_service = AsyncSourceService(db)
+    return await source_service.get_all_sources()
+
+@router.get("/jobs")
+async def get_scrape_jobs(
+    limit: int = 50,
+    status: Optional[str] = Query(None, pattern=JOB_STATUS_PATTERN),
+    current_user: models.User = Depends(get_current_user)
+):
+    if scrape_job_queue:
+        return [scrape_job_to_dict(job) for job in await scrape_job_queue.recent_jobs(limit, status)]
+    require_scheduler()
+    return [job.to_dict() for job in scrape_scheduler.recent_jobs(limit) if not status or job.status == status]
+
+@router.get("/jobs/{job_id}")
+async def get_scrape_job(
+    job_id: str,
     current_user: models.User = Depends(get_current_user)
 ):
-    source_service = SourceService(db)
-    return source_service.get_all_sources()
+    if scrape_job_queue:
+        try:
+            job = await scrape_job_queue.get_job(UUID(job_id))
+        except ValueError:
+            job = None
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return scrape_job_to_dict(job)
+    
+    require_scheduler()
+    job = scrape_scheduler.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job.to_dict()
 
 @router.get("/{source_id}", response_model=schemas.Source)
 async def get_source(
     source_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    source_service = SourceService(db)
-    source = source_service.get_source_by_id(source_id)
+    source_service = AsyncSourceService(db)
+    source = await source_service.get_source_by_id(source_id)
     
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
@@ -34,27 +82,27 @@ async def get_source(
 @router.post("/", response_model=schemas.Source)
 async def create_source(
     source: schemas.SourceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    source_service = SourceService(db)
-    return source_service.create_source(source)
+    source_service = AsyncSourceService(db)
+    return await source_service.create_source(source)
 
 @router.put("/{source_id}", response_model=schemas.Source)
 async def update_source(
     source_id: UUID,
     source_update: schemas.SourceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    source_service = SourceService(db)
-    source = source_service.update_source(source_id, source_update)
+    source_service = AsyncSourceService(db)
+    source = await source_service.update_source(source_id, source_update)
     
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
@@ -64,35 +112,39 @@ async def update_source(
 @router.delete("/{source_id}")
 async def delete_source(
     source_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    source_service = SourceService(db)
-    success = source_service.delete_source(source_id)
+    source_service = AsyncSourceService(db)
+    success = await source_service.delete_source(source_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Source not found")
     
     return {"message": "Source deleted successfully"}
 
-@router.post("/{source_id}/scrape")
+@router.post("/{source_id}/scrape", status_code=202)
 async def trigger_scraping(
     source_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    source_service = SourceService(db)
-    source = source_service.get_source_by_id(source_id)
+    source_service = AsyncSourceService(db)
+    source = await source_service.get_source_by_id(source_id)
     
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
     
-    # Trigger scraping task (implementation depends on your task queue)
-    # For now, return success message
-    return {"message": f"Scraping triggered for source: {source.name}"}
\ No newline at end of file
+    if scrape_job_queue:
+        job_id = await scrape_job_queue.enqueue(source.id, trigger="manual")
+        return {"message": f"Scraping triggered for source: {source.name}", "job_id": str(job_id), "status": "queued"}
+    
+    require_scheduler()
+    job = scrape_scheduler.enqueue(source, trigger="manual")
+    return {"message": f"Scraping triggered for source: {source.name}", "job_id": job.id, "status": job.status}
\ No newline at end of file
@@ -1,47 +1,133 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, and_, cast, DateTime
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from app.models import models
+from app.services.rollup_service import rollup_start_day
+
+TREND_BUCKETS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
+
+def truncate_to_bucket(moment: datetime, bucket: str) -> datetime:
+    """Start of the bucket containing ``moment``, matching Postgres date_trunc"""
+    if bucket == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day_start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'week':
+        return day_start - timedelta(days=day_start.weekday())
+    return day_start
 
 class AnalyticsService:
+    """Incident analytics; windowed aggregates read the daily rollups, not cyber_incidents"""
+
     def __init__(self, db: Session):
         self.db = db
 
-    def get_incident_trends(self, days: int, sector_id: Optional[str] = None, severity: Optional[str] = None) -> Dict[str, Any]:
-        start_date = datetime.utcnow() - timedelta(days=days)
+    def get_incident_trends(self, days: int, sector_id: Optional[str] = None, severity: Optional[str] = None,
+                            bucket: str = 'day', by_sector: bool = False) -> Dict[str, Any]:
+        buckets = self.get_trend_buckets(days, bucket, sector_id, severity, by_sector)
+        
+        for entry in buckets:
+            entry['date'] = entry['date'].isoformat() if bucket == 'hour' else str(entry['date'].date())
+        
+        return {
+            'trends': buckets,
+            'total_incidents': sum(entry['count'] for entry in buckets),
+            'period_days': days,
+            'bucket': bucket
+        }
+
+    def get_trend_buckets(self, days: int, bucket: str = 'day', sector_id: Optional[str] = None,
+                          severity: Optional[str] = None, by_sector: bool = False) -> List[Dict[str, Any]]:
+        """Gap-filled incident counts per bucket with a per-severity breakdown, from one grouped query.
+
+        Day and week buckets read the daily rollups; hour buckets are finer
+        than the rollups and read cyber_incidents directly.
+        """
+        severities = list(models.IncidentSeverity)
+        now = datetime.utcnow()
         
-        query = self.db.query(
-            func.date(models.CyberIncident.discovered_date).label('date'),
-            func.count(models.CyberIncident.id).label('count')
-        ).filter(models.CyberIncident.discovered_date >= start_date)
+        if bucket == 'hour':
+            incidents = models.CyberIncident
+            start = truncate_to_bucket(now - timedelta(days=days), bucket)
+            bucket_column = func.date_trunc('hour', incidents.discovered_date)
+            sector_column, severity_column = incidents.sector_id, incidents.severity
+            total = func.count(incidents.id)
+            per_severity = [func.count(incidents.id).filter(incidents.severity == level) for level in severities]
+            window = incidents.discovered_date >= start
+        else:
+            rollups = models.IncidentDailyRollup
+            start_day = rollup_start_day(days)
+            start = truncate_to_bucket(datetime.combine(start_day, datetime.min.time()), bucket)
+            bucket_column = func.date_trunc(bucket, cast(rollups.day, DateTime))
+            sector_column, severity_column = rollups.sector_id, rollups.severity
+            total = func.sum(rollups.incident_count)
+            per_severity = [
+                func.coalesce(func.sum(rollups.incident_count).filter(rollups.severity == level), 0)
+                for level in severities
+            ]
+            window = rollups.day >= start_day
+        
+        group_columns = [bucket_column] + ([sector_column] if by_sector else [])
+        query = self.db.query(*group_columns, total, *per_severity).filter(window)
         
         if sector_id:
-            query = query.filter(models.CyberIncident.sector_id == sector_id)
+            query = query.filter(sector_column == sector_id)
         
         if severity:
-            query = query.filter(models.CyberIncident.severity == severity)
+            query = query.filter(severity_column == severity)
         
-        results = query.group_by(func.date(models.CyberIncident.discovered_date))\
-                      .order_by('date')\
-                      .all()
+        results = query.group_by(*group_columns).all()
         
-        return {
-            'trends': [{'date': str(date), 'count': count} for date, count in results],
-            'total_incidents': sum(count for _, count in results),
-            'period_days': days
-        }
+        def empty_bucket(bucket_start: datetime) -> Dict[str, Any]:
+            entry = {
+                'date': bucket_start,
+                'count': 0,
+                'severity_breakdown': {level.value: 0 for level in severities}
+            }
+            if by_sector:
+                entry['sectors'] = {}
+            return entry
+        
+        filled = {}
+        bucket_start, end = start, truncate_to_bucket(now, bucket)
+        while bucket_start <= end:
+            filled[bucket_start] = empty_bucket(bucket_start)
+            bucket_start += TREND_BUCKETS[bucket]
+        
+        for row in results:
+            row = list(row)
+            bucket_start = row.pop(0)
+            row_sector_id = row.pop(0) if by_sector else None
+            count, severity_counts = row[0], row[1:]
+            breakdown = {level.value: level_count for level, level_count in zip(severities, severity_counts)}
+            
+            entry = filled.setdefault(bucket_start, empty_bucket(bucket_start))
+            entry['count'] += count
+            for level, level_count in breakdown.items():
+                entry['severity_breakdown'][level] += level_count
+            if by_sector:
+                entry['sectors'][str(row_sector_id) if row_sector_id else 'unknown'] = {
+                    'count': count,
+                    'severity_breakdown': breakdown
+                }
+        
+        return [filled[bucket_start] for bucket_start in sorted(filled)]
 
     def get_apt_activity(self, days: int) -> Dict[str, Any]:
-        start_date = datetime.utcnow() - timedelta(days=days)
+        rollups = models.IncidentDailyRollup
         
         results = self.db.query(
             models.APTGroup.name,
             models.APTGroup.origin_country,
-            func.count(models.CyberIncident.id).label('incident_count'),
-            func.max(models.CyberIncident.incident_date).label('last_activity')
-        ).join(models.CyberIncident)\
-         .filter(models.CyberIncident.discovered_date >= start_date)\
+            func.sum(rollups.incident_count).label('incident_count'),
+            func.max(rollups.last_incident_date).label('last_activity')
+        ).join(rollups, rollups.apt_group_id == models.APTGroup.id)\
+         .filter(rollups.day >= rollup_start_day(days))\
          .group_by(models.APTGroup.id, models.APTGroup.name, models.APTGroup.origin_country)\
          .order_by(desc('incident_count'))\
          .all()
@@ -60,18 +146,16 @@ class AnalyticsService:
         }
 
     def get_sector_analysis(self, days: int) -> Dict[str, Any]:
-        start_date = datetime.utcnow() - timedelta(days=days)
+        rollups = models.IncidentDailyRollup
         
         results = self.db.query(
             models.Sector.name,
             models.Sector.sector_type,
-            func.count(models.CyberIncident.id).label('incident_count'),
-            func.count(
-                models.CyberIncident.id
-            ).filter(models.CyberIncident.severity == models.IncidentSeverity.critical).label('critical_count'),
-            func.avg(models.CyberIncident.relevance_score).label('avg_relevance')
-        ).join(models.CyberIncident)\
-         .filter(models.CyberIncident.discovered_date >= start_date)\
+            func.sum(rollups.incident_count).label('incident_count'),
+            func.sum(rollups.critical_count).label('critical_count'),
+            (func.sum(rollups.relevance_sum) / func.sum(rollups.incident_count)).label('avg_relevance')
+        ).join(rollups, rollups.sector_id == models.Sector.id)\
+         .filter(rollups.day >= rollup_start_day(days))\
          .group_by(models.Sector.id, models.Sector.name, models.Sector.sector_type)\
          .order_by(desc('incident_count'))\
          .all()
@@ -155,17 +239,17 @@ class AnalyticsService:
         }
 
     def get_geographic_distribution(self, days: int) -> Dict[str, Any]:
-        start_date = datetime.utcnow() - timedelta(days=days)
+        rollups = models.IncidentDailyRollup
         
         results = self.db.query(
-            models.CyberIncident.geographical_location,
-            func.count(models.CyberIncident.id).label('incident_count')
+            rollups.location,
+            func.sum(rollups.incident_count).label('incident_count')
         ).filter(
             and_(
-                models.CyberIncident.discovered_date >= start_date,
-                models.CyberIncident.geographical_location.isnot(None)
+                rollups.day >= rollup_start_day(days),
+                rollups.location.isnot(None)
             )
-        ).group_by(models.CyberIncident.geographical_location)\
+        ).group_by(rollups.location)\
          .order_by(desc('incident_count'))\
          .all()
         
@@ -178,4 +262,28 @@ class AnalyticsService:
                 for location, incident_count in results
             ],
             'period_days': days
-        }
\ No newline at end of file
+        }
+
+class AsyncAnalyticsService:
+    """AnalyticsService for async sessions; queries run without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_incident_trends(self, days: int, sector_id: Optional[str] = None, severity: Optional[str] = None,
+                                  bucket: str = 'day', by_sector: bool = False) -> Dict[str, Any]:
+        return await self.db.run_sync(
+            lambda db: AnalyticsService(db).get_incident_trends(days, sector_id, severity, bucket, by_sector)
+        )
+
+    async def get_apt_activity(self, days: int) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: AnalyticsService(db).get_apt_activity(days))
+
+    async def get_sector_analysis(self, days: int) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: AnalyticsService(db).get_sector_analysis(days))
+
+    async def get_threat_intelligence_summary(self, days: int) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: AnalyticsService(db).get_threat_intelligence_summary(days))
+
+    async def get_geographic_distribution(self, days: int) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: AnalyticsService(db).get_geographic_distribution(days))
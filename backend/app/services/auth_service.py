@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import models, schemas
 from app.utils.security import get_password_hash, verify_password
 from datetime import datetime
@@ -36,4 +37,22 @@ class AuthService:
         user.last_login = datetime.utcnow()
         self.db.commit()
         
-        return user
\ No newline at end of file
+        return user
+
+class AsyncAuthService:
+    """AuthService for async sessions; queries run without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_user_by_username(self, username: str) -> models.User:
+        return await self.db.run_sync(lambda db: AuthService(db).get_user_by_username(username))
+
+    async def get_user_by_email(self, email: str) -> models.User:
+        return await self.db.run_sync(lambda db: AuthService(db).get_user_by_email(email))
+
+    async def create_user(self, user: schemas.UserCreate) -> models.User:
+        return await self.db.run_sync(lambda db: AuthService(db).create_user(user))
+
+    async def authenticate_user(self, username: str, password: str) -> models.User:
+        return await self.db.run_sync(lambda db: AuthService(db).authenticate_user(username, password))
@@ -1,15 +1,21 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, desc
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 from app.models import models, schemas
+from app.services.analytics_service import AnalyticsService
 from app.services.incident_service import IncidentService
+from app.utils.cache import dashboard_cache
+from app.utils.event_bus import Event
+from database.connection import AsyncSessionLocal
 from datetime import datetime, timedelta
 
 class DashboardService:
     def __init__(self, db: Session):
         self.db = db
         self.incident_service = IncidentService(db)
+        self.analytics_service = AnalyticsService(db)
 
     def get_dashboard_data(self) -> schemas.DashboardData:
         stats = self._get_incident_stats()
@@ -27,25 +33,24 @@ class DashboardService:
         )
 
     def _get_incident_stats(self) -> schemas.IncidentStats:
-        total_incidents = self.db.query(models.CyberIncident).count()
-        
-        severity_counts = self.db.query(
-            models.CyberIncident.severity,
-            func.count(models.CyberIncident.id)
-        ).group_by(models.CyberIncident.severity).all()
-
-        status_counts = self.db.query(
-            models.CyberIncident.status,
-            func.count(models.CyberIncident.id)
-        ).group_by(models.CyberIncident.status).all()
+        rollups = models.IncidentDailyRollup
 
-        severity_dict = {severity.value: 0 for severity in models.IncidentSeverity}
-        for severity, count in severity_counts:
-            severity_dict[severity.value] = count
+        # One pass over the rollups yields both breakdowns
+        counts = self.db.query(
+            rollups.severity,
+            rollups.status,
+            func.sum(rollups.incident_count)
+        ).group_by(rollups.severity, rollups.status).all()
 
+        total_incidents = 0
+        severity_dict = {severity.value: 0 for severity in models.IncidentSeverity}
         status_dict = {status.value: 0 for status in models.IncidentStatus}
-        for status, count in status_counts:
-            status_dict[status.value] = count
+        for severity, status, count in counts:
+            total_incidents += count
+            if severity:
+                severity_dict[severity.value] += count
+            if status:
+                status_dict[status.value] += count
 
         return schemas.IncidentStats(
             total_incidents=total_incidents,
@@ -59,14 +64,13 @@ class DashboardService:
         )
 
     def _get_sector_stats(self) -> List[schemas.SectorStats]:
+        rollups = models.IncidentDailyRollup
         results = self.db.query(
             models.Sector.name,
-            func.count(models.CyberIncident.id).label('incident_count'),
-            func.count(
-                models.CyberIncident.id
-            ).filter(models.CyberIncident.severity == models.IncidentSeverity.critical).label('critical_count'),
-            func.max(models.CyberIncident.incident_date).label('last_incident_date')
-        ).outerjoin(models.CyberIncident)\
+            func.coalesce(func.sum(rollups.incident_count), 0).label('incident_count'),
+            func.coalesce(func.sum(rollups.critical_count), 0).label('critical_count'),
+            func.max(rollups.last_incident_date).label('last_incident_date')
+        ).outerjoin(rollups, rollups.sector_id == models.Sector.id)\
          .group_by(models.Sector.id, models.Sector.name)\
          .order_by(desc('incident_count'))\
          .all()
@@ -82,12 +86,13 @@ class DashboardService:
         ]
 
     def _get_apt_stats(self) -> List[schemas.APTStats]:
+        rollups = models.IncidentDailyRollup
         results = self.db.query(
             models.APTGroup.name,
             models.APTGroup.origin_country,
-            func.count(models.CyberIncident.id).label('incident_count'),
-            func.max(models.CyberIncident.incident_date).label('last_activity')
-        ).outerjoin(models.CyberIncident)\
+            func.coalesce(func.sum(rollups.incident_count), 0).label('incident_count'),
+            func.max(rollups.last_incident_date).label('last_activity')
+        ).outerjoin(rollups, rollups.apt_group_id == models.APTGroup.id)\
          .group_by(models.APTGroup.id, models.APTGroup.name, models.APTGroup.origin_country)\
          .order_by(desc('incident_count'))\
          .limit(10)\
@@ -104,23 +109,13 @@ class DashboardService:
         ]
 
     def _get_threat_trends(self, days: int) -> List[schemas.ThreatTrend]:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        results = self.db.query(
-            func.date(models.CyberIncident.discovered_date).label('date'),
-            func.count(models.CyberIncident.id).label('incident_count')
-        ).filter(models.CyberIncident.discovered_date >= start_date)\
-         .group_by(func.date(models.CyberIncident.discovered_date))\
-         .order_by('date')\
-         .all()
-
         return [
             schemas.ThreatTrend(
-                date=date,
-                incident_count=incident_count,
-                severity_breakdown={}  # Could be enhanced to include severity breakdown
+                date=entry['date'],
+                incident_count=entry['count'],
+                severity_breakdown=entry['severity_breakdown']
             )
-            for date, incident_count in results
+            for entry in self.analytics_service.get_trend_buckets(days)
         ]
 
     def get_recent_incidents(self, limit: int) -> List[schemas.CyberIncident]:
@@ -130,4 +125,35 @@ class DashboardService:
         return self._get_sector_stats()
 
     def get_threat_trends(self, days: int):
-        return self._get_threat_trends(days)
\ No newline at end of file
+        return self._get_threat_trends(days)
+
+class AsyncDashboardService:
+    """DashboardService for async sessions; queries run without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_dashboard_data(self) -> schemas.DashboardData:
+        return await self.db.run_sync(lambda db: DashboardService(db).get_dashboard_data())
+
+    async def get_recent_incidents(self, limit: int) -> List[schemas.CyberIncident]:
+        return await self.db.run_sync(lambda db: DashboardService(db).get_recent_incidents(limit))
+
+    async def get_sector_breakdown(self):
+        return await self.db.run_sync(lambda db: DashboardService(db).get_sector_breakdown())
+
+    async def get_threat_trends(self, days: int):
+        return await self.db.run_sync(lambda db: DashboardService(db).get_threat_trends(days))
+
+async def build_dashboard_snapshot() -> Dict[str, Any]:
+    """Compute the dashboard in its own session, serialized for the snapshot cache"""
+    async with AsyncSessionLocal() as db:
+        dashboard_data = await AsyncDashboardService(db).get_dashboard_data()
+    return dashboard_data.model_dump(mode='json')
+
+async def get_cached_dashboard_data() -> Dict[str, Any]:
+    return await dashboard_cache.get(build_dashboard_snapshot)
+
+async def invalidate_dashboard_snapshot(events: List[Event]):
+    """Event bus handler: one snapshot invalidation per batch of incident events"""
+    await dashboard_cache.invalidate()
@@ -1,15 +1,123 @@
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_, or_, desc, func, text
-from typing import List, Tuple, Optional
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import tuple_
+from typing import Any, Dict, Iterable, List, Set, Tuple, Optional
 from uuid import UUID
 from app.models import models, schemas
+from app.utils.event_bus import EventType, event_bus
+from app.utils.minhash import minhash_signature
 from datetime import datetime
+import base64
+import json
+
+# Postgres accepts at most 65535 bind parameters per statement
+MAX_BIND_PARAMETERS = 65535
+
+def encode_cursor(incident: models.CyberIncident) -> str:
+    """Opaque keyset cursor for an incident's (discovered_date, id) position"""
+    payload = json.dumps([incident.discovered_date.isoformat(), str(incident.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        discovered_date, incident_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(discovered_date), UUID(incident_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+def incident_alert_data(incident, sector: Optional[str] = None, apt_group: Optional[str] = None,
+                        source_type: Optional[models.SourceType] = None) -> Dict[str, Any]:
+    """IncidentAlert fields for an incident (ORM object or inserted row)"""
+    return {
+        'incident_id': incident.id,
+        'title': incident.title,
+        'severity': incident.severity,
+        'sector': sector,
+        'apt_group': apt_group,
+        'timestamp': incident.discovered_date or datetime.utcnow(),
+        'sector_id': incident.sector_id,
+        'apt_group_id': incident.apt_group_id,
+        'source_type': source_type,
+        'tags': incident.tags or [],
+        'relevance_score': incident.relevance_score
+    }
 
 class IncidentService:
     def __init__(self, db: Session):
         self.db = db
 
     def get_incidents_paginated(self, page: int, per_page: int, filters: schemas.IncidentFilter = None) -> Tuple[List[models.CyberIncident], int]:
+        query = self._filtered_query(filters)
+
+        total = query.count()
+        
+        incidents = query.order_by(desc(models.CyberIncident.discovered_date))\
+                        .offset((page - 1) * per_page)\
+                        .limit(per_page)\
+                        .all()
+
+        return incidents, total
+
+    def get_incidents_keyset(self, per_page: int, filters: schemas.IncidentFilter = None, cursor: Optional[str] = None,
+                             direction: str = 'next', include_total: bool = False
+                             ) -> Tuple[List[models.CyberIncident], Optional[str], Optional[str], Optional[int], bool]:
+        """Page through incidents newest first using a (discovered_date, id) cursor.
+
+        Returns the page, the next and previous cursors, the total (exact when
+        requested, otherwise a planner estimate for unfiltered listings or None)
+        and whether that total is an estimate. Paging back needs a cursor.
+        """
+        if direction == 'prev' and not cursor:
+            raise ValueError("direction=prev requires a cursor")
+        
+        query = self._filtered_query(filters)
+        position = tuple_(models.CyberIncident.discovered_date, models.CyberIncident.id)
+
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            if direction == 'prev':
+                query = query.filter(position > tuple_(cursor_date, cursor_id))
+            else:
+                query = query.filter(position < tuple_(cursor_date, cursor_id))
+
+        if direction == 'prev':
+            order = (models.CyberIncident.discovered_date.asc(), models.CyberIncident.id.asc())
+        else:
+            order = (models.CyberIncident.discovered_date.desc(), models.CyberIncident.id.desc())
+
+        # Fetch one extra row to learn whether another page exists
+        incidents = query.order_by(*order).limit(per_page + 1).all()
+        has_more = len(incidents) > per_page
+        incidents = incidents[:per_page]
+
+        if direction == 'prev':
+            incidents.reverse()
+            next_cursor = encode_cursor(incidents[-1]) if incidents else cursor
+            prev_cursor = encode_cursor(incidents[0]) if incidents and has_more else None
+        else:
+            next_cursor = encode_cursor(incidents[-1]) if incidents and has_more else None
+            prev_cursor = encode_cursor(incidents[0]) if incidents and cursor else None
+
+        if include_total:
+            total, estimated = self._filtered_query(filters).count(), False
+        else:
+            total, estimated = self._estimate_total(filters), True
+
+        return incidents, next_cursor, prev_cursor, total, estimated
+
+    def _estimate_total(self, filters: schemas.IncidentFilter = None) -> Optional[int]:
+        """Planner row estimate for the unfiltered table; None when filters apply"""
+        if filters and any(value for value in filters.dict().values()):
+            return None
+
+        estimate = self.db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'cyber_incidents'")
+        ).scalar()
+        return max(estimate or 0, 0)
+
+    def _filtered_query(self, filters: schemas.IncidentFilter = None):
         query = self.db.query(models.CyberIncident).options(
             joinedload(models.CyberIncident.source),
             joinedload(models.CyberIncident.apt_group),
@@ -57,14 +165,7 @@ class IncidentService:
                 )
                 query = query.filter(search_filter)
 
-        total = query.count()
-        
-        incidents = query.order_by(desc(models.CyberIncident.discovered_date))\
-                        .offset((page - 1) * per_page)\
-                        .limit(per_page)\
-                        .all()
-
-        return incidents, total
+        return query
 
     def get_incident_by_id(self, incident_id: UUID) -> Optional[models.CyberIncident]:
         return self.db.query(models.CyberIncident)\
@@ -78,21 +179,74 @@ class IncidentService:
 
     def create_incident(self, incident: schemas.CyberIncidentCreate) -> models.CyberIncident:
         db_incident = models.CyberIncident(**incident.dict())
+        db_incident.minhash_signature = minhash_signature(incident.title, incident.description)
         self.db.add(db_incident)
         self.db.commit()
         self.db.refresh(db_incident)
+        event_bus.publish(EventType.incident_created, self._alert_data(db_incident))
         return db_incident
 
+    def bulk_create_incidents(self, incidents: List[schemas.CyberIncidentCreate], commit: bool = True) -> List[UUID]:
+        """Insert many incidents in one statement, skipping rows that hit a unique index.
+
+        Returns the ids of the rows actually inserted.
+        """
+        return [row.id for row in self.bulk_insert_incidents(incidents, commit)]
+
+    def bulk_insert_incidents(self, incidents: List[schemas.CyberIncidentCreate], commit: bool = True,
+                              signatures: Optional[List[Optional[bytes]]] = None) -> List[Any]:
+        """Like bulk_create_incidents, returning the inserted rows with their alert fields and signature.
+
+        incident.created events are published here only when committing;
+        callers passing commit=False publish after their own commit.
+        MinHash signatures are computed unless the caller already has them.
+        Large batches are split into several statements in one transaction.
+        """
+        if not incidents:
+            return []
+
+        if signatures is None:
+            signatures = [minhash_signature(incident_create.title, incident_create.description)
+                          for incident_create in incidents]
+
+        values = [
+            dict(incident_create.dict(), minhash_signature=signature)
+            for incident_create, signature in zip(incidents, signatures)
+        ]
+        chunk_size = max(MAX_BIND_PARAMETERS // len(values[0]), 1)
+
+        incident = models.CyberIncident
+        inserted_rows = []
+        for start in range(0, len(values), chunk_size):
+            statement = insert(incident)\
+                .values(values[start:start + chunk_size])\
+                .on_conflict_do_nothing()\
+                .returning(
+                    incident.id, incident.title, incident.severity, incident.discovered_date, incident.sector_id,
+                    incident.apt_group_id, incident.source_id, incident.tags, incident.relevance_score,
+                    incident.created_at, incident.minhash_signature, incident.url, incident.external_id
+                )
+            inserted_rows.extend(self.db.execute(statement).all())
+        if commit:
+            self.db.commit()
+            for row in inserted_rows:
+                event_bus.publish(EventType.incident_created, incident_alert_data(row))
+        return inserted_rows
+
     def update_incident(self, incident_id: UUID, incident_update: schemas.CyberIncidentCreate) -> Optional[models.CyberIncident]:
         db_incident = self.get_incident_by_id(incident_id)
         if not db_incident:
             return None
 
-        for field, value in incident_update.dict(exclude_unset=True).items():
+        changes = incident_update.dict(exclude_unset=True)
+        for field, value in changes.items():
             setattr(db_incident, field, value)
+        if 'title' in changes or 'description' in changes:
+            db_incident.minhash_signature = minhash_signature(db_incident.title, db_incident.description)
 
         self.db.commit()
         self.db.refresh(db_incident)
+        event_bus.publish(EventType.incident_updated, self._alert_data(db_incident))
         return db_incident
 
     def delete_incident(self, incident_id: UUID) -> bool:
@@ -100,34 +254,118 @@ class IncidentService:
         if not db_incident:
             return False
 
+        alert_data = self._alert_data(db_incident)
         self.db.delete(db_incident)
         self.db.commit()
+        event_bus.publish(EventType.incident_deleted, alert_data)
         return True
 
-    def full_text_search(self, query: str, page: int, per_page: int) -> Tuple[List[models.CyberIncident], int]:
-        # PostgreSQL full-text search
-        search_query = self.db.query(models.CyberIncident)\
-                             .options(
-                                 joinedload(models.CyberIncident.source),
-                                 joinedload(models.CyberIncident.apt_group),
-                                 joinedload(models.CyberIncident.sector)
-                             )\
-                             .filter(
-                                 or_(
-                                     func.to_tsvector('english', models.CyberIncident.title).match(query),
-                                     func.to_tsvector('english', models.CyberIncident.description).match(query),
-                                     func.to_tsvector('english', models.CyberIncident.content).match(query)
-                                 )
-                             )
-
-        total = search_query.count()
-        
-        incidents = search_query.order_by(desc(models.CyberIncident.relevance_score))\
-                               .offset((page - 1) * per_page)\
-                               .limit(per_page)\
-                               .all()
+    def lock_existing_incidents(self, incident_ids: Iterable[UUID]) -> Set[UUID]:
+        """The given incidents that still exist, key-share locked until commit so they cannot be deleted meanwhile"""
+        incident_ids = set(incident_ids)
+        if not incident_ids:
+            return set()
 
-        return incidents, total
+        rows = self.db.query(models.CyberIncident.id)\
+                      .filter(models.CyberIncident.id.in_(incident_ids))\
+                      .with_for_update(key_share=True)\
+                      .all()
+        return {row.id for row in rows}
+
+    def lock_incidents_by_keys(self, urls: Iterable[str], external_ids: Iterable[str]) -> List[Any]:
+        """(id, url, external_id, title) of the incidents holding any of the given unique keys, key-share locked until commit"""
+        urls, external_ids = set(urls), set(external_ids)
+        if not urls and not external_ids:
+            return []
+
+        incident = models.CyberIncident
+        return self.db.query(incident.id, incident.url, incident.external_id, incident.title)\
+                      .filter(or_(incident.url.in_(urls), incident.external_id.in_(external_ids)))\
+                      .with_for_update(key_share=True)\
+                      .all()
+
+    def link_duplicates(self, duplicates: List[Dict[str, Any]], commit: bool = True) -> int:
+        """Record near-duplicate reports against their canonical incidents; repeats are ignored.
+
+        Canonical incidents must exist: check them with lock_existing_incidents in the same transaction.
+        """
+        if not duplicates:
+            return 0
+
+        statement = insert(models.IncidentDuplicate).values(duplicates).on_conflict_do_nothing()
+        linked = self.db.execute(statement).rowcount
+        if commit:
+            self.db.commit()
+        return linked
+
+    def get_duplicates(self, incident_id: UUID) -> List[models.IncidentDuplicate]:
+        return self.db.query(models.IncidentDuplicate)\
+                     .filter(models.IncidentDuplicate.canonical_incident_id == incident_id)\
+                     .order_by(desc(models.IncidentDuplicate.detected_at))\
+                     .all()
+
+    def _alert_data(self, incident: models.CyberIncident) -> Dict[str, Any]:
+        return incident_alert_data(
+            incident,
+            sector=incident.sector.name if incident.sector else None,
+            apt_group=incident.apt_group.name if incident.apt_group else None,
+            source_type=incident.source.source_type if incident.source else None
+        )
+
+    def full_text_search(self, query: str, page: int, per_page: int) -> Tuple[List[Tuple[models.CyberIncident, float, Optional[str]]], int]:
+        """Ranked full-text search over the stored search_vector.
+
+        Results are ordered by a blend of text rank, recency and relevance
+        score, and come back as (incident, score, highlighted snippet) tuples.
+        Snippets are HTML-escaped text with matches wrapped in <mark> tags.
+        """
+        ts_query = func.websearch_to_tsquery('english', query)
+        
+        # ts_rank_cd normalization 32 maps the rank into [0, 1)
+        text_rank = func.ts_rank_cd(models.CyberIncident.search_vector, ts_query, 32)
+        age_days = func.extract('epoch', func.now() - models.CyberIncident.discovered_date) / 86400.0
+        recency = 1.0 / (1.0 + func.greatest(age_days, 0) / 30.0)
+        score = (
+            text_rank * 0.6 +
+            recency * 0.2 +
+            func.coalesce(models.CyberIncident.relevance_score, 0) * 0.2
+        ).label('search_score')
+        
+        # Escape the stored text so the only markup in a snippet is the <mark> tags added here
+        source_text = func.coalesce(models.CyberIncident.description, models.CyberIncident.title)
+        for char, entity in (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;')):
+            source_text = func.replace(source_text, char, entity)
+        
+        # Headlines are only computed for the returned page, after the LIMIT
+        highlight = func.ts_headline(
+            'english',
+            source_text,
+            ts_query,
+            'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MinWords=10, MaxWords=30'
+        ).label('highlight')
+        total = func.count().over().label('total')
+        
+        matches = models.CyberIncident.search_vector.op('@@')(ts_query)
+        rows = self.db.query(models.CyberIncident, score, highlight, total)\
+                      .options(
+                          joinedload(models.CyberIncident.source),
+                          joinedload(models.CyberIncident.apt_group),
+                          joinedload(models.CyberIncident.sector)
+                      )\
+                      .filter(matches)\
+                      .order_by(desc('search_score'), desc(models.CyberIncident.discovered_date))\
+                      .offset((page - 1) * per_page)\
+                      .limit(per_page)\
+                      .all()
+        
+        results = [(incident, float(search_score), snippet) for incident, search_score, snippet, _ in rows]
+        if rows:
+            return results, rows[0].total
+        
+        # A page past the last one has no rows to carry the window count
+        if page > 1:
+            return results, self.db.query(func.count(models.CyberIncident.id)).filter(matches).scalar()
+        return results, 0
 
     def get_recent_incidents(self, limit: int = 10) -> List[models.CyberIncident]:
         return self.db.query(models.CyberIncident)\
@@ -138,4 +376,44 @@ class IncidentService:
                      )\
                      .order_by(desc(models.CyberIncident.discovered_date))\
                      .limit(limit)\
-                     .all()
\ No newline at end of file
+                     .all()
+
+class AsyncIncidentService:
+    """IncidentService for async sessions; queries run without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_incidents_paginated(self, page: int, per_page: int, filters: schemas.IncidentFilter = None) -> Tuple[List[models.CyberIncident], int]:
+        return await self.db.run_sync(lambda db: IncidentService(db).get_incidents_paginated(page, per_page, filters))
+
+    async def get_incidents_keyset(self, per_page: int, filters: schemas.IncidentFilter = None, cursor: Optional[str] = None,
+                                   direction: str = 'next', include_total: bool = False
+                                   ) -> Tuple[List[models.CyberIncident], Optional[str], Optional[str], Optional[int], bool]:
+        return await self.db.run_sync(
+            lambda db: IncidentService(db).get_incidents_keyset(per_page, filters, cursor, direction, include_total)
+        )
+
+    async def get_incident_by_id(self, incident_id: UUID) -> Optional[models.CyberIncident]:
+        return await self.db.run_sync(lambda db: IncidentService(db).get_incident_by_id(incident_id))
+
+    async def create_incident(self, incident: schemas.CyberIncidentCreate) -> models.CyberIncident:
+        return await self.db.run_sync(lambda db: IncidentService(db).create_incident(incident))
+
+    async def bulk_create_incidents(self, incidents: List[schemas.CyberIncidentCreate], commit: bool = True) -> List[UUID]:
+        return await self.db.run_sync(lambda db: IncidentService(db).bulk_create_incidents(incidents, commit))
+
+    async def get_duplicates(self, incident_id: UUID) -> List[models.IncidentDuplicate]:
+        return await self.db.run_sync(lambda db: IncidentService(db).get_duplicates(incident_id))
+
+    async def update_incident(self, incident_id: UUID, incident_update: schemas.CyberIncidentCreate) -> Optional[models.CyberIncident]:
+        return await self.db.run_sync(lambda db: IncidentService(db).update_incident(incident_id, incident_update))
+
+    async def delete_incident(self, incident_id: UUID) -> bool:
+        return await self.db.run_sync(lambda db: IncidentService(db).delete_incident(incident_id))
+
+    async def full_text_search(self, query: str, page: int, per_page: int) -> Tuple[List[Tuple[models.CyberIncident, float, Optional[str]]], int]:
+        return await self.db.run_sync(lambda db: IncidentService(db).full_text_search(query, page, per_page))
+
+    async def get_recent_incidents(self, limit: int = 10) -> List[models.CyberIncident]:
+        return await self.db.run_sync(lambda db: IncidentService(db).get_recent_incidents(limit))
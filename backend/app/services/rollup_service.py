@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date, datetime, timedelta
+
+def rollup_start_day(days: int) -> date:
+    """First day of a window of ``days`` days ending today, in rollup granularity"""
+    return (datetime.utcnow() - timedelta(days=days)).date()
+
+class RollupService:
+    """Maintenance of the incident_daily_rollups table.
+
+    Rows are kept current by triggers on cyber_incidents; ``rebuild``
+    recomputes them from scratch, e.g. after a bulk load with triggers
+    disabled or when the table is first added to an existing database.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def rebuild(self) -> int:
+        written = self.db.execute(text("SELECT rebuild_incident_rollups()")).scalar()
+        self.db.commit()
+        return written
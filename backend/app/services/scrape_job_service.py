@@ -0,0 +1,220 @@
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+from uuid import UUID
+from app.models import models
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+FINISHED_JOB_STATUSES = ("succeeded", "dead")
+
+class JobLease(NamedTuple):
+    job_id: UUID
+    source_id: UUID
+    attempts: int
+
+def scrape_job_to_dict(job) -> Dict[str, Any]:
+    return {
+        'job_id': str(job.id),
+        'source_id': str(job.source_id),
+        'trigger': job.trigger,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'leased_by': job.leased_by,
+        'lease_expires_at': job.lease_expires_at.isoformat() if job.lease_expires_at else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': job.result,
+        'error': job.last_error
+    }
+
+class ScrapeJobService:
+    """Leased scrape jobs in Postgres.
+
+    Workers claim ready jobs with ``FOR UPDATE SKIP LOCKED``, so concurrent
+    claims never block on or return the same row. A claim is a lease that
+    the worker extends with heartbeats; leases that expire (a crashed or
+    stalled worker) are put back on the queue, and a job that has used up
+    its attempts is moved to ``dead`` instead. All lease times come from
+    the database clock so workers on different nodes agree on them.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, source_id: UUID, trigger: str = "scheduled", max_attempts: int = 3,
+                cooldown: Optional[int] = None) -> Optional[UUID]:
+        """Queue a job for a source; returns the active job if there is one, or None
+        if a job for the source finished within ``cooldown`` seconds"""
+        jobs = models.ScrapeJob
+        active_id = self._active_job_id(source_id)
+        if active_id:
+            return active_id
+
+        if cooldown:
+            recent = self.db.query(jobs.id).filter(
+                jobs.source_id == source_id,
+                jobs.finished_at > func.now() - timedelta(seconds=cooldown)
+            ).first()
+            if recent:
+                return None
+
+        # The partial unique index keeps one active job per source across producers
+        statement = insert(jobs).values(
+            source_id=source_id, trigger=trigger, max_attempts=max_attempts
+        ).on_conflict_do_nothing(
+            index_elements=[jobs.source_id], index_where=jobs.status.in_(ACTIVE_JOB_STATUSES)
+        ).returning(jobs.id)
+        job_id = self.db.execute(statement).scalar()
+        self.db.commit()
+        return job_id or self._active_job_id(source_id)
+
+    def claim(self, worker_id: str, limit: int, lease_seconds: int) -> List[JobLease]:
+        jobs = models.ScrapeJob
+        ready = select(jobs.id).where(
+            jobs.status == "queued", jobs.available_at <= func.now()
+        ).order_by(jobs.available_at).limit(limit).with_for_update(skip_locked=True)
+
+        statement = update(jobs).where(jobs.id.in_(ready)).values(
+            status="running",
+            leased_by=worker_id,
+            attempts=jobs.attempts + 1,
+            started_at=func.now(),
+            heartbeat_at=func.now(),
+            lease_expires_at=func.now() + timedelta(seconds=lease_seconds)
+        ).returning(jobs.id, jobs.source_id, jobs.attempts).execution_options(synchronize_session=False)
+        leases = [JobLease(*row) for row in self.db.execute(statement)]
+        self.db.commit()
+        return leases
+
+    def heartbeat(self, job_id: UUID, worker_id: str, lease_seconds: int) -> bool:
+        """Extend a lease; False if the worker no longer holds it"""
+        return self._update_leased(job_id, worker_id, {
+            'heartbeat_at': func.now(),
+            'lease_expires_at': func.now() + timedelta(seconds=lease_seconds)
+        })
+
+    def complete(self, job_id: UUID, worker_id: str, result: Dict[str, Any]) -> bool:
+        return self._update_leased(job_id, worker_id, {
+            'status': "succeeded",
+            'result': result,
+            'last_error': None,
+            'finished_at': func.now(),
+            'leased_by': None,
+            'lease_expires_at': None
+        })
+
+    def fail(self, job_id: UUID, worker_id: str, error: str, retry_backoff: int) -> bool:
+        """Requeue with exponential backoff, or dead-letter once attempts run out"""
+        jobs = models.ScrapeJob
+        backoff = func.make_interval(0, 0, 0, 0, 0, 0, literal(retry_backoff) * func.power(2, jobs.attempts - 1))
+        exhausted = jobs.attempts >= jobs.max_attempts
+        return self._update_leased(job_id, worker_id, {
+            'status': case((exhausted, "dead"), else_="queued"),
+            'available_at': case((exhausted, jobs.available_at), else_=func.now() + backoff),
+            'finished_at': case((exhausted, func.now()), else_=None),
+            'last_error': error,
+            'leased_by': None,
+            'lease_expires_at': None
+        })
+
+    def reclaim_expired(self) -> int:
+        """Requeue (or dead-letter) running jobs whose lease has expired"""
+        jobs = models.ScrapeJob
+        exhausted = jobs.attempts >= jobs.max_attempts
+        statement = update(jobs).where(
+            jobs.status == "running", jobs.lease_expires_at < func.now()
+        ).values(
+            status=case((exhausted, "dead"), else_="queued"),
+            available_at=func.now(),
+            finished_at=case((exhausted, func.now()), else_=None),
+            last_error=literal("Lease expired on ") + jobs.leased_by,
+            leased_by=None,
+            lease_expires_at=None
+        ).execution_options(synchronize_session=False)
+        reclaimed = self.db.execute(statement).rowcount
+        self.db.commit()
+        return reclaimed
+
+    def purge_finished(self, older_than_days: int) -> int:
+        jobs = models.ScrapeJob
+        purged = self.db.query(jobs).filter(
+            jobs.status.in_(FINISHED_JOB_STATUSES),
+            jobs.finished_at < func.now() - timedelta(days=older_than_days)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return purged
+
+    def get_job(self, job_id: UUID) -> Optional[models.ScrapeJob]:
+        return self.db.query(models.ScrapeJob).filter(models.ScrapeJob.id == job_id).first()
+
+    def recent_jobs(self, limit: int = 50, status: Optional[str] = None) -> List[models.ScrapeJob]:
+        query = self.db.query(models.ScrapeJob)
+        if status:
+            query = query.filter(models.ScrapeJob.status == status)
+        return query.order_by(models.ScrapeJob.created_at.desc()).limit(limit).all()
+
+    def get_stats(self) -> Dict[str, int]:
+        rows = self.db.query(models.ScrapeJob.status, func.count(models.ScrapeJob.id)).group_by(
+            models.ScrapeJob.status
+        ).all()
+        return {status: count for status, count in rows}
+
+    def _active_job_id(self, source_id: UUID) -> Optional[UUID]:
+        jobs = models.ScrapeJob
+        row = self.db.query(jobs.id).filter(
+            jobs.source_id == source_id, jobs.status.in_(ACTIVE_JOB_STATUSES)
+        ).first()
+        return row.id if row else None
+
+    def _update_leased(self, job_id: UUID, worker_id: str, values: Dict[str, Any]) -> bool:
+        jobs = models.ScrapeJob
+        statement = update(jobs).where(
+            jobs.id == job_id, jobs.status == "running", jobs.leased_by == worker_id
+        ).values(**values).execution_options(synchronize_session=False)
+        updated = self.db.execute(statement).rowcount
+        self.db.commit()
+        return updated == 1
+
+class AsyncScrapeJobService:
+    """ScrapeJobService for async sessions; queries run without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def enqueue(self, source_id: UUID, trigger: str = "scheduled", max_attempts: int = 3,
+                      cooldown: Optional[int] = None) -> Optional[UUID]:
+        return await self.db.run_sync(
+            lambda db: ScrapeJobService(db).enqueue(source_id, trigger, max_attempts, cooldown)
+        )
+
+    async def claim(self, worker_id: str, limit: int, lease_seconds: int) -> List[JobLease]:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).claim(worker_id, limit, lease_seconds))
+
+    async def heartbeat(self, job_id: UUID, worker_id: str, lease_seconds: int) -> bool:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).heartbeat(job_id, worker_id, lease_seconds))
+
+    async def complete(self, job_id: UUID, worker_id: str, result: Dict[str, Any]) -> bool:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).complete(job_id, worker_id, result))
+
+    async def fail(self, job_id: UUID, worker_id: str, error: str, retry_backoff: int) -> bool:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).fail(job_id, worker_id, error, retry_backoff))
+
+    async def reclaim_expired(self) -> int:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).reclaim_expired())
+
+    async def purge_finished(self, older_than_days: int) -> int:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).purge_finished(older_than_days))
+
+    async def get_job(self, job_id: UUID) -> Optional[models.ScrapeJob]:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).get_job(job_id))
+
+    async def recent_jobs(self, limit: int = 50, status: Optional[str] = None) -> List[models.ScrapeJob]:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).recent_jobs(limit, status))
+
+    async def get_stats(self) -> Dict[str, int]:
+        return await self.db.run_sync(lambda db: ScrapeJobService(db).get_stats())
@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 from app.models import models, schemas
@@ -45,4 +46,31 @@ class SourceService:
         return self.db.query(models.Source).filter(models.Source.is_active == True).all()
 
     def get_sources_by_type(self, source_type: models.SourceType) -> List[models.Source]:
-        return self.db.query(models.Source).filter(models.Source.source_type == source_type).all()
\ No newline at end of file
+        return self.db.query(models.Source).filter(models.Source.source_type == source_type).all()
+
+class AsyncSourceService:
+    """SourceService for async sessions; queries run without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_all_sources(self) -> List[models.Source]:
+        return await self.db.run_sync(lambda db: SourceService(db).get_all_sources())
+
+    async def get_source_by_id(self, source_id: UUID) -> Optional[models.Source]:
+        return await self.db.run_sync(lambda db: SourceService(db).get_source_by_id(source_id))
+
+    async def create_source(self, source: schemas.SourceCreate) -> models.Source:
+        return await self.db.run_sync(lambda db: SourceService(db).create_source(source))
+
+    async def update_source(self, source_id: UUID, source_update: schemas.SourceCreate) -> Optional[models.Source]:
+        return await self.db.run_sync(lambda db: SourceService(db).update_source(source_id, source_update))
+
+    async def delete_source(self, source_id: UUID) -> bool:
+        return await self.db.run_sync(lambda db: SourceService(db).delete_source(source_id))
+
+    async def get_active_sources(self) -> List[models.Source]:
+        return await self.db.run_sync(lambda db: SourceService(db).get_active_sources())
+
+    async def get_sources_by_type(self, source_type: models.SourceType) -> List[models.Source]:
+        return await self.db.run_sync(lambda db: SourceService(db).get_sources_by_type(source_type))
@@ -1,13 +1,13 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils.security import verify_token
-from app.services.auth_service import AuthService
-from database.connection import get_db
+from app.services.auth_service import AsyncAuthService
+from database.connection import get_async_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -15,8 +15,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     )
     
     username = verify_token(token, credentials_exception)
-    auth_service = AuthService(db)
-    user = auth_service.get_user_by_username(username)
+    auth_service = AsyncAuthService(db)
+    user = await auth_service.get_user_by_username(username)
     
     if user is None:
         raise credentials_exception
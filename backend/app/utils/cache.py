@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+DASHBOARD_CACHE_STALE_TTL = int(os.getenv("DASHBOARD_CACHE_STALE_TTL", "600"))
+
+class InProcessCacheBackend:
+    """Dictionary cache local to this process"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if not item:
+            return None
+        value, expires_at = item
+        if expires_at and expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else 0)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        await self.set(key, str(value))
+        return value
+
+class RedisCacheBackend:
+    """Cache shared by every API worker through Redis"""
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+def create_cache_backend(name: str = CACHE_BACKEND):
+    if name == "redis":
+        return RedisCacheBackend()
+    return InProcessCacheBackend()
+
+class SnapshotCache:
+    """Cached snapshot with TTL, single-flight rebuilds and stale-while-revalidate.
+
+    Entries carry the version counter they were built at; ``invalidate``
+    bumps the counter so writers mark the snapshot stale without deleting it.
+    Fresh entries are served directly, stale ones are served while a single
+    background rebuild runs, and missing ones are rebuilt once for all
+    concurrent callers.
+    """
+
+    def __init__(self, backend, key: str, ttl: int, stale_ttl: int):
+        self.backend = backend
+        self.key = key
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._version_key = f"{key}:version"
+        self._inflight: Optional[asyncio.Future] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        raw_entry = await self.backend.get(self.key)
+        if raw_entry is None:
+            self.misses += 1
+            return await self._rebuild(compute)
+
+        entry = json.loads(raw_entry)
+        age = time.time() - entry['created_at']
+        if age < self.ttl and entry['version'] == await self._version():
+            self.hits += 1
+            return entry['value']
+
+        # Serve the stale snapshot and refresh it in the background
+        self.stale_hits += 1
+        self._start_rebuild(compute)
+        return entry['value']
+
+    async def invalidate(self):
+        await self.backend.incr(self._version_key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'rebuilding': bool(self._inflight and not self._inflight.done())
+        }
+
+    async def _version(self) -> int:
+        return int(await self.backend.get(self._version_key) or 0)
+
+    def _start_rebuild(self, compute: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._build(compute))
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    async def _rebuild(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        # Shield so a cancelled request does not cancel the rebuild other callers await
+        return await asyncio.shield(self._start_rebuild(compute))
+
+    async def _build(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        # Read the version first so writes racing with the rebuild keep the entry stale
+        version = await self._version()
+        value = await compute()
+        entry = {'value': value, 'created_at': time.time(), 'version': version}
+        await self.backend.set(self.key, json.dumps(entry), self.stale_ttl)
+        return value
+
+    def _log_failure(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"Error rebuilding cache snapshot {self.key}: {future.exception()}")
+
+# Initialize global dashboard snapshot cache
+dashboard_cache = SnapshotCache(
+    create_cache_backend(), "dashboard:snapshot", DASHBOARD_CACHE_TTL, DASHBOARD_CACHE_STALE_TTL
+)
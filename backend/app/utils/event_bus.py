@@ -0,0 +1,126 @@
+import asyncio
+import enum
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+import structlog
+
+logger = structlog.get_logger()
+
+EVENT_BATCH_WINDOW = float(os.getenv("EVENT_BATCH_WINDOW", "0.5"))
+EVENT_MAX_BATCH = int(os.getenv("EVENT_MAX_BATCH", "500"))
+
+class EventType(str, enum.Enum):
+    incident_created = "incident.created"
+    incident_updated = "incident.updated"
+    incident_deleted = "incident.deleted"
+    source_scraped = "source.scraped"
+
+INCIDENT_EVENTS = (EventType.incident_created, EventType.incident_updated, EventType.incident_deleted)
+
+class Event(NamedTuple):
+    type: EventType
+    payload: Dict[str, Any]
+    timestamp: float
+
+EventHandler = Callable[[List[Event]], Awaitable[None]]
+
+class EventSubscription:
+    """A handler with its event types, batching window and pending events"""
+
+    def __init__(self, event_types: Iterable[EventType], handler: EventHandler, window: float, max_batch: int):
+        self.event_types = frozenset(event_types)
+        self.handler = handler
+        self.window = window
+        self.max_batch = max_batch
+        self.buffer: List[Event] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+class EventBus:
+    """In-process async event bus with per-subscriber batching.
+
+    ``publish`` is synchronous and never waits on subscribers, so services
+    can call it right after a commit. Each subscriber collects events for
+    its window (or until ``max_batch``) and then receives them as one list;
+    a burst of inserts becomes a few handler calls instead of one per row.
+    Events published outside a running event loop are dropped, with a
+    warning when a subscriber would have received them.
+    """
+
+    def __init__(self):
+        self._subscriptions: List[EventSubscription] = []
+        self._deliveries: Set[asyncio.Task] = set()
+        self.published = 0
+        self.dropped = 0
+        self.batches_delivered = 0
+
+    def subscribe(self, event_types: Iterable[EventType], handler: EventHandler,
+                  window: float = EVENT_BATCH_WINDOW, max_batch: int = EVENT_MAX_BATCH) -> EventSubscription:
+        subscription = EventSubscription(event_types, handler, window, max_batch)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+        if subscription.flush_handle:
+            subscription.flush_handle.cancel()
+
+    def publish(self, event_type: EventType, payload: Optional[Dict[str, Any]] = None):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside the event loop (e.g. CLI scripts, worker threads) no subscriber can be scheduled
+            self.dropped += 1
+            if any(event_type in subscription.event_types for subscription in self._subscriptions):
+                logger.warning(f"Dropping {event_type.value} event published outside the event loop")
+            return
+
+        event = Event(event_type, payload or {}, time.time())
+        self.published += 1
+        for subscription in self._subscriptions:
+            if event_type not in subscription.event_types:
+                continue
+
+            subscription.buffer.append(event)
+            if len(subscription.buffer) >= subscription.max_batch:
+                self._flush(subscription)
+            elif subscription.flush_handle is None:
+                subscription.flush_handle = loop.call_later(subscription.window, self._flush, subscription)
+
+    async def drain(self):
+        """Deliver everything pending, e.g. on shutdown"""
+        for subscription in self._subscriptions:
+            self._flush(subscription)
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'subscriptions': len(self._subscriptions),
+            'published': self.published,
+            'dropped': self.dropped,
+            'batches_delivered': self.batches_delivered,
+            'pending': sum(len(subscription.buffer) for subscription in self._subscriptions)
+        }
+
+    def _flush(self, subscription: EventSubscription):
+        if subscription.flush_handle:
+            subscription.flush_handle.cancel()
+            subscription.flush_handle = None
+
+        batch, subscription.buffer = subscription.buffer, []
+        if batch:
+            delivery = asyncio.ensure_future(self._deliver(subscription, batch))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, subscription: EventSubscription, batch: List[Event]):
+        try:
+            await subscription.handler(batch)
+            self.batches_delivered += 1
+        except Exception as e:
+            logger.error(f"Error handling {len(batch)} events in {subscription.handler.__qualname__}: {e}")
+
+# Initialize global event bus
+event_bus = EventBus()
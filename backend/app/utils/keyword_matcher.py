@@ -0,0 +1,133 @@
+from collections import deque
+from typing import Dict, List, NamedTuple, Tuple
+from app.utils.keyword_sets import KEYWORD_SETS
+
+class KeywordHit(NamedTuple):
+    keyword: str
+    category: str
+    weight: float
+    start: int
+    end: int
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every keyword category.
+
+    All categories are compiled into a single trie, so one pass over the
+    text finds every keyword of every category.
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Tuple[float, List[str]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # node -> [(keyword, [(category, weight, is_prefix), ...])]
+        self._output: List[List[Tuple[str, List[Tuple[str, float, bool]]]]] = [[]]
+        self._terminals: Dict[int, Tuple[str, List[Tuple[str, float, bool]]]] = {}
+        self._category_order: Dict[str, int] = {}
+        self._weights: Dict[str, float] = {}
+        self._keyword_order: Dict[Tuple[str, str], int] = {}
+
+        for category, (weight, keywords) in keyword_sets.items():
+            self._category_order[category] = len(self._category_order)
+            self._weights[category] = weight
+            for keyword in keywords:
+                self._add(keyword.lower(), category, weight)
+
+        self._build()
+
+    def _add(self, keyword: str, category: str, weight: float):
+        is_prefix = keyword.endswith('*')
+        keyword = keyword.rstrip('*')
+
+        node = 0
+        for char in keyword:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+
+        if node not in self._terminals:
+            self._terminals[node] = (keyword, [])
+        self._terminals[node][1].append((category, weight, is_prefix))
+        self._keyword_order.setdefault((category, keyword), len(self._keyword_order))
+
+    def _build(self):
+        """Compute failure links and merge outputs breadth-first"""
+        for node, terminal in self._terminals.items():
+            self._output[node].append(terminal)
+
+        # Depth-1 nodes keep the root as their failure link
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    @staticmethod
+    def _right_boundary(text: str, end: int) -> bool:
+        """True if a keyword ending at ``end`` stops at a word boundary (plurals allowed)"""
+        for suffix in ('', 's', 'es'):
+            position = end + len(suffix)
+            if suffix and not text.startswith(suffix, end):
+                continue
+            if position >= len(text) or not _is_word_char(text[position]):
+                return True
+        return False
+
+    def find_all(self, text: str) -> List[KeywordHit]:
+        """Return every keyword occurrence, for every category, in one pass"""
+        text = text.lower()
+        hits = []
+        node = 0
+
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            for keyword, entries in self._output[node]:
+                start = index - len(keyword) + 1
+                if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(keyword[0]):
+                    continue
+
+                right_ok = self._right_boundary(text, index + 1) or not _is_word_char(keyword[-1])
+                for category, weight, is_prefix in entries:
+                    if right_ok or is_prefix:
+                        hits.append(KeywordHit(keyword, category, weight, start, index + 1))
+
+        return hits
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Map each hit category to its distinct keywords, both in definition order"""
+        found: Dict[str, set] = {}
+        for hit in self.find_all(text):
+            found.setdefault(hit.category, set()).add(hit.keyword)
+
+        return {
+            category: sorted(found[category], key=lambda keyword: self._keyword_order[(category, keyword)])
+            for category in sorted(found, key=self._category_order.__getitem__)
+        }
+
+    def labels(self, matches: Dict[str, List[str]], group: str) -> List[str]:
+        """Labels of the ``group:label`` categories present in a match result"""
+        prefix = f"{group}:"
+        return [category[len(prefix):] for category in matches if category.startswith(prefix)]
+
+    def score(self, matches: Dict[str, List[str]], *categories: str) -> float:
+        """Sum of category weights over the distinct keywords that matched"""
+        return sum(self.weight(category) * len(matches.get(category, [])) for category in categories)
+
+    def weight(self, category: str) -> float:
+        return self._weights.get(category, 1.0)
+
+# Initialize global matcher instance (compiled once per process)
+keyword_matcher = KeywordMatcher(KEYWORD_SETS)
@@ -0,0 +1,69 @@
+"""Keyword dictionaries used by the scraping and classification heuristics.
+
+Each category maps to ``(weight, keywords)``. Keywords match on word
+boundaries (a trailing plural "s"/"es" is tolerated); a trailing ``*``
+turns a keyword into a prefix match, e.g. ``bank*`` matches "banking".
+Categories named ``group:label`` are read as labelled groups, in the order
+they are defined here.
+"""
+
+KEYWORD_SETS = {
+    # Indian relevance used by the scrapers (score = hits / 10)
+    'indian_relevance': (0.1, [
+        'india', 'indian', 'cert-in', 'nciipc', 'meity', 'dit',
+        'aadhaar', 'upi', 'digital india', 'cii', 'critical information infrastructure',
+        'mumbai', 'delhi', 'bangalore', 'hyderabad', 'chennai', 'kolkata',
+        'bharat', 'bharti', 'bsnl', 'airtel', 'jio', 'ongc', 'ntpc',
+        'sbi', 'icici', 'hdfc', 'axis bank', 'pnb', 'canara bank',
+        'indian railways', 'irctc', 'ril', 'tcs', 'infosys', 'wipro'
+    ]),
+
+    # Indian relevance tiers used by the ML threat classifier
+    'indian_relevance:high': (0.3, [
+        'india', 'indian', 'cert-in', 'nciipc', 'meity', 'dit',
+        'aadhaar', 'upi', 'digital india', 'cii', 'bharat'
+    ]),
+    'indian_relevance:medium': (0.1, [
+        'mumbai', 'delhi', 'bangalore', 'hyderabad', 'chennai', 'kolkata',
+        'pune', 'ahmedabad', 'surat', 'jaipur', 'lucknow', 'kanpur'
+    ]),
+    'indian_relevance:low': (0.05, [
+        'south asia', 'asia pacific', 'apac', 'emerging markets'
+    ]),
+
+    # CERT-In advisory severity and tags
+    'certin_severity:critical': (1.0, ['critical', 'high risk', 'severe']),
+    'certin_severity:high': (1.0, ['high', 'important']),
+    'certin_severity:medium': (1.0, ['medium', 'moderate']),
+    'certin_tag:malware': (1.0, ['malware', 'virus', 'trojan', 'ransomware']),
+    'certin_tag:vulnerability': (1.0, ['vulnerability', 'cve', 'exploit*', 'patch*']),
+    'certin_tag:phishing': (1.0, ['phishing', 'spoofing', 'social engineering']),
+    'certin_tag:ddos': (1.0, ['ddos', 'denial of service', 'botnet']),
+    'certin_tag:data_breach': (1.0, ['data breach', 'leak*', 'unauthorized access']),
+
+    # RSS / blog severity and tags
+    'rss_severity:high': (1.0, ['critical', 'zero-day', 'breach*', 'attack*']),
+    'rss_severity:medium': (1.0, ['vulnerability', 'exploit*', 'malware']),
+    'rss_tag:malware': (1.0, ['malware']),
+    'rss_tag:phishing': (1.0, ['phishing']),
+    'rss_tag:vulnerability': (1.0, ['vulnerability']),
+    'rss_tag:apt': (1.0, ['apt']),
+    'rss_tag:ransomware': (1.0, ['ransomware']),
+
+    # Sector detection, in priority order
+    'sector:banking': (1.0, ['bank*', 'financial', 'payment', 'atm', 'credit card', 'sbi', 'icici', 'hdfc']),
+    'sector:government': (1.0, ['government', 'ministry', 'dept', 'department', 'gov.in', 'nic', 'digital india']),
+    'sector:healthcare': (1.0, ['hospital', 'medical', 'health', 'patient', 'aiims', 'healthcare']),
+    'sector:energy': (1.0, ['power', 'electricity', 'grid', 'ntpc', 'ongc', 'oil', 'gas', 'energy']),
+    'sector:telecom': (1.0, ['telecom', 'mobile', 'phone', 'airtel', 'jio', 'bsnl', 'network']),
+    'sector:defense': (1.0, ['defense', 'military', 'army', 'navy', 'air force', 'drdo', 'isro']),
+    'sector:education': (1.0, ['university', 'college', 'school', 'education', 'student', 'academic']),
+    'sector:retail': (1.0, ['retail', 'shopping', 'ecommerce', 'flipkart', 'amazon', 'store']),
+
+    # Generic security vocabulary reported by the ML threat classifier
+    'security_keyword': (1.0, [
+        'malware', 'ransomware', 'phishing', 'ddos', 'vulnerability', 'exploit',
+        'breach', 'attack', 'threat', 'apt', 'backdoor', 'trojan', 'virus',
+        'spyware', 'botnet', 'zero-day', 'cve', 'patch', 'mitigation'
+    ]),
+}
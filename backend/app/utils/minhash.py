@@ -0,0 +1,53 @@
+"""MinHash signatures for near-duplicate detection.
+
+Pure functions with no app imports, so parse pool processes can compute
+signatures without loading the models or the database layer.
+"""
+import hashlib
+import random
+import re
+import sys
+from array import array
+from typing import List, Optional, Set, Tuple
+
+MINHASH_PERMUTATIONS = 128
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures are stored and must stay comparable across processes and restarts
+_random = random.Random(20240101)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+
+def shingles(text: str) -> Set[int]:
+    """Hashed word 3-grams of the normalized text"""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little") for gram in grams}
+
+def minhash_signature(title: Optional[str], description: Optional[str]) -> Optional[bytes]:
+    """128 MinHash values (little-endian uint32) over title and description, or None for empty text"""
+    hashed = shingles(f"{title or ''} {description or ''}")
+    if not hashed:
+        return None
+    signature = array("I", (min(((a * value + b) % _PRIME) & _MAX_HASH for value in hashed) for a, b in _PERMUTATIONS))
+    if sys.byteorder == "big":
+        signature.byteswap()
+    return signature.tobytes()
+
+def minhash_signatures(texts: List[Tuple[Optional[str], Optional[str]]]) -> List[Optional[bytes]]:
+    """Signatures of (title, description) pairs; one picklable call per batch for the parse pool"""
+    return [minhash_signature(title, description) for title, description in texts]
+
+def unpack_signature(signature: bytes) -> array:
+    values = array("I", signature)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def similarity(first: array, second: array) -> float:
+    """Estimated Jaccard similarity: the share of equal MinHash values"""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
@@ -0,0 +1,192 @@
+import os
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import models
+from app.utils.minhash import MINHASH_PERMUTATIONS, similarity, unpack_signature
+from app.utils.event_bus import Event, EventType
+import structlog
+
+logger = structlog.get_logger()
+
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+# Estimated Jaccard similarity of title+description shingles above which an incident is a duplicate
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))
+# Only incidents created within the window are indexed; reports of one event arrive within days
+NEAR_DUPLICATE_WINDOW_DAYS = int(os.getenv("NEAR_DUPLICATE_WINDOW_DAYS", "30"))
+NEAR_DUPLICATE_REFRESH_INTERVAL = int(os.getenv("NEAR_DUPLICATE_REFRESH_INTERVAL", "60"))
+
+# 16 bands of 8 rows: pairs become candidates around a similarity of (1/16) ** (1/8) ~= 0.71
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures.
+
+    Each signature is split into bands; items sharing any whole band are
+    candidates, and only candidates are compared. Lookups cost one dict
+    probe per band however many items are indexed.
+    """
+
+    def __init__(self, bands: int = LSH_BANDS, rows: int = LSH_ROWS):
+        self.bands = bands
+        self.rows = rows
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, Tuple[bytes, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def add(self, key: Hashable, signature: bytes):
+        if key in self._signatures:
+            return
+        self._signatures[key] = (signature, unpack_signature(signature))
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key: Hashable):
+        entry = self._signatures.pop(key, None)
+        if not entry:
+            return
+        for band, band_key in enumerate(self._band_keys(entry[0])):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, signature: bytes, threshold: float) -> Optional[Tuple[Hashable, float]]:
+        """The most similar indexed item at or above the threshold"""
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        if not candidates:
+            return None
+
+        values = unpack_signature(signature)
+        best = max(((key, similarity(values, self._signatures[key][1])) for key in candidates), key=lambda match: match[1])
+        return best if best[1] >= threshold else None
+
+    def bucket_count(self) -> int:
+        return sum(len(buckets) for buckets in self._buckets)
+
+    def _band_keys(self, signature: bytes) -> List[bytes]:
+        width = self.rows * 4
+        return [signature[band * width:(band + 1) * width] for band in range(self.bands)]
+
+class NearDuplicateMatch(NamedTuple):
+    # Exactly one of canonical_id (a stored incident) and batch_position (an earlier item of the batch) is set
+    canonical_id: Optional[UUID]
+    batch_position: Optional[int]
+    similarity: float
+
+class NearDuplicateIndex:
+    """LSH index of recent incidents for near-duplicate detection at ingest.
+
+    Signatures are stored with each incident, so loading the index reads
+    them back instead of re-shingling. Like the entity resolver, the index
+    refreshes itself on a TTL with incidents created since its last load
+    (including those inserted by other processes) and evicts incidents
+    that have left the window.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, window_days: int = NEAR_DUPLICATE_WINDOW_DAYS,
+                 refresh_interval: int = NEAR_DUPLICATE_REFRESH_INTERVAL, enabled: bool = NEAR_DUPLICATE_ENABLED):
+        self.threshold = threshold
+        self.window = timedelta(days=window_days)
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        self._lsh = LSHIndex()
+        self._added: Deque[Tuple[datetime, UUID]] = deque()
+        self._watermark: Optional[datetime] = None
+        self._checked_at: Optional[float] = None
+        self.duplicates_found = 0
+
+    def refresh_if_stale(self, db: Session):
+        if not self.enabled:
+            return
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        incidents = models.CyberIncident
+        since = self._watermark or datetime.utcnow() - self.window
+        rows = db.query(incidents.id, incidents.minhash_signature, incidents.created_at).filter(
+            incidents.created_at >= since,
+            incidents.minhash_signature.isnot(None)
+        ).order_by(incidents.created_at).all()
+
+        for incident_id, signature, created_at in rows:
+            self.add(incident_id, signature, created_at)
+        if rows:
+            self._watermark = rows[-1].created_at
+        elif self._watermark is None:
+            self._watermark = since
+        self._evict()
+        self._checked_at = time.monotonic()
+
+    def match_batch(self, signatures: List[Optional[bytes]]) -> List[Optional[NearDuplicateMatch]]:
+        """Match each signature against indexed incidents, then against earlier items of the batch"""
+        if not self.enabled:
+            return [None] * len(signatures)
+
+        batch = LSHIndex()
+        matches = []
+        for position, signature in enumerate(signatures):
+            match = None
+            if signature:
+                stored = self._lsh.query(signature, self.threshold)
+                earlier = None if stored else batch.query(signature, self.threshold)
+                if stored:
+                    match = NearDuplicateMatch(stored[0], None, stored[1])
+                elif earlier:
+                    match = NearDuplicateMatch(None, earlier[0], earlier[1])
+                else:
+                    batch.add(position, signature)
+            matches.append(match)
+
+        self.duplicates_found += sum(1 for match in matches if match)
+        return matches
+
+    def add(self, incident_id: UUID, signature: Optional[bytes], created_at: Optional[datetime] = None):
+        """Index a committed incident"""
+        if not self.enabled or not signature or incident_id in self._lsh:
+            return
+        self._lsh.add(incident_id, signature)
+        self._added.append((created_at or datetime.utcnow(), incident_id))
+
+    def remove(self, incident_id: UUID):
+        """Forget a deleted incident; its entry in the eviction queue is skipped when it expires"""
+        self._lsh.remove(incident_id)
+
+    async def handle_events(self, events: List[Event]):
+        """Event bus subscriber: drop deleted incidents so nothing is linked to them"""
+        for event in events:
+            if event.type == EventType.incident_deleted:
+                self.remove(event.payload['incident_id'])
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'indexed': len(self._lsh),
+            'buckets': self._lsh.bucket_count(),
+            'threshold': self.threshold,
+            'window_days': self.window.days,
+            'duplicates_found': self.duplicates_found
+        }
+
+    def _evict(self):
+        cutoff = datetime.utcnow() - self.window
+        while self._added and self._added[0][0] < cutoff:
+            _, incident_id = self._added.popleft()
+            self._lsh.remove(incident_id)
+
+# Initialize global near-duplicate index
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+WS_BACKPLANE = os.getenv("WS_BACKPLANE", "memory")
+WS_BACKPLANE_CHANNEL = os.getenv("WS_BACKPLANE_CHANNEL", "cyber-feed:ws")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# Published messages kept for clients resuming after a reconnect
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "1000"))
+
+MessageHandler = Callable[[str], Awaitable[None]]
+
+# KEYS: sequence counter, history list; ARGV: history size, channel, then the message parts
+PUBLISH_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+local payload = table.concat(ARGV, tostring(seq), 3)
+redis.call('RPUSH', KEYS[2], payload)
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[1]), -1)
+redis.call('PUBLISH', ARGV[2], payload)
+return seq
+"""
+
+class InProcessBackplane:
+    """Delivers published messages to handlers in this process only"""
+
+    name = "memory"
+
+    def __init__(self, history_size: int = WS_REPLAY_BUFFER_SIZE):
+        self._handlers: List[MessageHandler] = []
+        self._sequence = 0
+        self._history = deque(maxlen=history_size)
+
+    async def start(self, handler: MessageHandler):
+        self._handlers.append(handler)
+
+    async def publish(self, parts: List[str]) -> int:
+        """Number a message, keep it for replay and deliver it; the message is the parts joined by its sequence"""
+        self._sequence += 1
+        seq = self._sequence
+        payload = str(seq).join(parts)
+        self._history.append(payload)
+        for handler in self._handlers:
+            await handler(payload)
+        return seq
+
+    async def history(self) -> List[str]:
+        return list(self._history)
+
+    async def close(self):
+        self._handlers.clear()
+
+class RedisBackplane:
+    """Redis pub/sub channel shared by every API worker.
+
+    Each worker holds one subscription and hands every message to its
+    local handler, which fans it out to that worker's clients. Sequence
+    numbers (INCR) and the replay history (a capped list) also live in
+    Redis, so they are shared by every worker and survive restarts. One
+    script numbers, stores and publishes each message, so messages are
+    published in sequence order.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL, channel: str = WS_BACKPLANE_CHANNEL,
+                 history_size: int = WS_REPLAY_BUFFER_SIZE):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url, decode_responses=True)
+        self.channel = channel
+        self.history_size = history_size
+        self._sequence_key = f"{channel}:seq"
+        self._history_key = f"{channel}:history"
+        self._listener: Optional[asyncio.Task] = None
+        self._publish_script = self.client.register_script(PUBLISH_SCRIPT)
+
+    async def start(self, handler: MessageHandler):
+        self._listener = asyncio.create_task(self._listen(handler))
+
+    async def publish(self, parts: List[str]) -> int:
+        """Number a message, keep it for replay and deliver it; the message is the parts joined by its sequence"""
+        return await self._publish_script(
+            keys=[self._sequence_key, self._history_key],
+            args=[self.history_size, self.channel, *parts]
+        )
+
+    async def history(self) -> List[str]:
+        return await self.client.lrange(self._history_key, 0, -1)
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        await self.client.close()
+
+    async def _listen(self, handler: MessageHandler):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        await handler(message["data"])
+                    except Exception as e:
+                        logger.error(f"Error handling backplane message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Backplane subscription lost, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+def create_backplane(name: str = WS_BACKPLANE):
+    if name == "redis":
+        return RedisBackplane()
+    return InProcessBackplane()
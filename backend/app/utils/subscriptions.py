@@ -0,0 +1,89 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Optional, Set, Tuple
+from uuid import UUID
+from app.models import schemas
+
+# A bucket is (severity, sector_id); None stands for "any"
+BucketKey = Tuple[Optional[str], Optional[UUID]]
+
+class SubscriptionIndex:
+    """Incident alert subscriptions bucketed by severity and sector.
+
+    Each subscription is stored under every (severity, sector) pair it
+    accepts, with None as the wildcard. An alert only looks at the four
+    buckets it can fall into, then checks the remaining filters (source
+    type, tags, APT group, relevance) on those candidates.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[BucketKey, Set[Hashable]] = defaultdict(set)
+        self._subscriptions: Dict[Hashable, Tuple[schemas.IncidentSubscription, Tuple[BucketKey, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, subscriber: Hashable, subscription: schemas.IncidentSubscription):
+        """Add or replace the subscription of a subscriber"""
+        self.unsubscribe(subscriber)
+
+        severities = [severity.value for severity in subscription.severity] if subscription.severity else [None]
+        sector_ids = subscription.sector_ids or [None]
+        bucket_keys = tuple((severity, sector_id) for severity in severities for sector_id in sector_ids)
+
+        for bucket_key in bucket_keys:
+            self._buckets[bucket_key].add(subscriber)
+        self._subscriptions[subscriber] = (subscription, bucket_keys)
+
+    def unsubscribe(self, subscriber: Hashable):
+        entry = self._subscriptions.pop(subscriber, None)
+        if not entry:
+            return
+
+        for bucket_key in entry[1]:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(subscriber)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def match(self, alert: schemas.IncidentAlert) -> Set[Hashable]:
+        """Subscribers whose filters accept the alert"""
+        severity = alert.severity.value
+        candidates = set()
+        for bucket_key in ((severity, alert.sector_id), (severity, None), (None, alert.sector_id), (None, None)):
+            candidates.update(self._buckets.get(bucket_key, ()))
+
+        return {
+            subscriber for subscriber in candidates
+            if self._accepts(self._subscriptions[subscriber][0], alert)
+        }
+
+    def accepts(self, subscriber: Hashable, alert: schemas.IncidentAlert) -> bool:
+        """Whether one subscriber's filters accept the alert"""
+        entry = self._subscriptions.get(subscriber)
+        if not entry:
+            return False
+
+        subscription = entry[0]
+        if subscription.severity and alert.severity not in subscription.severity:
+            return False
+        if subscription.sector_ids and alert.sector_id not in subscription.sector_ids:
+            return False
+        return self._accepts(subscription, alert)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'subscriptions': len(self._subscriptions), 'buckets': len(self._buckets)}
+
+    @staticmethod
+    def _accepts(subscription: schemas.IncidentSubscription, alert: schemas.IncidentAlert) -> bool:
+        """Filters not covered by the bucket key"""
+        if subscription.source_types and alert.source_type not in subscription.source_types:
+            return False
+        if subscription.apt_group_ids and alert.apt_group_id not in subscription.apt_group_ids:
+            return False
+        if subscription.tags and not set(subscription.tags).intersection(alert.tags):
+            return False
+        if subscription.min_relevance_score is not None and \
+                (alert.relevance_score or 0.0) < subscription.min_relevance_score:
+            return False
+        return True
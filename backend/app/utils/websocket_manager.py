@@ -1,48 +1,361 @@
 from fastapi import WebSocket
-from typing import List
+from pydantic import ValidationError
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Set
 import json
 import asyncio
+import os
+import time
+import structlog
+from app.models import schemas
+from app.utils.subscriptions import SubscriptionIndex
+from app.utils.pubsub import create_backplane
+from app.utils.event_bus import Event, EventType
+
+logger = structlog.get_logger()
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+# What to do with a client whose queue is full: "coalesce" keeps only the latest
+# message of each type until it catches up, "drop" disconnects it
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "coalesce")
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+WS_ALERT_BATCH_SIZE = int(os.getenv("WS_ALERT_BATCH_SIZE", "100"))
+
+class ClientConnection:
+    """A WebSocket with its bounded outbound queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        # Latest message per type while the client is lagging
+        self.coalesced: Dict[str, str] = {}
+        self.lagging = False
+        self.skipped = 0
+        self.sent = 0
 
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """Fans messages out to WebSocket clients without waiting on any of them.
+
+    Each connection has a bounded queue drained by its own writer task, so
+    a broadcast only serializes once and enqueues; a slow client delays
+    nobody but itself. Clients whose queue fills up are either coalesced
+    (latest message per type, then a "lagged" notice) or disconnected,
+    depending on WS_SLOW_CLIENT_POLICY. Incident alerts only go to the
+    clients whose subscription filters accept them.
+
+    Broadcasts are published on a backplane (in-process or Redis) and every
+    worker fans them out to its own clients, so an alert raised in one
+    worker reaches clients connected to any of them. The client message is
+    serialized once by the publisher and forwarded verbatim.
+
+    Every broadcast carries a sequence number and is kept in the
+    backplane's replay history; a reconnecting client sends its last seen
+    sequence and gets only the gap, or "snapshot_required" when the gap is
+    older than the history.
+    """
+
+    def __init__(self, queue_size: int = WS_QUEUE_SIZE, slow_client_policy: str = WS_SLOW_CLIENT_POLICY,
+                 backplane=None):
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.backplane = backplane or create_backplane()
+        self.messages_published = 0
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.subscriptions = SubscriptionIndex()
+        self.messages_broadcast = 0
+        self.clients_evicted = 0
+        self.last_fanout_seconds = 0.0
+        self.max_fanout_seconds = 0.0
+        self._delivery_latencies: Deque[float] = deque(maxlen=1000)
+        # Closes of evicted clients, kept so they are not garbage collected mid-close
+        self._closing: Set[asyncio.Task] = set()
+
+    @property
+    def active_connections(self):
+        return list(self.clients)
+
+    async def start(self):
+        """Subscribe this worker to the backplane"""
+        await self.backplane.start(self._on_backplane_message)
+
+    async def close(self):
+        await self.backplane.close()
+        await asyncio.gather(*self._closing, return_exceptions=True)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(websocket, self.queue_size)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.clients[websocket] = client
+        # Every alert until the client subscribes with filters
+        self.subscriptions.subscribe(websocket, schemas.IncidentSubscription())
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.subscriptions.unsubscribe(websocket)
+        client = self.clients.pop(websocket, None)
+        if client and client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
+        client = self.clients.get(websocket)
+        if client:
+            self._enqueue(client, message, None)
+
+    async def handle_client_message(self, websocket: WebSocket, raw_message: str):
+        """Apply subscribe and resume messages; anything else is ignored.
+
+        {"type": "subscribe", "filters": {...}} narrows the alerts the client
+        receives; {"type": "resume", "last_seq": n} replays what it missed.
+        """
         try:
-            await websocket.send_text(message)
-        except:
-            self.disconnect(websocket)
-
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
-        
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+            message = json.loads(raw_message)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+
+        if message.get("type") == "subscribe":
+            await self._subscribe(websocket, message.get("filters") or {})
+        elif message.get("type") == "resume" and isinstance(message.get("last_seq"), int):
+            await self._resume(websocket, message["last_seq"])
+
+    async def broadcast(self, message: dict):
+        await self._publish(message["type"], message.get("data"))
 
     async def broadcast_incident_alert(self, incident_data: dict):
-        message = json.dumps({
-            "type": "incident_alert",
-            "data": incident_data
+        alert = schemas.IncidentAlert.model_validate(incident_data).model_dump(mode="json")
+        await self._publish("incident_alert", alert, alert=alert)
+
+    async def broadcast_incident_alerts(self, incidents_data: List[dict]):
+        """Publish alerts as one batch; each client receives the alerts its subscription accepts"""
+        alerts = [schemas.IncidentAlert.model_validate(data).model_dump(mode="json") for data in incidents_data]
+        await self._publish("incident_alerts", None, alerts=alerts)
+
+    async def handle_events(self, events: List[Event]):
+        """Event bus handler: batched incident alerts plus one dashboard update per batch"""
+        created = [event.payload for event in events if event.type == EventType.incident_created]
+        for start in range(0, len(created), WS_ALERT_BATCH_SIZE):
+            await self.broadcast_incident_alerts(created[start:start + WS_ALERT_BATCH_SIZE])
+
+        await self.broadcast_dashboard_update({
+            "events": dict(Counter(event.type.value for event in events)),
+            "sources_scraped": [
+                event.payload["source_name"] for event in events if event.type == EventType.source_scraped
+            ]
         })
-        await self.broadcast(message)
 
     async def broadcast_dashboard_update(self, dashboard_data: dict):
-        message = json.dumps({
+        await self.broadcast({
             "type": "dashboard_update",
             "data": dashboard_data
         })
-        await self.broadcast(message)
\ No newline at end of file
+
+    def get_stats(self) -> Dict[str, Any]:
+        depths = [client.queue.qsize() for client in self.clients.values()]
+        latencies = sorted(self._delivery_latencies)
+        return {
+            'connections': len(self.clients),
+            'lagging_connections': sum(1 for client in self.clients.values() if client.lagging),
+            'queue_depth_total': sum(depths),
+            'queue_depth_max': max(depths, default=0),
+            'messages_broadcast': self.messages_broadcast,
+            'clients_evicted': self.clients_evicted,
+            'last_fanout_ms': round(self.last_fanout_seconds * 1000, 3),
+            'max_fanout_ms': round(self.max_fanout_seconds * 1000, 3),
+            'delivery_latency_p50_ms': self._percentile_ms(latencies, 0.5),
+            'delivery_latency_p99_ms': self._percentile_ms(latencies, 0.99),
+            'slow_client_policy': self.slow_client_policy,
+            'backplane': self.backplane.name,
+            'messages_published': self.messages_published,
+            **self.subscriptions.get_stats()
+        }
+
+    async def _subscribe(self, websocket: WebSocket, filters: dict):
+        try:
+            subscription = schemas.IncidentSubscription.model_validate(filters)
+        except ValidationError as e:
+            await self.send_personal_message(json.dumps({"type": "error", "data": {"detail": str(e)}}), websocket)
+            return
+
+        self.subscriptions.subscribe(websocket, subscription)
+        await self.send_personal_message(json.dumps({
+            "type": "subscribed",
+            "data": subscription.model_dump(mode="json", exclude_none=True)
+        }), websocket)
+
+    async def _resume(self, websocket: WebSocket, last_seq: int):
+        """Replay the broadcasts after last_seq, or ask for a snapshot if they aged out"""
+        entries = sorted(
+            (self._parse(payload) for payload in await self.backplane.history()),
+            key=lambda entry: entry[0]["seq"]
+        )
+        latest_seq = entries[-1][0]["seq"] if entries else None
+
+        # Nothing to resume from, a gap older than the buffer, or a sequence from before a reset
+        if latest_seq is None or last_seq < entries[0][0]["seq"] - 1 or last_seq > latest_seq:
+            await self.send_personal_message(json.dumps({
+                "type": "snapshot_required",
+                "data": {"last_seq": latest_seq}
+            }), websocket)
+            return
+
+        missed = [(header, message) for header, message in entries if header["seq"] > last_seq]
+        for header, message in missed:
+            self._route(header, message, [websocket])
+
+        await self.send_personal_message(json.dumps({
+            "type": "resumed",
+            "data": {"replayed": len(missed), "last_seq": latest_seq}
+        }), websocket)
+
+    async def _publish(self, message_type: str, data: Any, alert: Optional[dict] = None,
+                       alerts: Optional[List[dict]] = None):
+        """Number, serialize and publish a broadcast, keeping it for replay.
+
+        The routing header goes on the first line, then the client message
+        as serialized here; alert batches are serialized per subscriber
+        group by each worker instead.
+        """
+        # The backplane numbers the message as it publishes it, joining these parts with the sequence
+        header = json.dumps({"type": message_type, "alert": alert, "alerts": alerts})
+        parts = ['{"seq": ', f', {header[1:]}\n']
+        if alerts is None:
+            parts[-1] += f'{{"type": {json.dumps(message_type)}, "seq": '
+            parts.append(f', "data": {json.dumps(data)}}}')
+        await self.backplane.publish(parts)
+        self.messages_published += 1
+
+    async def _on_backplane_message(self, payload: str):
+        header, message = self._parse(payload)
+        self._route(header, message)
+
+    @staticmethod
+    def _parse(payload: str):
+        header, message = payload.split("\n", 1)
+        return json.loads(header), message
+
+    def _route(self, header: dict, message: str, websockets: Optional[List[WebSocket]] = None):
+        """Deliver a published message to the local clients (default: all) that accept it"""
+        if header.get("alerts") is not None:
+            self._fan_out_alerts(header["seq"], header["alerts"], websockets)
+            return
+
+        if header["alert"] is not None:
+            alert = schemas.IncidentAlert.model_validate(header["alert"])
+            if websockets is None:
+                websockets = self.subscriptions.match(alert)
+            else:
+                websockets = [websocket for websocket in websockets if self.subscriptions.accepts(websocket, alert)]
+        elif websockets is None:
+            websockets = list(self.clients)
+
+        recipients = [self.clients[websocket] for websocket in websockets if websocket in self.clients]
+        self._fan_out(recipients, message, header["type"])
+
+    def _fan_out_alerts(self, seq: int, alerts: List[dict], websockets: Optional[List[WebSocket]] = None):
+        """Send each client the alerts of a batch it subscribed to, serializing once per distinct subset"""
+        matched: Dict[WebSocket, List[int]] = defaultdict(list)
+        for index, alert_data in enumerate(alerts):
+            alert = schemas.IncidentAlert.model_validate(alert_data)
+            if websockets is None:
+                accepted = self.subscriptions.match(alert)
+            else:
+                accepted = [websocket for websocket in websockets if self.subscriptions.accepts(websocket, alert)]
+            for websocket in accepted:
+                matched[websocket].append(index)
+
+        groups: Dict[tuple, List[ClientConnection]] = defaultdict(list)
+        for websocket, indexes in matched.items():
+            if websocket in self.clients:
+                groups[tuple(indexes)].append(self.clients[websocket])
+
+        for indexes, clients in groups.items():
+            message = json.dumps({
+                "type": "incident_alerts",
+                "seq": seq,
+                "data": [alerts[index] for index in indexes]
+            })
+            self._fan_out(clients, message, "incident_alerts")
+
+    def _fan_out(self, clients, message: str, message_type: Optional[str]):
+        started = time.perf_counter()
+        for client in clients:
+            self._enqueue(client, message, message_type)
+
+        self.messages_broadcast += 1
+        self.last_fanout_seconds = time.perf_counter() - started
+        self.max_fanout_seconds = max(self.max_fanout_seconds, self.last_fanout_seconds)
+
+    def _enqueue(self, client: ClientConnection, message: str, message_type: Optional[str]):
+        if client.lagging:
+            self._coalesce(client, message, message_type)
+            return
+
+        try:
+            client.queue.put_nowait((time.perf_counter(), message))
+        except asyncio.QueueFull:
+            if self.slow_client_policy == "drop":
+                self._evict(client)
+            else:
+                client.lagging = True
+                self._coalesce(client, message, message_type)
+
+    def _coalesce(self, client: ClientConnection, message: str, message_type: Optional[str]):
+        client.skipped += 1
+        # Untyped messages have nothing to be coalesced with and are skipped
+        if message_type:
+            client.coalesced[message_type] = message
+
+    def _evict(self, client: ClientConnection):
+        logger.warning(f"Disconnecting slow WebSocket client ({client.queue.qsize()} messages queued)")
+        self.clients_evicted += 1
+        self.disconnect(client.websocket)
+        # 1013: try again later
+        task = asyncio.create_task(self._close(client.websocket, 1013))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _catch_up(self, client: ClientConnection):
+        """Queue the coalesced messages once a lagging client has drained its queue.
+
+        Only as many as fit are queued; the client stays lagging and the rest
+        follow the next time its queue drains.
+        """
+        now = time.perf_counter()
+        if client.skipped:
+            client.queue.put_nowait((now, json.dumps({"type": "lagged", "data": {"skipped": client.skipped}})))
+            client.skipped = 0
+        while client.coalesced and not client.queue.full():
+            message_type = next(iter(client.coalesced))
+            client.queue.put_nowait((now, client.coalesced.pop(message_type)))
+        client.lagging = bool(client.coalesced)
+
+    async def _writer(self, client: ClientConnection):
+        try:
+            while True:
+                enqueued_at, message = await client.queue.get()
+                await asyncio.wait_for(client.websocket.send_text(message), WS_SEND_TIMEOUT)
+                client.sent += 1
+                self._delivery_latencies.append(time.perf_counter() - enqueued_at)
+
+                if client.lagging and client.queue.empty():
+                    self._catch_up(client)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WebSocket client send failed: {e}")
+            self.disconnect(client.websocket)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _percentile_ms(sorted_values, fraction: float) -> Optional[float]:
+        if not sorted_values:
+            return None
+        index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+        return round(sorted_values[index] * 1000, 3)
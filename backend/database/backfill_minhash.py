@@ -0,0 +1,39 @@
+"""Compute the MinHash signatures of incidents stored without one (before near-duplicate detection).
+
+Usage (from the backend directory): python -m database.backfill_minhash
+"""
+from database.connection import SessionLocal
+from app.models import models
+from app.utils.minhash import minhash_signature
+
+BATCH_SIZE = 1000
+
+def main():
+    db = SessionLocal()
+    filled = 0
+    last_id = None
+    try:
+        while True:
+            # Keyset over id, so incidents whose text has no signature are not fetched again
+            query = db.query(models.CyberIncident.id, models.CyberIncident.title, models.CyberIncident.description)\
+                      .filter(models.CyberIncident.minhash_signature.is_(None))
+            if last_id is not None:
+                query = query.filter(models.CyberIncident.id > last_id)
+            rows = query.order_by(models.CyberIncident.id).limit(BATCH_SIZE).all()
+            if not rows:
+                break
+
+            updates = [
+                {'id': row.id, 'minhash_signature': minhash_signature(row.title, row.description)}
+                for row in rows
+            ]
+            db.bulk_update_mappings(models.CyberIncident, [update for update in updates if update['minhash_signature']])
+            db.commit()
+            filled += sum(1 for update in updates if update['minhash_signature'])
+            last_id = rows[-1].id
+        print(f"Backfilled MinHash signatures: {filled} incidents")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Rebuild the incident_daily_rollups table from cyber_incidents.
+
+Usage (from the backend directory): python -m database.rebuild_rollups
+"""
+from database.connection import SessionLocal
+from app.services.rollup_service import RollupService
+
+def main():
+    db = SessionLocal()
+    try:
+        written = RollupService(db).rebuild()
+        print(f"Rebuilt incident rollups: {written} rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
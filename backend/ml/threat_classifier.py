@@ -1,70 +1,162 @@
-import spacy
 import pickle
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
-from typing import List, Dict, Any, Tuple
-import numpy as np
+from typing import List, Dict, Any, Tuple, Optional, TYPE_CHECKING
 from app.models.models import IncidentSeverity
+from app.utils.keyword_matcher import keyword_matcher
+import structlog
+import threading
 import re
 import os
 
+if TYPE_CHECKING:
+    # spaCy, scikit-learn and numpy are imported lazily to keep process startup fast
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
+
+logger = structlog.get_logger()
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative paths are resolved against the backend directory, not the CWD
+ML_MODEL_PATH = os.path.join(_BACKEND_DIR, os.getenv("ML_MODEL_PATH", "ml/models"))
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+ML_TRAIN_IF_MISSING = os.getenv("ML_TRAIN_IF_MISSING", "true").lower() == "true"
+# Load the models in the background when a process starts instead of on first use
+ML_WARMUP_ON_STARTUP = os.getenv("ML_WARMUP_ON_STARTUP", "true").lower() == "true"
+MODEL_BUNDLE_FILE = "threat_classifier.joblib"
+
 class ThreatClassifier:
     """ML model for classifying cyber threats and determining relevance to Indian cyber space"""
     
-    def __init__(self):
+    def __init__(self, models_dir: str = ML_MODEL_PATH):
+        self.models_dir = os.path.abspath(models_dir)
         self.nlp = None
         self.severity_classifier = None
         self.relevance_classifier = None
         self.category_classifier = None
         self.models_loaded = False
-        
-    def load_models(self):
-        """Load pre-trained models or train new ones if they don't exist"""
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+        self.warm_up_error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        """True once the models are loaded and warmed up"""
+        return self._ready.is_set()
+
+    @property
+    def status(self) -> str:
+        """loading, ready or failed"""
+        if self._ready.is_set():
+            return "ready"
+        return "failed" if self.warm_up_error else "loading"
+
+    def start_warm_up(self) -> threading.Thread:
+        """Load and warm the models in a background thread"""
+        thread = threading.Thread(target=self.warm_up, name="threat-classifier-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def warm_up(self):
+        """Load the models and run one classification so first requests are fast"""
         try:
-            # Load spaCy model
-            self.nlp = spacy.load("en_core_web_sm")
+            self.load_models()
+            self.classify_batch([{'title': 'CERT-In warm-up advisory for Indian banking malware'}])
+        except Exception as e:
+            # Stay not ready: a process that cannot load its models should not take traffic
+            self.warm_up_error = str(e)
+            logger.error(f"Threat classifier warm-up failed: {e}")
+            return
+        self.warm_up_error = None
+        self._ready.set()
+        logger.info("Threat classifier ready", models_dir=self.models_dir)
+
+    def load_models(self):
+        """Load pre-trained models, training new ones only if allowed and none exist"""
+        with self._load_lock:
+            if self.models_loaded:
+                return
             
-            # Try to load existing models
-            models_dir = "ml/models"
-            if os.path.exists(f"{models_dir}/severity_classifier.pkl"):
-                with open(f"{models_dir}/severity_classifier.pkl", 'rb') as f:
-                    self.severity_classifier = pickle.load(f)
-                    
-            if os.path.exists(f"{models_dir}/relevance_classifier.pkl"):
-                with open(f"{models_dir}/relevance_classifier.pkl", 'rb') as f:
-                    self.relevance_classifier = pickle.load(f)
-                    
-            if os.path.exists(f"{models_dir}/category_classifier.pkl"):
-                with open(f"{models_dir}/category_classifier.pkl", 'rb') as f:
-                    self.category_classifier = pickle.load(f)
+            self.nlp = self._load_spacy()
             
-            # If models don't exist, train them with sample data
-            if not all([self.severity_classifier, self.relevance_classifier, self.category_classifier]):
-                self._train_models()
-                
-            self.models_loaded = True
+            if not self._load_bundle() and not self._load_legacy_pickles():
+                if not ML_TRAIN_IF_MISSING:
+                    logger.warning(f"No threat classifier models in {self.models_dir}; using keyword heuristics")
+                else:
+                    logger.warning(f"No threat classifier models in {self.models_dir}; training from sample data")
+                    self._train_models()
             
+            self.models_loaded = True
+
+    def _load_spacy(self):
+        try:
+            import spacy
+            return spacy.load(SPACY_MODEL)
         except Exception as e:
-            print(f"Error loading models: {e}")
-            self._train_models()
+            logger.warning(f"spaCy model {SPACY_MODEL} unavailable, entity extraction disabled: {e}")
+            return None
+
+    def _load_bundle(self) -> bool:
+        """Load the joblib bundle, memory-mapping its arrays"""
+        bundle_path = os.path.join(self.models_dir, MODEL_BUNDLE_FILE)
+        if not os.path.exists(bundle_path):
+            return False
+        
+        try:
+            import joblib
+            bundle = joblib.load(bundle_path, mmap_mode='r')
+            self.severity_classifier = bundle['severity']
+            self.relevance_classifier = bundle['relevance']
+            self.category_classifier = bundle['category']
+            return True
+        except Exception as e:
+            logger.error(f"Error loading model bundle {bundle_path}: {e}")
+            return False
+
+    def _load_legacy_pickles(self) -> bool:
+        """Load models saved as one pickle per classifier by older versions"""
+        paths = {
+            name: os.path.join(self.models_dir, f"{name}_classifier.pkl")
+            for name in ('severity', 'relevance', 'category')
+        }
+        if not all(os.path.exists(path) for path in paths.values()):
+            return False
+        
+        try:
+            loaded = {}
+            for name, path in paths.items():
+                with open(path, 'rb') as f:
+                    loaded[name] = pickle.load(f)
+        except Exception as e:
+            logger.error(f"Error loading legacy models from {self.models_dir}: {e}")
+            return False
+        
+        self.severity_classifier = loaded['severity']
+        self.relevance_classifier = loaded['relevance']
+        self.category_classifier = loaded['category']
+        self._share_vectorizers()
+        return True
 
     def _train_models(self):
         """Train classification models with sample data"""
-        print("Training ML models...")
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        logger.info("Training ML models...")
         
         # Sample training data (in production, this would come from a larger dataset)
         training_data = self._get_sample_training_data()
         
+        # One vectorizer shared by all three models, so a batch is transformed once
+        vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        features = vectorizer.fit_transform([item['text'] for item in training_data])
+        
         # Train severity classifier
-        self._train_severity_classifier(training_data)
+        self._train_severity_classifier(training_data, vectorizer, features)
         
         # Train relevance classifier
-        self._train_relevance_classifier(training_data)
+        self._train_relevance_classifier(training_data, vectorizer, features)
         
         # Train category classifier
-        self._train_category_classifier(training_data)
+        self._train_category_classifier(training_data, vectorizer, features)
         
         # Save models
         self._save_models()
@@ -134,86 +226,160 @@ class ThreatClassifier:
             }
         ]
 
-    def _train_severity_classifier(self, training_data: List[Dict[str, Any]]):
+    def _train_severity_classifier(self, training_data: List[Dict[str, Any]], vectorizer: 'TfidfVectorizer', features):
         """Train the severity classification model"""
-        texts = [item['text'] for item in training_data]
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+        
         severities = [item['severity'] for item in training_data]
         
         self.severity_classifier = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=1000, stop_words='english')),
-            ('classifier', MultinomialNB())
+            ('tfidf', vectorizer),
+            ('classifier', MultinomialNB().fit(features, severities))
         ])
-        
-        self.severity_classifier.fit(texts, severities)
 
-    def _train_relevance_classifier(self, training_data: List[Dict[str, Any]]):
+    def _train_relevance_classifier(self, training_data: List[Dict[str, Any]], vectorizer: 'TfidfVectorizer', features):
         """Train the relevance scoring model"""
-        texts = [item['text'] for item in training_data]
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+        
         relevances = [1 if item['relevance'] > 0.5 else 0 for item in training_data]
         
         self.relevance_classifier = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=1000, stop_words='english')),
-            ('classifier', MultinomialNB())
+            ('tfidf', vectorizer),
+            ('classifier', MultinomialNB().fit(features, relevances))
         ])
-        
-        self.relevance_classifier.fit(texts, relevances)
 
-    def _train_category_classifier(self, training_data: List[Dict[str, Any]]):
+    def _train_category_classifier(self, training_data: List[Dict[str, Any]], vectorizer: 'TfidfVectorizer', features):
         """Train the category classification model"""
-        texts = [item['text'] for item in training_data]
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+        
         categories = [item['category'] for item in training_data]
         
         self.category_classifier = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=1000, stop_words='english')),
-            ('classifier', MultinomialNB())
+            ('tfidf', vectorizer),
+            ('classifier', MultinomialNB().fit(features, categories))
         ])
-        
-        self.category_classifier.fit(texts, categories)
+
+    def _share_vectorizers(self):
+        """Point pipelines whose fitted vectorizers are identical at a single instance.
+
+        Separately pickled models each carry their own copy; sharing one lets
+        classify_batch transform the texts once for all three models.
+        """
+        import numpy as np
+        
+        pipelines = [p for p in (self.severity_classifier, self.relevance_classifier, self.category_classifier) if p]
+        for pipeline in pipelines[1:]:
+            shared = pipelines[0].steps[0][1]
+            vectorizer = pipeline.steps[0][1]
+            if (vectorizer is not shared
+                    and getattr(vectorizer, 'vocabulary_', None) == getattr(shared, 'vocabulary_', None)
+                    and np.array_equal(getattr(vectorizer, 'idf_', None), getattr(shared, 'idf_', None))):
+                pipeline.steps[0] = (pipeline.steps[0][0], shared)
 
     def _save_models(self):
-        """Save trained models to disk"""
-        models_dir = "ml/models"
-        os.makedirs(models_dir, exist_ok=True)
-        
-        with open(f"{models_dir}/severity_classifier.pkl", 'wb') as f:
-            pickle.dump(self.severity_classifier, f)
-            
-        with open(f"{models_dir}/relevance_classifier.pkl", 'wb') as f:
-            pickle.dump(self.relevance_classifier, f)
-            
-        with open(f"{models_dir}/category_classifier.pkl", 'wb') as f:
-            pickle.dump(self.category_classifier, f)
+        """Save trained models to disk as one bundle (keeps the shared vectorizer shared)"""
+        import joblib
+        
+        os.makedirs(self.models_dir, exist_ok=True)
+        bundle_path = os.path.join(self.models_dir, MODEL_BUNDLE_FILE)
+        
+        # Uncompressed so numpy arrays can be memory-mapped on load
+        joblib.dump({
+            'severity': self.severity_classifier,
+            'relevance': self.relevance_classifier,
+            'category': self.category_classifier
+        }, bundle_path)
+        logger.info(f"Saved threat classifier models to {bundle_path}")
 
     def classify_incident(self, title: str, description: str = "", content: str = "") -> Dict[str, Any]:
         """Classify an incident and return predictions"""
+        return self.classify_batch([{'title': title, 'description': description, 'content': content}])[0]
+
+    def classify_batch(self, incidents: List[Dict[str, Any]], batch_size: int = 64,
+                       entities: bool = True) -> List[Dict[str, Any]]:
+        """Classify many incidents at once, returning predictions in input order.
+
+        Each incident is a dict with ``title`` and optional ``description`` and
+        ``content``. Texts are vectorized once per distinct vectorizer, the
+        three models predict over the shared sparse matrix, and entities are
+        extracted with ``nlp.pipe`` unless ``entities`` is False.
+        """
         if not self.models_loaded:
             self.load_models()
         
-        # Combine all text
-        full_text = f"{title} {description} {content}".strip()
+        if not incidents:
+            return []
         
-        # Extract features
-        entities = self._extract_entities(full_text)
-        keywords = self._extract_security_keywords(full_text)
-        indian_relevance = self._calculate_indian_relevance(full_text)
+        # Combine all text
+        texts = [
+            f"{incident.get('title') or ''} {incident.get('description') or ''} {incident.get('content') or ''}".strip()
+            for incident in incidents
+        ]
         
-        # Predict severity
-        severity = self.predict_severity(full_text)
+        features = {}
+        severities = self._predict_batch(self.severity_classifier, texts, features, 'medium')
+        categories = self._predict_batch(self.category_classifier, texts, features, 'unknown')
+        relevance_probs = self._predict_relevance_batch(texts, features)
+        extracted = self._extract_entities_batch(texts, batch_size) if entities else [[] for _ in texts]
         
-        # Predict category
-        category = self.predict_category(full_text)
+        results = []
+        for i, text in enumerate(texts):
+            matches = keyword_matcher.match(text)
+            indian_relevance = self._indian_relevance_from_matches(matches)
+            
+            if relevance_probs is None:
+                relevance_score = indian_relevance
+            else:
+                # Weighted average of model probability and keyword-based relevance
+                relevance_score = min(max((relevance_probs[i] * 0.7) + (indian_relevance * 0.3), 0.0), 1.0)
+            
+            results.append({
+                'severity': severities[i],
+                'category': categories[i],
+                'relevance_score': relevance_score,
+                'entities': extracted[i],
+                'keywords': matches.get('security_keyword', []),
+                'indian_relevance': indian_relevance
+            })
+        
+        return results
+
+    def _transform_batch(self, pipeline: 'Pipeline', texts: List[str], features: Dict):
+        """Vectorize texts for a pipeline, reusing the matrix of an identical vectorizer"""
+        transformers = pipeline[:-1]
+        key = tuple(id(step) for _, step in transformers.steps)
+        if key not in features:
+            features[key] = transformers.transform(texts)
+        return features[key]
+
+    def _predict_batch(self, pipeline: 'Pipeline', texts: List[str], features: Dict, default: str) -> List[str]:
+        if not pipeline:
+            return [default] * len(texts)
         
-        # Calculate relevance score
-        relevance_score = self.calculate_relevance_score(full_text)
+        try:
+            matrix = self._transform_batch(pipeline, texts, features)
+            return list(pipeline.steps[-1][1].predict(matrix))
+        except Exception:
+            return [default] * len(texts)
+
+    def _predict_relevance_batch(self, texts: List[str], features: Dict) -> Optional[List[float]]:
+        """Probability of each text being relevant, or None when the model is unavailable"""
+        if not self.relevance_classifier:
+            return None
         
-        return {
-            'severity': severity,
-            'category': category,
-            'relevance_score': relevance_score,
-            'entities': entities,
-            'keywords': keywords,
-            'indian_relevance': indian_relevance
-        }
+        try:
+            matrix = self._transform_batch(self.relevance_classifier, texts, features)
+            classifier = self.relevance_classifier.steps[-1][1]
+            probabilities = classifier.predict_proba(matrix)
+            classes = list(classifier.classes_)
+            if 1 not in classes or len(classes) < 2:
+                return [0.5] * len(texts)
+            return list(probabilities[:, classes.index(1)])
+        except Exception:
+            return None
 
     def predict_severity(self, text: str) -> str:
         """Predict incident severity"""
@@ -269,63 +435,50 @@ class ThreatClassifier:
                 entities.append({
                     'text': ent.text,
                     'label': ent.label_,
-                    'description': spacy.explain(ent.label_) or ent.label_
+                    'description': self._explain(ent.label_)
                 })
             
             return entities
         except:
             return []
 
+    def _explain(self, label: str) -> str:
+        import spacy
+        return spacy.explain(label) or label
+
+    def _extract_entities_batch(self, texts: List[str], batch_size: int = 64) -> List[List[Dict[str, str]]]:
+        """Extract named entities for many texts with spaCy's batched pipe"""
+        if not self.nlp:
+            return [[] for _ in texts]
+        
+        try:
+            return [
+                [
+                    {
+                        'text': ent.text,
+                        'label': ent.label_,
+                        'description': self._explain(ent.label_)
+                    }
+                    for ent in doc.ents
+                ]
+                for doc in self.nlp.pipe(texts, batch_size=batch_size)
+            ]
+        except Exception as e:
+            logger.error(f"Batch entity extraction failed: {e}")
+            return [[] for _ in texts]
+
     def _extract_security_keywords(self, text: str) -> List[str]:
         """Extract security-related keywords"""
-        security_keywords = [
-            'malware', 'ransomware', 'phishing', 'ddos', 'vulnerability', 'exploit',
-            'breach', 'attack', 'threat', 'apt', 'backdoor', 'trojan', 'virus',
-            'spyware', 'botnet', 'zero-day', 'cve', 'patch', 'mitigation'
-        ]
-        
-        text_lower = text.lower()
-        found_keywords = []
-        
-        for keyword in security_keywords:
-            if keyword in text_lower:
-                found_keywords.append(keyword)
-        
-        return found_keywords
+        return keyword_matcher.match(text).get('security_keyword', [])
 
     def _calculate_indian_relevance(self, text: str) -> float:
         """Calculate relevance to Indian cyber space using keywords"""
-        indian_keywords = {
-            'high_relevance': [
-                'india', 'indian', 'cert-in', 'nciipc', 'meity', 'dit',
-                'aadhaar', 'upi', 'digital india', 'cii', 'bharat'
-            ],
-            'medium_relevance': [
-                'mumbai', 'delhi', 'bangalore', 'hyderabad', 'chennai', 'kolkata',
-                'pune', 'ahmedabad', 'surat', 'jaipur', 'lucknow', 'kanpur'
-            ],
-            'low_relevance': [
-                'south asia', 'asia pacific', 'apac', 'emerging markets'
-            ]
-        }
-        
-        text_lower = text.lower()
-        score = 0.0
-        
-        # High relevance keywords
-        for keyword in indian_keywords['high_relevance']:
-            if keyword in text_lower:
-                score += 0.3
-        
-        # Medium relevance keywords
-        for keyword in indian_keywords['medium_relevance']:
-            if keyword in text_lower:
-                score += 0.1
-        
-        # Low relevance keywords
-        for keyword in indian_keywords['low_relevance']:
-            if keyword in text_lower:
-                score += 0.05
+        return self._indian_relevance_from_matches(keyword_matcher.match(text))
+
+    def _indian_relevance_from_matches(self, matches: Dict[str, List[str]]) -> float:
+        score = keyword_matcher.score(
+            matches, 'indian_relevance:high', 'indian_relevance:medium', 'indian_relevance:low'
+        )
         
         # Cap the score at 1.0
         return min(score, 1.0)
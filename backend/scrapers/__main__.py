@@ -0,0 +1,11 @@
+"""Entry point for scrape workers: python -m scrapers [--concurrency N]
+
+Parse pool processes are spawned, and a spawned child re-imports the
+parent's main module unless it is a package ``__main__``. Starting workers
+here rather than with ``python -m scrapers.worker`` keeps that re-import,
+and the whole app stack behind it, out of every pool process.
+"""
+from scrapers.worker import main
+
+if __name__ == "__main__":
+    main()
@@ -1,140 +1,125 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from datetime import datetime
-from abc import ABC, abstractmethod
-import feedparser
+from abc import ABC
 import json
+import os
 import re
+from urllib.parse import urlparse
 from app.models.models import SourceType
+from scrapers.http_client import http_client
+from scrapers.http_cache import HTTPValidators
+from scrapers.parsing import (
+    indian_relevance, parse_certin_advisories, parse_pastebin_results, parse_rss_entries, parse_pool
+)
+import structlog
+
+logger = structlog.get_logger()
+
+# Pages followed per scrape on paginated APIs
+SCRAPER_MAX_PAGES = int(os.getenv("SCRAPER_MAX_PAGES", "3"))
 
 class BaseScraper(ABC):
-    def __init__(self, source_url: str, source_name: str):
+    """Scrapers implement stream(), yielding incidents as they are parsed.
+
+    Older scrapers that only implement scrape() still work: the default
+    stream() yields from scrape(), and the default scrape() collects
+    stream(), so callers can use either. A failed fetch or parse must
+    raise out of stream(), never end it early, so the orchestrator does
+    not record a partial scrape as complete.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.stream is BaseScraper.stream and cls.scrape is BaseScraper.scrape:
+            raise TypeError(f"{cls.__name__} must implement stream() or scrape()")
+
+    # Host the requests go to when it is not the source URL's (an API or search endpoint)
+    FETCH_HOST: Optional[str] = None
+
+    def __init__(self, source_url: str, source_name: str, validators: Optional[HTTPValidators] = None):
         self.source_url = source_url
         self.source_name = source_name
+        self.validators = validators
         self.session = None
 
+    @property
+    def fetch_host(self) -> str:
+        """The host this scraper fetches from, for per-host concurrency limits"""
+        return self.FETCH_HOST or urlparse(self.source_url).hostname or self.source_url
+
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # Borrow the process-wide pooled session; it outlives the scraper
+        self.session = http_client.get_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        self.session = None
+
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
+        for incident in await self.scrape():
+            yield incident
 
-    @abstractmethod
     async def scrape(self) -> List[Dict[str, Any]]:
-        pass
+        return [incident async for incident in self.stream()]
+
+    async def _fetch_body(self, url: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """GET a page as raw bytes and its declared charset, or None when the validators show it has not changed.
+
+        The bytes go to the parse pool undecoded; the parsers detect the encoding.
+        Error responses raise, so the scrape fails instead of parsing an error page.
+        """
+        headers = self.validators.request_headers() if self.validators else None
+        async with self.session.get(url, headers=headers) as response:
+            if self.validators and response.status == 304:
+                self.validators.not_modified = True
+                return None
+
+            response.raise_for_status()
+            body = await response.read()
+            if self.validators and response.status == 200 and not self.validators.update(response.headers, body):
+                return None
+            return body, response.charset
 
     def extract_indian_relevance_keywords(self, text: str) -> float:
         """Calculate relevance score for Indian cyber space"""
-        indian_keywords = [
-            'india', 'indian', 'cert-in', 'nciipc', 'meity', 'dit',
-            'aadhaar', 'upi', 'digital india', 'cii', 'critical information infrastructure',
-            'mumbai', 'delhi', 'bangalore', 'hyderabad', 'chennai', 'kolkata',
-            'bharat', 'bharti', 'bsnl', 'airtel', 'jio', 'ongc', 'ntpc',
-            'sbi', 'icici', 'hdfc', 'axis bank', 'pnb', 'canara bank',
-            'indian railways', 'irctc', 'ril', 'tcs', 'infosys', 'wipro'
-        ]
-        
-        text_lower = text.lower()
-        matches = sum(1 for keyword in indian_keywords if keyword in text_lower)
-        
-        # Normalize score between 0 and 1
-        return min(matches / 10.0, 1.0)
+        return indian_relevance(text)
 
 class CERTInScraper(BaseScraper):
     """Scraper for CERT-In advisories"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
         try:
-            async with self.session.get(self.source_url) as response:
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                incidents = []
-                # Parse CERT-In advisory structure
-                advisory_rows = soup.find_all('tr')
-                
-                for row in advisory_rows:
-                    cells = row.find_all('td')
-                    if len(cells) >= 3:
-                        title = cells[1].get_text(strip=True) if len(cells) > 1 else ""
-                        date_str = cells[0].get_text(strip=True) if len(cells) > 0 else ""
-                        link = cells[1].find('a')['href'] if cells[1].find('a') else ""
-                        
-                        if title and date_str:
-                            incident = {
-                                'title': title,
-                                'url': f"https://www.cert-in.org.in{link}" if link.startswith('/') else link,
-                                'incident_date': self._parse_date(date_str),
-                                'severity': self._determine_severity(title),
-                                'description': title,
-                                'source_type': SourceType.security_feed.value,
-                                'geographical_location': 'India',
-                                'relevance_score': self.extract_indian_relevance_keywords(title),
-                                'tags': self._extract_tags(title)
-                            }
-                            incidents.append(incident)
-                
-                return incidents
+            fetched = await self._fetch_body(self.source_url)
+            if fetched is None:
+                return
+
+            # BeautifulSoup is CPU-bound, so the page is parsed in the parse pool
+            for incident in await parse_pool.run(parse_certin_advisories, *fetched):
+                incident['source_type'] = SourceType.security_feed.value
+                incident['geographical_location'] = 'India'
+                yield incident
         except Exception as e:
-            print(f"Error scraping CERT-In: {e}")
-            return []
-
-    def _parse_date(self, date_str: str) -> Optional[datetime]:
-        try:
-            # Try different date formats
-            for fmt in ['%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d']:
-                try:
-                    return datetime.strptime(date_str, fmt)
-                except ValueError:
-                    continue
-        except:
-            pass
-        return datetime.utcnow()
-
-    def _determine_severity(self, title: str) -> str:
-        title_lower = title.lower()
-        if any(keyword in title_lower for keyword in ['critical', 'high risk', 'severe']):
-            return 'critical'
-        elif any(keyword in title_lower for keyword in ['high', 'important']):
-            return 'high'
-        elif any(keyword in title_lower for keyword in ['medium', 'moderate']):
-            return 'medium'
-        else:
-            return 'low'
-
-    def _extract_tags(self, title: str) -> List[str]:
-        tags = []
-        title_lower = title.lower()
-        
-        tag_keywords = {
-            'malware': ['malware', 'virus', 'trojan', 'ransomware'],
-            'vulnerability': ['vulnerability', 'cve', 'exploit', 'patch'],
-            'phishing': ['phishing', 'spoofing', 'social engineering'],
-            'ddos': ['ddos', 'denial of service', 'botnet'],
-            'data_breach': ['data breach', 'leak', 'unauthorized access']
-        }
-        
-        for tag, keywords in tag_keywords.items():
-            if any(keyword in title_lower for keyword in keywords):
-                tags.append(tag)
-        
-        return tags
+            # The validators were updated by the fetch; the orchestrator only stores them if the scrape succeeds
+            logger.error(f"Error scraping CERT-In: {e}")
+            raise
 
 class GitHubAdvisoryScraper(BaseScraper):
     """Scraper for GitHub Security Advisories"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    FETCH_HOST = "api.github.com"
+    
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
         try:
-            # GitHub Security Advisories API
-            api_url = "https://api.github.com/advisories"
-            async with self.session.get(api_url) as response:
-                advisories = await response.json()
+            # GitHub Security Advisories API, following its Link header one page at a time
+            api_url = f"https://{self.FETCH_HOST}/advisories?per_page=100"
+            for _ in range(SCRAPER_MAX_PAGES):
+                async with self.session.get(api_url) as response:
+                    response.raise_for_status()
+                    advisories = await response.json()
+                    next_link = response.links.get('next')
                 
-                incidents = []
                 for advisory in advisories:
                     incident = {
                         'title': advisory.get('summary', ''),
@@ -153,134 +138,108 @@ class GitHubAdvisoryScraper(BaseScraper):
                             'cvss_score': advisory.get('cvss', {}).get('score', 0)
                         }
                     }
-                    incidents.append(incident)
+                    yield incident
                 
-                return incidents
+                if not next_link:
+                    break
+                api_url = str(next_link['url'])
         except Exception as e:
-            print(f"Error scraping GitHub advisories: {e}")
-            return []
+            logger.error(f"Error scraping GitHub advisories: {e}")
+            raise
 
 class PastebinScraper(BaseScraper):
     """Scraper for Pastebin - looking for potential data leaks"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    FETCH_HOST = "pastebin.com"
+    
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
         try:
             # Note: This is a simplified example. In production, you'd need proper rate limiting
             # and potentially use Pastebin's API
             search_terms = ['india', 'indian', 'database', 'leak', 'breach', 'credentials']
-            incidents = []
             
             for term in search_terms:
-                search_url = f"https://pastebin.com/search?q={term}"
+                search_url = f"https://{self.FETCH_HOST}/search?q={term}"
+                # The response is released before yielding, so the consumer never holds a connection
                 async with self.session.get(search_url) as response:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Parse search results (this is a simplified example)
-                    results = soup.find_all('div', class_='paste_box_line')
-                    
-                    for result in results[:5]:  # Limit results
-                        title_elem = result.find('a')
-                        if title_elem:
-                            title = title_elem.get_text(strip=True)
-                            url = f"https://pastebin.com{title_elem['href']}"
-                            
-                            incident = {
-                                'title': f"Potential data leak: {title}",
-                                'description': f"Paste found containing '{term}' keyword",
-                                'url': url,
-                                'incident_date': datetime.utcnow(),
-                                'severity': 'medium',
-                                'source_type': SourceType.paste_site.value,
-                                'tags': ['data_leak', 'paste_site', term],
-                                'relevance_score': self.extract_indian_relevance_keywords(title),
-                                'geographical_location': 'Unknown'
-                            }
-                            incidents.append(incident)
-            
-            return incidents
+                    response.raise_for_status()
+                    body = await response.read()
+                    charset = response.charset
+                
+                # Parse search results (this is a simplified example)
+                for result in await parse_pool.run(parse_pastebin_results, body, charset):
+                    incident = {
+                        'title': f"Potential data leak: {result['title']}",
+                        'description': f"Paste found containing '{term}' keyword",
+                        'url': result['url'],
+                        'incident_date': datetime.utcnow(),
+                        'severity': 'medium',
+                        'source_type': SourceType.paste_site.value,
+                        'tags': ['data_leak', 'paste_site', term],
+                        'relevance_score': result['relevance_score'],
+                        'geographical_location': 'Unknown'
+                    }
+                    yield incident
         except Exception as e:
-            print(f"Error scraping Pastebin: {e}")
-            return []
+            logger.error(f"Error scraping Pastebin: {e}")
+            raise
 
 class RSSFeedScraper(BaseScraper):
     """Scraper for RSS feeds from security blogs"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
         try:
-            async with self.session.get(self.source_url) as response:
-                rss_content = await response.text()
-                feed = feedparser.parse(rss_content)
-                
-                incidents = []
-                for entry in feed.entries:
-                    incident = {
-                        'title': entry.get('title', ''),
-                        'description': entry.get('summary', ''),
-                        'content': entry.get('content', [{}])[0].get('value', '') if entry.get('content') else '',
-                        'url': entry.get('link', ''),
-                        'incident_date': datetime(*entry.published_parsed[:6]) if hasattr(entry, 'published_parsed') else datetime.utcnow(),
-                        'severity': self._determine_severity_from_content(entry.get('title', '') + ' ' + entry.get('summary', '')),
-                        'source_type': SourceType.blog.value,
-                        'tags': self._extract_tags_from_content(entry.get('title', '') + ' ' + entry.get('summary', '')),
-                        'relevance_score': self.extract_indian_relevance_keywords(
-                            f"{entry.get('title', '')} {entry.get('summary', '')}"
-                        )
-                    }
-                    incidents.append(incident)
-                
-                return incidents
+            fetched = await self._fetch_body(self.source_url)
+            if fetched is None:
+                return
+
+            body, _ = fetched
+            for incident in await parse_pool.run(parse_rss_entries, body):
+                incident['source_type'] = SourceType.blog.value
+                yield incident
         except Exception as e:
-            print(f"Error scraping RSS feed: {e}")
-            return []
-
-    def _determine_severity_from_content(self, content: str) -> str:
-        content_lower = content.lower()
-        if any(keyword in content_lower for keyword in ['critical', 'zero-day', 'breach', 'attack']):
-            return 'high'
-        elif any(keyword in content_lower for keyword in ['vulnerability', 'exploit', 'malware']):
-            return 'medium'
-        else:
-            return 'low'
-
-    def _extract_tags_from_content(self, content: str) -> List[str]:
-        tags = []
-        content_lower = content.lower()
-        
-        if 'malware' in content_lower:
-            tags.append('malware')
-        if 'phishing' in content_lower:
-            tags.append('phishing')
-        if 'vulnerability' in content_lower:
-            tags.append('vulnerability')
-        if 'apt' in content_lower:
-            tags.append('apt')
-        if 'ransomware' in content_lower:
-            tags.append('ransomware')
-        
-        return tags
+            logger.error(f"Error scraping RSS feed: {e}")
+            raise
 
 class ScraperFactory:
     """Factory class to create appropriate scrapers based on source type"""
     
     @staticmethod
-    def create_scraper(source_type: SourceType, source_url: str, source_name: str) -> BaseScraper:
+    def create_scraper(source_type: SourceType, source_url: str, source_name: str,
+                       validators: Optional[HTTPValidators] = None) -> BaseScraper:
         if source_type == SourceType.security_feed:
             if 'cert-in' in source_url.lower():
-                return CERTInScraper(source_url, source_name)
+                return CERTInScraper(source_url, source_name, validators)
             else:
-                return RSSFeedScraper(source_url, source_name)
+                return RSSFeedScraper(source_url, source_name, validators)
         elif source_type == SourceType.github:
-            return GitHubAdvisoryScraper(source_url, source_name)
+            return GitHubAdvisoryScraper(source_url, source_name, validators)
         elif source_type == SourceType.paste_site:
-            return PastebinScraper(source_url, source_name)
+            return PastebinScraper(source_url, source_name, validators)
         elif source_type == SourceType.blog:
-            return RSSFeedScraper(source_url, source_name)
+            return RSSFeedScraper(source_url, source_name, validators)
         else:
-            return RSSFeedScraper(source_url, source_name)  # Default to RSS
+            return RSSFeedScraper(source_url, source_name, validators)  # Default to RSS
+
+def fetch_host(source_type: SourceType, source_url: str) -> str:
+    """The host a source's scraper fetches from"""
+    return ScraperFactory.create_scraper(source_type, source_url, source_url).fetch_host
+
+async def scrape_source(source_type: SourceType, source_url: str, source_name: str,
+                        validators: Optional[HTTPValidators] = None) -> List[Dict[str, Any]]:
+    """Convenience function to scrape a single source.
+
+    When validators are given the fetch is conditional; they are updated in
+    place and ``validators.not_modified`` is set if the source is unchanged.
+    """
+    scraper = ScraperFactory.create_scraper(source_type, source_url, source_name, validators)
+    async with scraper:
+        return await scraper.scrape()
 
-async def scrape_source(source_type: SourceType, source_url: str, source_name: str) -> List[Dict[str, Any]]:
-    """Convenience function to scrape a single source"""
-    scraper = ScraperFactory.create_scraper(source_type, source_url, source_name)
+async def stream_source(source_type: SourceType, source_url: str, source_name: str,
+                        validators: Optional[HTTPValidators] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Like scrape_source, yielding incidents as the scraper produces them"""
+    scraper = ScraperFactory.create_scraper(source_type, source_url, source_name, validators)
     async with scraper:
-        return await scraper.scrape()
\ No newline at end of file
+        async for incident in scraper.stream():
+            yield incident
\ No newline at end of file
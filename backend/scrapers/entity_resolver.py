@@ -0,0 +1,112 @@
+import os
+import time
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+from app.models import models
+from app.utils.keyword_matcher import KeywordMatcher, keyword_matcher
+import structlog
+
+logger = structlog.get_logger()
+
+ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", "300"))
+
+class EntityResolver:
+    """In-memory sector and APT group resolution for the ingest path.
+
+    Sectors and APT groups (with aliases) are loaded once and compiled into
+    keyword matchers. When the TTL expires a single fingerprint query
+    (a hash of every column loaded) decides whether to reload, so renames
+    and alias edits are picked up and resolving incidents between
+    refreshes costs no database queries.
+    """
+
+    def __init__(self, ttl: int = ENTITY_CACHE_TTL):
+        self.ttl = ttl
+        self._checked_at: Optional[float] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._sector_ids: Dict[str, UUID] = {}
+        self._sector_names: Dict[UUID, str] = {}
+        self._apt_group_ids: Dict[str, UUID] = {}
+        self._apt_group_names: Dict[UUID, str] = {}
+        self._apt_matcher: Optional[KeywordMatcher] = None
+
+    def refresh_if_stale(self, db: Session):
+        """Reload the catalogue if the TTL expired and the tables changed"""
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl:
+            return
+
+        fingerprint = self._get_fingerprint(db)
+        if fingerprint != self._fingerprint:
+            self._load(db)
+            self._fingerprint = fingerprint
+        self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force a reload on the next refresh_if_stale call"""
+        self._checked_at = None
+        self._fingerprint = None
+
+    def _get_fingerprint(self, db: Session) -> Tuple:
+        return tuple(db.execute(select(
+            self._table_hash(models.Sector.id, models.Sector.name, models.Sector.sector_type),
+            self._table_hash(models.APTGroup.id, models.APTGroup.name, models.APTGroup.aliases),
+        )).one())
+
+    @staticmethod
+    def _table_hash(key, *columns):
+        """md5 over the given columns of every row, in key order"""
+        row = func.concat_ws(literal_column("','"), key, *columns)
+        return select(func.md5(func.coalesce(
+            func.string_agg(row, aggregate_order_by(literal_column("';'"), key)), ''
+        ))).scalar_subquery()
+
+    def _load(self, db: Session):
+        sectors = db.query(models.Sector.id, models.Sector.name, models.Sector.sector_type).all()
+        apt_groups = db.query(models.APTGroup.id, models.APTGroup.name, models.APTGroup.aliases)\
+                       .order_by(models.APTGroup.name)\
+                       .all()
+
+        sector_ids = {}
+        for sector_id, name, sector_type in sectors:
+            # Keep the first sector per type, as the original per-incident query did
+            sector_ids.setdefault(sector_type.value, sector_id)
+
+        apt_keywords = {
+            f"apt:{apt_id}": (1.0, [name] + list(aliases or []))
+            for apt_id, name, aliases in apt_groups
+        }
+
+        self._sector_ids = sector_ids
+        self._sector_names = {sector_id: name for sector_id, name, _ in sectors}
+        self._apt_group_ids = {str(apt_id): apt_id for apt_id, _, _ in apt_groups}
+        self._apt_group_names = {apt_id: name for apt_id, name, _ in apt_groups}
+        self._apt_matcher = KeywordMatcher(apt_keywords)
+
+        logger.info(f"Loaded {len(sectors)} sectors and {len(apt_groups)} APT groups into entity resolver")
+
+    def resolve_sector(self, text: str) -> Optional[UUID]:
+        """Most likely sector for the text, falling back to the 'other' sector"""
+        for sector_type in keyword_matcher.labels(keyword_matcher.match(text), 'sector'):
+            if sector_type in self._sector_ids:
+                return self._sector_ids[sector_type]
+        return self._sector_ids.get(models.SectorType.other.value)
+
+    def resolve_apt_group(self, text: str) -> Optional[UUID]:
+        """APT group whose name or alias appears in the text"""
+        if not self._apt_matcher:
+            return None
+
+        apt_ids = self._apt_matcher.labels(self._apt_matcher.match(text), 'apt')
+        return self._apt_group_ids[apt_ids[0]] if apt_ids else None
+
+    def sector_name(self, sector_id: Optional[UUID]) -> Optional[str]:
+        return self._sector_names.get(sector_id)
+
+    def apt_group_name(self, apt_group_id: Optional[UUID]) -> Optional[str]:
+        return self._apt_group_names.get(apt_group_id)
+
+# Initialize global resolver instance
+entity_resolver = EntityResolver()
@@ -0,0 +1,381 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import models
+from app.utils.event_bus import Event, EventType
+from database.connection import SessionLocal
+import structlog
+
+logger = structlog.get_logger()
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FINGERPRINT_INDEX_ENABLED = os.getenv("FINGERPRINT_INDEX_ENABLED", "true").lower() == "true"
+# Relative paths are resolved against the backend directory, not the CWD
+FINGERPRINT_INDEX_PATH = os.path.join(_BACKEND_DIR, os.getenv("FINGERPRINT_INDEX_PATH", "data/fingerprint_index.bin"))
+FINGERPRINT_INDEX_CAPACITY = int(os.getenv("FINGERPRINT_INDEX_CAPACITY", "100000"))
+# A false positive drops a new incident as known, so keep this very low
+FINGERPRINT_INDEX_ERROR_RATE = float(os.getenv("FINGERPRINT_INDEX_ERROR_RATE", "0.000001"))
+FINGERPRINT_INDEX_SAVE_INTERVAL = int(os.getenv("FINGERPRINT_INDEX_SAVE_INTERVAL", "300"))
+# Rebuild from the database instead of loading the snapshot
+FINGERPRINT_REBUILD_ON_STARTUP = os.getenv("FINGERPRINT_REBUILD_ON_STARTUP", "false").lower() == "true"
+# Bloom filters cannot forget; a periodic rebuild drops incidents deleted by other processes (0 disables)
+FINGERPRINT_REBUILD_INTERVAL = int(os.getenv("FINGERPRINT_REBUILD_INTERVAL", "86400"))
+
+# Version 2 fingerprints the exact stored keys; older snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter over 128-bit digests, using double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytearray] = None, count: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def add(self, digest: bytes):
+        bits = self.bits
+        for position in self._positions(digest):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def estimated_error_rate(self) -> float:
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def _positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+class ScalableBloomFilter:
+    """Bloom filters that grow with the data while keeping the error rate bounded.
+
+    When the newest filter reaches its capacity, another one is added with
+    twice the capacity and half the error rate, so the combined false
+    positive rate stays below ``error_rate`` however many items are added.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, initial_capacity: int, error_rate: float, filters: Optional[List[BloomFilter]] = None):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.filters = filters or [BloomFilter(initial_capacity, error_rate * (1 - self.TIGHTENING))]
+
+    def __contains__(self, digest: bytes) -> bool:
+        return any(digest in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    def add(self, digest: bytes) -> bool:
+        """Add a digest; False if it was (probably) present already"""
+        if digest in self:
+            return False
+        if self.filters[-1].full:
+            last = self.filters[-1]
+            self.filters.append(BloomFilter(last.capacity * self.GROWTH, last.error_rate * self.TIGHTENING))
+        self.filters[-1].add(digest)
+        return True
+
+    def estimated_error_rate(self) -> float:
+        return 1 - math.prod(1 - bloom.estimated_error_rate() for bloom in self.filters)
+
+    def memory_bytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+def incident_fingerprints(url: Optional[str], external_id: Optional[str], title: Optional[str], source_id) -> List[bytes]:
+    """The keys ingest dedups on: url, external_id, and title within its source.
+
+    They are compared exactly, like the database check, so the index never
+    treats as known an item the database would accept.
+    """
+    keys = [f"title:{source_id}:{title or ''}"]
+    if url:
+        keys.append(f"url:{url}")
+    if external_id:
+        keys.append(f"external_id:{external_id}")
+    return [_digest(key) for key in keys]
+
+class FingerprintIndex:
+    """In-memory index of incidents already stored, in front of the ingest dedup query.
+
+    A scraped item is dropped as known when any of its fingerprints is in
+    the filter; only the rest go to the database check. A false positive
+    (at most FINGERPRINT_INDEX_ERROR_RATE) therefore drops a new item,
+    while a miss just costs the usual query, so the index can lag inserts
+    made by other processes. The filter is snapshotted to disk and, on
+    startup, loaded and caught up with incidents created since; until that
+    finishes every item is treated as maybe new.
+
+    Fingerprints cannot be removed, so a deleted incident would stay known
+    and be dropped if scraped again. The index is therefore rebuilt from
+    the database in the background on incident.deleted in this process,
+    and every FINGERPRINT_REBUILD_INTERVAL for deletes made elsewhere.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_INDEX_PATH, capacity: int = FINGERPRINT_INDEX_CAPACITY,
+                 error_rate: float = FINGERPRINT_INDEX_ERROR_RATE, enabled: bool = FINGERPRINT_INDEX_ENABLED):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.enabled = enabled
+        self._filter = ScalableBloomFilter(capacity, error_rate)
+        self._watermark: Optional[datetime] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._rebuild_requested = False
+        self._rebuilt_at = time.monotonic()
+        self.rebuilds = 0
+        self.known_dropped = 0
+        self.maybe_new = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def drop_known(self, raw_incidents: List[Dict[str, Any]], source_id) -> List[Dict[str, Any]]:
+        """The scraped incidents that may be new"""
+        if not self.ready:
+            return raw_incidents
+
+        maybe_new = [
+            raw for raw in raw_incidents
+            if not any(digest in self._filter for digest in incident_fingerprints(
+                raw.get('url'), raw.get('external_id'), raw.get('title'), source_id))
+        ]
+        self.known_dropped += len(raw_incidents) - len(maybe_new)
+        self.maybe_new += len(maybe_new)
+        return maybe_new
+
+    def add(self, url: Optional[str], external_id: Optional[str], title: Optional[str], source_id):
+        digests = incident_fingerprints(url, external_id, title, source_id)
+        # Ingest adds on the event loop while warm-up adds in its thread
+        with self._lock:
+            for digest in digests:
+                if self._filter.add(digest):
+                    self._dirty = True
+
+    def add_raw(self, raw_incidents: Iterable[Dict[str, Any]], source_id):
+        for raw in raw_incidents:
+            self.add(raw.get('url'), raw.get('external_id'), raw.get('title'), source_id)
+
+    def start_warm_up(self) -> Optional[threading.Thread]:
+        """Load the snapshot and catch up from the database in a background thread"""
+        if not self.enabled:
+            return None
+        thread = threading.Thread(target=self.warm_up, name="fingerprint-index-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def warm_up(self):
+        db = SessionLocal()
+        try:
+            loaded = not FINGERPRINT_REBUILD_ON_STARTUP and self.load()
+            if not loaded:
+                # Nothing is dropped until the index is ready, so it can fill in place
+                self._filter = ScalableBloomFilter(self.capacity, self.error_rate)
+                self._watermark = None
+                self._rebuilt_at = time.monotonic()
+            added, self._watermark = self._fill(db, self.add, self._watermark)
+            self._ready.set()
+            logger.info(f"Fingerprint index ready: {'loaded snapshot' if loaded else 'rebuilt'}, "
+                        f"{added} incidents added", **self.get_stats())
+            self.save()
+        except Exception as e:
+            logger.error(f"Fingerprint index warm-up failed, deduplicating in the database only: {e}")
+        finally:
+            db.close()
+
+    async def handle_events(self, events: List[Event]):
+        """Event bus subscriber: rebuild after deletes so deleted incidents can be ingested again"""
+        if any(event.type == EventType.incident_deleted for event in events):
+            self.start_rebuild()
+
+    def rebuild_if_due(self):
+        if FINGERPRINT_REBUILD_INTERVAL and time.monotonic() - self._rebuilt_at >= FINGERPRINT_REBUILD_INTERVAL:
+            self.start_rebuild()
+
+    def start_rebuild(self):
+        """Rebuild in a background thread; a request during a rebuild runs another one after it"""
+        if not self.ready:
+            return
+        if self._rebuild_thread and self._rebuild_thread.is_alive():
+            self._rebuild_requested = True
+            return
+        self._rebuild_thread = threading.Thread(target=self._rebuild_until_current, name="fingerprint-index-rebuild",
+                                                daemon=True)
+        self._rebuild_thread.start()
+
+    def rebuild(self):
+        """Replace the filter with one built from the database, forgetting deleted incidents.
+
+        Adds made while it runs go to the old filter and are lost; those
+        items are just checked in the database again.
+        """
+        db = SessionLocal()
+        try:
+            fresh = ScalableBloomFilter(self.capacity, self.error_rate)
+            added, watermark = self._fill(db, lambda *key: self._add_to(fresh, *key), None)
+            with self._lock:
+                self._filter = fresh
+                self._watermark = watermark
+                self._dirty = True
+            self._rebuilt_at = time.monotonic()
+            self.rebuilds += 1
+            logger.info(f"Fingerprint index rebuilt with {added} incidents", **self.get_stats())
+        except Exception as e:
+            logger.error(f"Fingerprint index rebuild failed, keeping the current index: {e}")
+        finally:
+            db.close()
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, "rb") as snapshot:
+                header = json.loads(snapshot.readline())
+                if header['version'] != SNAPSHOT_VERSION or header['error_rate'] != self.error_rate:
+                    return False
+                filters = []
+                for params in header['filters']:
+                    bloom = BloomFilter(params['capacity'], params['error_rate'], count=params['count'])
+                    bloom.bits = bytearray(snapshot.read(len(bloom.bits)))
+                    if len(bloom.bits) != (bloom.num_bits + 7) // 8:
+                        raise ValueError("truncated snapshot")
+                    filters.append(bloom)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable fingerprint snapshot {self.path}: {e}")
+            return False
+
+        self._filter = ScalableBloomFilter(header['initial_capacity'], self.error_rate, filters)
+        self._watermark = datetime.fromisoformat(header['watermark']) if header['watermark'] else None
+        return True
+
+    def save(self):
+        """Write the snapshot atomically; concurrent writers each leave a complete file"""
+        snapshot = self._snapshot()
+        if snapshot:
+            self._write(*snapshot)
+
+    async def save_if_due(self):
+        """Copy the filters on the event loop, where add() runs, and write them in a thread"""
+        if self._dirty and time.monotonic() - self._saved_at >= FINGERPRINT_INDEX_SAVE_INTERVAL:
+            snapshot = self._snapshot()
+            if not snapshot:
+                return
+            try:
+                await asyncio.to_thread(self._write, *snapshot)
+            except OSError as e:
+                logger.error(f"Error saving fingerprint index: {e}")
+
+    def _snapshot(self) -> Optional[Tuple[bytes, List[bytes]]]:
+        if not self.ready:
+            return None
+
+        # Counts and bits are copied together, under the lock warm-up adds take
+        with self._lock:
+            header = {
+                'version': SNAPSHOT_VERSION,
+                'error_rate': self.error_rate,
+                'initial_capacity': self._filter.initial_capacity,
+                'watermark': self._watermark.isoformat() if self._watermark else None,
+                'filters': [
+                    {'capacity': bloom.capacity, 'error_rate': bloom.error_rate, 'count': bloom.count}
+                    for bloom in self._filter.filters
+                ]
+            }
+            chunks = [bytes(bloom.bits) for bloom in self._filter.filters]
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        return json.dumps(header).encode("utf-8") + b"\n", chunks
+
+    def _write(self, header: bytes, chunks: List[bytes]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as snapshot:
+            snapshot.write(header)
+            for chunk in chunks:
+                snapshot.write(chunk)
+        os.replace(temp_path, self.path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'ready': self.ready,
+            'fingerprints': len(self._filter),
+            'filters': len(self._filter.filters),
+            'memory_bytes': self._filter.memory_bytes(),
+            'target_error_rate': self.error_rate,
+            'estimated_error_rate': self._filter.estimated_error_rate(),
+            'known_dropped': self.known_dropped,
+            'maybe_new': self.maybe_new,
+            'rebuilds': self.rebuilds,
+            'rebuilding': bool(self._rebuild_thread and self._rebuild_thread.is_alive()),
+            'seconds_since_rebuild': round(time.monotonic() - self._rebuilt_at),
+            'rebuild_interval': FINGERPRINT_REBUILD_INTERVAL
+        }
+
+    def _rebuild_until_current(self):
+        while True:
+            self._rebuild_requested = False
+            self.rebuild()
+            if not self._rebuild_requested:
+                return
+
+    def _add_to(self, bloom: ScalableBloomFilter, url: Optional[str], external_id: Optional[str],
+                title: Optional[str], source_id):
+        for digest in incident_fingerprints(url, external_id, title, source_id):
+            bloom.add(digest)
+
+    def _fill(self, db: Session, add: Callable, since: Optional[datetime]) -> Tuple[int, Optional[datetime]]:
+        """Add incidents and linked near-duplicate reports stored at or after ``since`` (all without it).
+
+        Returns the number added and the watermark for the next catch-up.
+        """
+        # Rows committed while this runs are caught by the database check, and by the next catch-up
+        watermarks = [
+            db.query(func.max(models.CyberIncident.created_at)).scalar(),
+            db.query(func.max(models.IncidentDuplicate.detected_at)).scalar()
+        ]
+        added = 0
+        for table, stored_at in ((models.CyberIncident, models.CyberIncident.created_at),
+                                 (models.IncidentDuplicate, models.IncidentDuplicate.detected_at)):
+            query = db.query(table.url, table.external_id, table.title, table.source_id)
+            if since:
+                query = query.filter(stored_at >= since)
+            for url, external_id, title, source_id in query.yield_per(10000):
+                add(url, external_id, title, source_id)
+                added += 1
+
+        watermark = max((value for value in watermarks if value), default=None)
+        return added, watermark or since
+
+# Initialize global fingerprint index instance
+fingerprint_index = FingerprintIndex()
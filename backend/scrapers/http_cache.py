@@ -0,0 +1,33 @@
+import hashlib
+from typing import Dict, Optional
+
+class HTTPValidators:
+    """Per-source HTTP cache validators used for conditional GETs"""
+
+    def __init__(self, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 content_hash: Optional[str] = None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.not_modified = False
+
+    def request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def update(self, response_headers, body: bytes) -> bool:
+        """Record the validators of a 200 response; returns False if the body is unchanged"""
+        self.etag = response_headers.get('ETag') or self.etag
+        self.last_modified = response_headers.get('Last-Modified') or self.last_modified
+
+        content_hash = hashlib.sha256(body).hexdigest()
+        if content_hash == self.content_hash:
+            self.not_modified = True
+            return False
+
+        self.content_hash = content_hash
+        return True
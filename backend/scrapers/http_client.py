@@ -0,0 +1,89 @@
+import asyncio
+import aiohttp
+import os
+from typing import Dict, Any, Optional
+
+SCRAPER_HTTP_LIMIT = int(os.getenv("SCRAPER_HTTP_LIMIT", "100"))
+SCRAPER_HTTP_LIMIT_PER_HOST = int(os.getenv("SCRAPER_HTTP_LIMIT_PER_HOST", "4"))
+SCRAPER_HTTP_KEEPALIVE = float(os.getenv("SCRAPER_HTTP_KEEPALIVE", "120"))
+SCRAPER_HTTP_DNS_TTL = int(os.getenv("SCRAPER_HTTP_DNS_TTL", "600"))
+SCRAPER_HTTP_TOTAL_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TOTAL_TIMEOUT", "60"))
+SCRAPER_HTTP_CONNECT_TIMEOUT = float(os.getenv("SCRAPER_HTTP_CONNECT_TIMEOUT", "10"))
+SCRAPER_HTTP_READ_TIMEOUT = float(os.getenv("SCRAPER_HTTP_READ_TIMEOUT", "30"))
+USER_AGENT = os.getenv("USER_AGENT", "IndianCyberThreatIntel/1.0")
+
+class SharedHTTPClient:
+    """Process-wide pooled aiohttp session shared by every scraper"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requests = 0
+        self._sessions_created = 0
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=SCRAPER_HTTP_LIMIT,
+                limit_per_host=SCRAPER_HTTP_LIMIT_PER_HOST,
+                keepalive_timeout=SCRAPER_HTTP_KEEPALIVE,
+                ttl_dns_cache=SCRAPER_HTTP_DNS_TTL,
+                use_dns_cache=True,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=SCRAPER_HTTP_TOTAL_TIMEOUT,
+                connect=SCRAPER_HTTP_CONNECT_TIMEOUT,
+                sock_read=SCRAPER_HTTP_READ_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={"User-Agent": USER_AGENT},
+                trace_configs=[self._trace_config()],
+            )
+            self._loop = loop
+            self._sessions_created += 1
+        return self._session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self._requests += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        return trace_config
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection pool statistics for monitoring"""
+        stats = {
+            'open': bool(self._session and not self._session.closed),
+            'limit': SCRAPER_HTTP_LIMIT,
+            'limit_per_host': SCRAPER_HTTP_LIMIT_PER_HOST,
+            'requests': self._requests,
+            'sessions_created': self._sessions_created,
+            'acquired': 0,
+            'idle': 0,
+            'acquired_per_host': {},
+        }
+        if stats['open']:
+            connector = self._session.connector
+            # aiohttp does not expose these publicly; read defensively
+            stats['acquired'] = len(getattr(connector, '_acquired', ()))
+            stats['idle'] = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+            stats['acquired_per_host'] = {
+                f"{key.host}:{key.port}": len(conns)
+                for key, conns in getattr(connector, '_acquired_per_host', {}).items()
+            }
+        return stats
+
+# Initialize global HTTP client instance
+http_client = SharedHTTPClient()
@@ -0,0 +1,237 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.services.scrape_job_service import (
+    ACTIVE_JOB_STATUSES, FINISHED_JOB_STATUSES, AsyncScrapeJobService, JobLease
+)
+from database.connection import AsyncSessionLocal
+
+# API processes, as uvicorn --workers reads it
+API_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+# "scheduler" runs scrapes inside the elected API process (scrapers.scheduler), whose jobs no
+# other process can see; "postgres" shares jobs through the scrape_jobs table. Unset, it is
+# "scheduler" for one API process and "postgres" for several
+SCRAPE_JOB_BACKEND = os.getenv("SCRAPE_JOB_BACKEND") or ("postgres" if API_WORKERS > 1 else "scheduler")
+# Whether API processes work queued jobs themselves; by default with the memory queue, and with
+# postgres when it was picked for several API processes rather than for dedicated scrape workers
+SCRAPE_EMBEDDED_WORKER = (
+    os.getenv("SCRAPE_EMBEDDED_WORKER")
+    or ("true" if SCRAPE_JOB_BACKEND == "memory" or not os.getenv("SCRAPE_JOB_BACKEND") else "false")
+).lower() == "true"
+SCRAPE_JOB_LEASE_SECONDS = int(os.getenv("SCRAPE_JOB_LEASE_SECONDS", "300"))
+SCRAPE_JOB_MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "3"))
+# Delay before the first retry of a failed job; doubles with every attempt
+SCRAPE_JOB_RETRY_BACKOFF = int(os.getenv("SCRAPE_JOB_RETRY_BACKOFF", "60"))
+SCRAPE_JOB_RETENTION_DAYS = int(os.getenv("SCRAPE_JOB_RETENTION_DAYS", "7"))
+
+class PostgresJobQueue:
+    """Scrape job queue shared by every worker process through the scrape_jobs table"""
+
+    name = "postgres"
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal,
+                 lease_seconds: int = SCRAPE_JOB_LEASE_SECONDS, max_attempts: int = SCRAPE_JOB_MAX_ATTEMPTS,
+                 retry_backoff: int = SCRAPE_JOB_RETRY_BACKOFF):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+    async def enqueue(self, source_id: UUID, trigger: str = "scheduled",
+                      cooldown: Optional[int] = None) -> Optional[UUID]:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).enqueue(source_id, trigger, self.max_attempts, cooldown)
+
+    async def claim(self, worker_id: str, limit: int = 1) -> List[JobLease]:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).claim(worker_id, limit, self.lease_seconds)
+
+    async def heartbeat(self, job_id: UUID, worker_id: str) -> bool:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).heartbeat(job_id, worker_id, self.lease_seconds)
+
+    async def complete(self, job_id: UUID, worker_id: str, result: Dict[str, Any]) -> bool:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).complete(job_id, worker_id, result)
+
+    async def fail(self, job_id: UUID, worker_id: str, error: str) -> bool:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).fail(job_id, worker_id, error, self.retry_backoff)
+
+    async def reclaim_expired(self) -> int:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).reclaim_expired()
+
+    async def purge_finished(self, older_than_days: int = SCRAPE_JOB_RETENTION_DAYS) -> int:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).purge_finished(older_than_days)
+
+    async def get_job(self, job_id: UUID):
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).get_job(job_id)
+
+    async def recent_jobs(self, limit: int = 50, status: Optional[str] = None) -> list:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).recent_jobs(limit, status)
+
+    async def get_stats(self) -> Dict[str, int]:
+        async with self.session_factory() as db:
+            return await AsyncScrapeJobService(db).get_stats()
+
+class InMemoryJob:
+    """Mirrors the scrape_jobs columns for InMemoryJobQueue"""
+
+    def __init__(self, source_id: UUID, trigger: str, max_attempts: int):
+        self.id = uuid.uuid4()
+        self.source_id = source_id
+        self.trigger = trigger
+        self.status = "queued"
+        self.attempts = 0
+        self.max_attempts = max_attempts
+        self.created_at = datetime.utcnow()
+        self.available_at = self.created_at
+        self.leased_by: Optional[str] = None
+        self.lease_expires_at: Optional[datetime] = None
+        self.heartbeat_at: Optional[datetime] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+class InMemoryJobQueue:
+    """Same leases, retries and dead-lettering as PostgresJobQueue, for workers in one process (tests, development)"""
+
+    name = "memory"
+
+    def __init__(self, lease_seconds: int = SCRAPE_JOB_LEASE_SECONDS, max_attempts: int = SCRAPE_JOB_MAX_ATTEMPTS,
+                 retry_backoff: int = SCRAPE_JOB_RETRY_BACKOFF):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._jobs: Dict[UUID, InMemoryJob] = {}
+        self._lock = asyncio.Lock()
+
+    async def enqueue(self, source_id: UUID, trigger: str = "scheduled",
+                      cooldown: Optional[int] = None) -> Optional[UUID]:
+        async with self._lock:
+            now = datetime.utcnow()
+            for job in self._jobs.values():
+                if job.source_id != source_id:
+                    continue
+                if job.status in ACTIVE_JOB_STATUSES:
+                    return job.id
+                if cooldown and job.finished_at and job.finished_at > now - timedelta(seconds=cooldown):
+                    return None
+
+            job = InMemoryJob(source_id, trigger, self.max_attempts)
+            self._jobs[job.id] = job
+            return job.id
+
+    async def claim(self, worker_id: str, limit: int = 1) -> List[JobLease]:
+        async with self._lock:
+            now = datetime.utcnow()
+            ready = sorted(
+                (job for job in self._jobs.values() if job.status == "queued" and job.available_at <= now),
+                key=lambda job: job.available_at
+            )[:limit]
+
+            for job in ready:
+                job.status = "running"
+                job.leased_by = worker_id
+                job.attempts += 1
+                job.started_at = job.heartbeat_at = now
+                job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+            return [JobLease(job.id, job.source_id, job.attempts) for job in ready]
+
+    async def heartbeat(self, job_id: UUID, worker_id: str) -> bool:
+        async with self._lock:
+            job = self._leased(job_id, worker_id)
+            if not job:
+                return False
+            job.heartbeat_at = datetime.utcnow()
+            job.lease_expires_at = job.heartbeat_at + timedelta(seconds=self.lease_seconds)
+            return True
+
+    async def complete(self, job_id: UUID, worker_id: str, result: Dict[str, Any]) -> bool:
+        async with self._lock:
+            job = self._leased(job_id, worker_id)
+            if not job:
+                return False
+            job.status = "succeeded"
+            job.result = result
+            job.last_error = None
+            job.finished_at = datetime.utcnow()
+            job.leased_by = job.lease_expires_at = None
+            return True
+
+    async def fail(self, job_id: UUID, worker_id: str, error: str) -> bool:
+        async with self._lock:
+            job = self._leased(job_id, worker_id)
+            if not job:
+                return False
+            job.last_error = error
+            self._release(job, timedelta(seconds=self.retry_backoff * 2 ** (job.attempts - 1)))
+            return True
+
+    async def reclaim_expired(self) -> int:
+        async with self._lock:
+            now = datetime.utcnow()
+            expired = [job for job in self._jobs.values()
+                       if job.status == "running" and job.lease_expires_at < now]
+            for job in expired:
+                job.last_error = f"Lease expired on {job.leased_by}"
+                self._release(job, timedelta(0))
+            return len(expired)
+
+    async def purge_finished(self, older_than_days: int = SCRAPE_JOB_RETENTION_DAYS) -> int:
+        async with self._lock:
+            cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+            purged = [job_id for job_id, job in self._jobs.items()
+                      if job.status in FINISHED_JOB_STATUSES and job.finished_at < cutoff]
+            for job_id in purged:
+                del self._jobs[job_id]
+            return len(purged)
+
+    async def get_job(self, job_id: UUID) -> Optional[InMemoryJob]:
+        return self._jobs.get(job_id)
+
+    async def recent_jobs(self, limit: int = 50, status: Optional[str] = None) -> List[InMemoryJob]:
+        jobs = [job for job in self._jobs.values() if not status or job.status == status]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)[:limit]
+
+    async def get_stats(self) -> Dict[str, int]:
+        stats: Dict[str, int] = {}
+        for job in self._jobs.values():
+            stats[job.status] = stats.get(job.status, 0) + 1
+        return stats
+
+    def _leased(self, job_id: UUID, worker_id: str) -> Optional[InMemoryJob]:
+        job = self._jobs.get(job_id)
+        if job and job.status == "running" and job.leased_by == worker_id:
+            return job
+        return None
+
+    def _release(self, job: InMemoryJob, delay: timedelta):
+        now = datetime.utcnow()
+        if job.attempts >= job.max_attempts:
+            job.status = "dead"
+            job.finished_at = now
+        else:
+            job.status = "queued"
+            job.available_at = now + delay
+        job.leased_by = job.lease_expires_at = None
+
+def create_job_queue(name: str = SCRAPE_JOB_BACKEND):
+    """The shared job queue, or None when scrapes run in the in-process scheduler"""
+    if name == "postgres":
+        return PostgresJobQueue()
+    if name == "memory":
+        return InMemoryJobQueue()
+    return None
+
+# Initialize global job queue instance
+scrape_job_queue = create_job_queue()
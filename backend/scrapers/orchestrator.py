@@ -1,47 +1,49 @@
 import asyncio
+import os
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from app.models import models, schemas
-from app.services.incident_service import IncidentService
-from app.services.source_service import SourceService
-from scrapers.base_scraper import scrape_source
+from app.services.incident_service import IncidentService, incident_alert_data
+from app.services.source_service import AsyncSourceService
+from scrapers.base_scraper import stream_source
+from scrapers.http_cache import HTTPValidators
+from scrapers.entity_resolver import entity_resolver
+from scrapers.fingerprint_index import fingerprint_index
+from scrapers.pipeline import IngestPipeline, PipelineItem
+from app.utils.minhash import minhash_signatures
+from app.utils.near_duplicates import near_duplicate_index
+from app.utils.event_bus import EventType, event_bus
+from ml.threat_classifier import threat_classifier
+from database.connection import AsyncSessionLocal
 from datetime import datetime, timedelta
 import structlog
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
 
 logger = structlog.get_logger()
 
+MAX_CONCURRENT_SCRAPERS = int(os.getenv("MAX_CONCURRENT_SCRAPERS", "5"))
+
 class ScrapingOrchestrator:
-    """Orchestrates the scraping of multiple sources"""
+    """Orchestrates the scraping of multiple sources.
+
+    Every source scrape opens its own async session, so concurrent scrapes
+    overlap their database I/O instead of queueing on one connection.
+    """
     
-    def __init__(self, db: Session):
-        self.db = db
-        self.incident_service = IncidentService(db)
-        self.source_service = SourceService(db)
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.pipeline = IngestPipeline(self)
 
     async def run_scheduled_scraping(self):
         """Run scraping for all active sources that are due for scraping"""
         logger.info("Starting scheduled scraping")
         
-        active_sources = self.source_service.get_active_sources()
-        tasks = []
+        active_sources = await self.get_active_sources()
+        due_sources = [source for source in active_sources if self._is_due_for_scraping(source)]
         
-        for source in active_sources:
-            if self._is_due_for_scraping(source):
-                task = self._scrape_single_source(source)
-                tasks.append(task)
-        
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results
-            total_incidents = 0
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error scraping source {active_sources[i].name}: {result}")
-                else:
-                    total_incidents += len(result)
-                    logger.info(f"Scraped {len(result)} incidents from {active_sources[i].name}")
-            
+        if due_sources:
+            total_incidents = await self._scrape_sources(due_sources)
             logger.info(f"Scraping completed. Total new incidents: {total_incidents}")
         else:
             logger.info("No sources due for scraping")
@@ -50,58 +52,336 @@ class ScrapingOrchestrator:
         """Force scrape all active sources"""
         logger.info("Starting forced scraping of all sources")
         
-        active_sources = self.source_service.get_active_sources()
-        tasks = []
-        
-        for source in active_sources:
-            task = self._scrape_single_source(source)
-            tasks.append(task)
+        active_sources = await self.get_active_sources()
         
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            total_incidents = 0
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error scraping source {active_sources[i].name}: {result}")
-                else:
-                    total_incidents += len(result)
-                    logger.info(f"Scraped {len(result)} incidents from {active_sources[i].name}")
-            
+        if active_sources:
+            total_incidents = await self._scrape_sources(active_sources)
             logger.info(f"Forced scraping completed. Total new incidents: {total_incidents}")
 
-    async def _scrape_single_source(self, source: models.Source) -> List[Dict[str, Any]]:
-        """Scrape a single source and save incidents"""
+    async def get_active_sources(self) -> List[models.Source]:
+        async with self.session_factory() as db:
+            return await AsyncSourceService(db).get_active_sources()
+
+    async def _scrape_sources(self, sources: List[models.Source]) -> int:
+        """Scrape sources concurrently (at most MAX_CONCURRENT_SCRAPERS at a time) and return the number of new incidents"""
+        limit = asyncio.Semaphore(MAX_CONCURRENT_SCRAPERS)
+        
+        async def scrape_limited(source: models.Source) -> Dict[str, Any]:
+            async with limit:
+                return await self.scrape_one(source)
+        
+        results = await asyncio.gather(
+            *(scrape_limited(source) for source in sources),
+            return_exceptions=True
+        )
+        
+        # Process results
+        total_incidents = 0
+        for source, result in zip(sources, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error scraping source {source.name}: {result}")
+            else:
+                total_incidents += result['inserted']
+                logger.info(f"Scraped {result['inserted']} incidents from {source.name}")
+        
+        return total_incidents
+
+    async def scrape_one(self, source: models.Source) -> Dict[str, Any]:
+        """Scrape a single source and save incidents.
+
+        The scraper's stream goes through the ingest pipeline in micro-batches,
+        so fetching, dedup, classification and commits overlap. Validators
+        and last_scraped are only stored once every batch is saved, so a
+        scrape that fails halfway keeps its committed batches and is fetched
+        in full next time.
+        """
         try:
             logger.info(f"Scraping source: {source.name}")
             
-            # Scrape the source
-            raw_incidents = await scrape_source(source.source_type, source.url, source.name)
+            # Sessions are not held open across the network fetch
+            async with self.session_factory() as db:
+                validators = await db.run_sync(self._load_validators, source.id)
             
-            # Process and save incidents
-            saved_incidents = []
-            for raw_incident in raw_incidents:
-                # Check if incident already exists
-                if not self._incident_exists(raw_incident, source.id):
-                    incident_data = self._process_raw_incident(raw_incident, source.id)
-                    
-                    # Create incident
-                    incident = self.incident_service.create_incident(
-                        schemas.CyberIncidentCreate(**incident_data)
-                    )
-                    saved_incidents.append(incident)
+            # Scrape the source, conditionally on the stored validators
+            stream = stream_source(source.source_type, source.url, source.name, validators)
+            batch_results, streamed = await self.pipeline.ingest(source, stream)
             
-            # Update source last_scraped timestamp
-            source.last_scraped = datetime.utcnow()
-            self.db.commit()
+            inserted = sum(batch_result['inserted'] for batch_result in batch_results)
+            duplicates = sum(batch_result['duplicates'] for batch_result in batch_results)
+            result = {
+                'inserted': inserted,
+                # Already stored, as an incident or as a linked near-duplicate report
+                'skipped': streamed - inserted - duplicates,
+                'duplicates': duplicates,
+                'incident_ids': [incident_id for batch_result in batch_results for incident_id in batch_result['incident_ids']]
+            }
             
-            logger.info(f"Saved {len(saved_incidents)} new incidents from {source.name}")
-            return saved_incidents
+            async with self.session_factory() as db:
+                await db.run_sync(self._finish_scrape, source.id, validators)
+            result['not_modified'] = validators.not_modified
+            await fingerprint_index.save_if_due()
+            fingerprint_index.rebuild_if_due()
+            
+            event_bus.publish(EventType.source_scraped, {
+                'source_id': source.id,
+                'source_name': source.name,
+                'inserted': result['inserted'],
+                'skipped': result['skipped'],
+                'duplicates': result['duplicates'],
+                'not_modified': result['not_modified']
+            })
+            
+            if result['not_modified']:
+                logger.info(f"Source {source.name} not modified since last scrape")
+            else:
+                logger.info(f"Saved {result['inserted']} new incidents from {source.name} "
+                            f"({result['skipped']} skipped, {result['duplicates']} linked as near-duplicates)")
+            return result
             
         except Exception as e:
             logger.error(f"Error scraping source {source.name}: {e}")
             raise
 
+    async def close(self):
+        await self.pipeline.stop()
+
+    # Ingest pipeline stages; each gets a PipelineItem carrying what the previous stage returned
+
+    async def _normalize_stage(self, item: PipelineItem) -> Optional[List[Dict[str, Any]]]:
+        async with self.session_factory() as db:
+            candidates = await db.run_sync(self._dedup_batch, item.payload, item.run.source.id, item.run.seen)
+        item.items = len(candidates)
+        return candidates or None
+
+    async def _classify_stage(self, item: PipelineItem) -> Tuple[List[schemas.CyberIncidentCreate], List[Optional[bytes]]]:
+        """Enrich, classify, validate and sign the candidates.
+
+        Entity resolution needs the in-memory catalogue and is one keyword
+        pass per incident, so it stays here. Once the threat classifier is
+        loaded, the batch goes through classify_batch in a thread (the models
+        run vectorized, mostly outside the GIL). The MinHash signatures go to
+        the pipeline's CPU executor.
+        """
+        source_id = item.run.source.id
+        incidents_data = [self._process_raw_incident(raw_incident, source_id) for raw_incident in item.payload]
+        if threat_classifier.ready:
+            predictions = await asyncio.to_thread(threat_classifier.classify_batch, incidents_data, entities=False)
+            for raw_incident, incident_data, prediction in zip(item.payload, incidents_data, predictions):
+                self._apply_prediction(raw_incident, incident_data, prediction)
+        incidents = [schemas.CyberIncidentCreate(**incident_data) for incident_data in incidents_data]
+        signatures = await self.pipeline.run_cpu(
+            minhash_signatures, [(incident.title, incident.description) for incident in incidents]
+        )
+        return incidents, signatures
+
+    async def _persist_stage(self, item: PipelineItem) -> Dict[str, Any]:
+        incidents, signatures = item.payload
+        # A scrape's batches commit one at a time, so each sees the near-duplicates of the last
+        async with item.run.persist_lock:
+            async with self.session_factory() as db:
+                return await db.run_sync(self._persist_batch, item.run.source.id, incidents, signatures)
+
+    def _notify_stage(self, item: PipelineItem) -> Dict[str, Any]:
+        # Published after the batch commit; subscribers batch them
+        result = item.payload
+        for alert in result.pop('alerts'):
+            alert['source_type'] = item.run.source.source_type
+            event_bus.publish(EventType.incident_created, alert)
+        return result
+
+    def _load_validators(self, db: Session, source_id) -> HTTPValidators:
+        cache_entry = db.get(models.SourceHTTPCache, source_id)
+        if not cache_entry:
+            return HTTPValidators()
+        return HTTPValidators(cache_entry.etag, cache_entry.last_modified, cache_entry.content_hash)
+
+    def _dedup_batch(self, db: Session, raw_incidents: List[Dict[str, Any]], source_id,
+                     seen: Dict[str, Set[str]]) -> List[Dict[str, Any]]:
+        entity_resolver.refresh_if_stale(db)
+        return self._filter_existing(db, raw_incidents, source_id, seen)
+
+    def _persist_batch(self, db: Session, source_id, incidents: List[schemas.CyberIncidentCreate],
+                       signatures: List[Optional[bytes]]) -> Dict[str, Any]:
+        """Insert a classified batch with one INSERT and commit it.
+
+        Near-duplicates of stored incidents, or of earlier items in the batch,
+        are linked to that canonical incident instead of inserted. Items that
+        lose a url or external_id race to another writer are skipped, and
+        their near-duplicates are linked to the row that won.
+        """
+        try:
+            near_duplicate_index.refresh_if_stale(db)
+            matches = near_duplicate_index.match_batch(signatures)
+            incident_service = IncidentService(db)
+            
+            # Canonical incidents deleted since they were indexed (possibly by another process) are
+            # forgotten and their matches inserted as new; the lock keeps the rest until commit
+            canonical_ids = {match.canonical_id for match in matches if match and match.canonical_id}
+            live_ids = incident_service.lock_existing_incidents(canonical_ids)
+            for incident_id in canonical_ids - live_ids:
+                near_duplicate_index.remove(incident_id)
+            matches = [None if match and match.canonical_id and match.canonical_id not in live_ids else match
+                       for match in matches]
+            
+            new_positions = [position for position, match in enumerate(matches) if match is None]
+            inserted_rows = incident_service.bulk_insert_incidents(
+                [incidents[position] for position in new_positions], commit=False,
+                signatures=[signatures[position] for position in new_positions]
+            )
+            
+            # ON CONFLICT DO NOTHING drops rows from RETURNING, so rows are matched to batch items by key
+            stored_ids = self._match_rows(incidents, new_positions, inserted_rows)
+            conflicted = [position for position in new_positions if position not in stored_ids]
+            if conflicted:
+                existing = incident_service.lock_incidents_by_keys(
+                    [incidents[position].url for position in conflicted if incidents[position].url],
+                    [incidents[position].external_id for position in conflicted if incidents[position].external_id]
+                )
+                stored_ids.update(self._match_rows(incidents, conflicted, existing))
+            
+            duplicates = []
+            for position, (incident, match) in enumerate(zip(incidents, matches)):
+                if match is None:
+                    continue
+                canonical_id = match.canonical_id or stored_ids.get(match.batch_position)
+                if canonical_id:
+                    stored_ids[position] = canonical_id
+                    duplicates.append({
+                        'canonical_incident_id': canonical_id,
+                        'source_id': source_id,
+                        'title': incident.title,
+                        'url': incident.url,
+                        'external_id': incident.external_id,
+                        'similarity': match.similarity
+                    })
+            incident_service.link_duplicates(duplicates, commit=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        # Only stored items go into the indexes: inserted, linked, or held by the row they conflicted with
+        # (canonical incidents are locked, so no link can have been dropped); the rest are retried next scrape
+        for position in stored_ids:
+            incident = incidents[position]
+            fingerprint_index.add(incident.url, incident.external_id, incident.title, source_id)
+        for row in inserted_rows:
+            near_duplicate_index.add(row.id, row.minhash_signature, row.created_at)
+        
+        return {
+            'inserted': len(inserted_rows),
+            'duplicates': len(duplicates),
+            'incident_ids': [row.id for row in inserted_rows],
+            'alerts': [
+                incident_alert_data(
+                    row,
+                    sector=entity_resolver.sector_name(row.sector_id),
+                    apt_group=entity_resolver.apt_group_name(row.apt_group_id)
+                )
+                for row in inserted_rows
+            ]
+        }
+
+    @staticmethod
+    def _match_rows(incidents: List[schemas.CyberIncidentCreate], positions: List[int], rows) -> Dict[int, Any]:
+        """Batch positions mapped to the ids of the rows holding their url, external_id or (if neither) title"""
+        by_url = {row.url: row.id for row in rows if row.url}
+        by_external_id = {row.external_id: row.id for row in rows if row.external_id}
+        by_title = {row.title: row.id for row in rows if not row.url and not row.external_id}
+        matched = {}
+        for position in positions:
+            incident = incidents[position]
+            if incident.url or incident.external_id:
+                row_id = by_url.get(incident.url) or by_external_id.get(incident.external_id)
+            else:
+                # Rows without a unique key never conflict; titles are unique within a batch after _filter_existing
+                row_id = by_title.get(incident.title)
+            if row_id:
+                matched[position] = row_id
+        return matched
+
+    def _finish_scrape(self, db: Session, source_id, validators: HTTPValidators):
+        """Store the validators and last_scraped once the whole source has been saved"""
+        try:
+            self._record_http_cache(db, source_id, validators)
+            db.query(models.Source)\
+              .filter(models.Source.id == source_id)\
+              .update({models.Source.last_scraped: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def _filter_existing(self, db: Session, raw_incidents: List[Dict[str, Any]], source_id,
+                         seen: Optional[Dict[str, Set[str]]] = None) -> List[Dict[str, Any]]:
+        """Drop incidents already stored or linked as near-duplicates (by url, external_id or title within the source) or repeated in the batch.
+
+        ``seen`` carries the keys passed on by earlier batches of the same scrape and is updated in place.
+        """
+        # Known fingerprints are dropped in memory; only the maybe-new items reach the query
+        raw_incidents = fingerprint_index.drop_known(raw_incidents, source_id)
+        if not raw_incidents:
+            return []
+        
+        urls = {raw['url'] for raw in raw_incidents if raw.get('url')}
+        external_ids = {raw['external_id'] for raw in raw_incidents if raw.get('external_id')}
+        titles = {raw.get('title', '') for raw in raw_incidents}
+        
+        # Near-duplicate reports are stored as links, not incidents; both count as known
+        existing = []
+        for table in (models.CyberIncident, models.IncidentDuplicate):
+            existing += db.query(table.url, table.external_id, table.title, table.source_id).filter(
+                or_(
+                    table.url.in_(urls),
+                    table.external_id.in_(external_ids),
+                    and_(
+                        table.source_id == source_id,
+                        table.title.in_(titles)
+                    )
+                )
+            ).all()
+        
+        if seen is None:
+            seen = {'urls': set(), 'external_ids': set(), 'titles': set()}
+        seen_urls, seen_external_ids, seen_titles = seen['urls'], seen['external_ids'], seen['titles']
+        seen_urls.update(row.url for row in existing if row.url)
+        seen_external_ids.update(row.external_id for row in existing if row.external_id)
+        seen_titles.update(row.title for row in existing if row.source_id == source_id)
+        # Rows the index missed (e.g. inserted by another process) are skipped in memory next time
+        for row in existing:
+            fingerprint_index.add(row.url, row.external_id, row.title, row.source_id)
+        
+        candidates = []
+        for raw in raw_incidents:
+            url, external_id, title = raw.get('url'), raw.get('external_id'), raw.get('title', '')
+            if (url and url in seen_urls) or (external_id and external_id in seen_external_ids) or title in seen_titles:
+                continue
+            
+            candidates.append(raw)
+            if url:
+                seen_urls.add(url)
+            if external_id:
+                seen_external_ids.add(external_id)
+            seen_titles.add(title)
+        
+        return candidates
+
+    def _record_http_cache(self, db: Session, source_id, validators: HTTPValidators):
+        """Store updated validators and the outcome of this scrape (committed by the caller)"""
+        cache_entry = db.get(models.SourceHTTPCache, source_id)
+        if not cache_entry:
+            cache_entry = models.SourceHTTPCache(source_id=source_id)
+            db.add(cache_entry)
+        
+        now = datetime.utcnow()
+        cache_entry.etag = validators.etag
+        cache_entry.last_modified = validators.last_modified
+        cache_entry.content_hash = validators.content_hash
+        cache_entry.last_outcome = 'not_modified' if validators.not_modified else 'modified'
+        cache_entry.last_checked = now
+        if not validators.not_modified:
+            cache_entry.last_changed = now
+
     def _is_due_for_scraping(self, source: models.Source) -> bool:
         """Check if a source is due for scraping based on its interval"""
         if not source.last_scraped:
@@ -110,34 +390,6 @@ class ScrapingOrchestrator:
         time_since_last_scrape = datetime.utcnow() - source.last_scraped
         return time_since_last_scrape.total_seconds() >= source.scraping_interval
 
-    def _incident_exists(self, raw_incident: Dict[str, Any], source_id) -> bool:
-        """Check if an incident already exists in the database"""
-        # Check by URL if available
-        if raw_incident.get('url'):
-            existing = self.db.query(models.CyberIncident)\
-                             .filter(models.CyberIncident.url == raw_incident['url'])\
-                             .first()
-            if existing:
-                return True
-        
-        # Check by external_id if available
-        if raw_incident.get('external_id'):
-            existing = self.db.query(models.CyberIncident)\
-                             .filter(models.CyberIncident.external_id == raw_incident['external_id'])\
-                             .first()
-            if existing:
-                return True
-        
-        # Check by title and source (fuzzy match)
-        existing = self.db.query(models.CyberIncident)\
-                         .filter(
-                             models.CyberIncident.title == raw_incident.get('title', ''),
-                             models.CyberIncident.source_id == source_id
-                         )\
-                         .first()
-        
-        return existing is not None
-
     def _process_raw_incident(self, raw_incident: Dict[str, Any], source_id) -> Dict[str, Any]:
         """Process raw incident data and prepare for database insertion"""
         
@@ -156,8 +408,8 @@ class ScrapingOrchestrator:
             'apt_group_id': apt_group_id,
             'sector_id': sector_id,
             'incident_date': raw_incident.get('incident_date', datetime.utcnow()),
-            'url': raw_incident.get('url'),
-            'external_id': raw_incident.get('external_id'),
+            'url': raw_incident.get('url') or None,
+            'external_id': raw_incident.get('external_id') or None,
             'tags': raw_incident.get('tags', []),
             'indicators_of_compromise': raw_incident.get('indicators_of_compromise', {}),
             'geographical_location': raw_incident.get('geographical_location'),
@@ -169,52 +421,21 @@ class ScrapingOrchestrator:
         
         return incident_data
 
+    def _apply_prediction(self, raw_incident: Dict[str, Any], incident_data: Dict[str, Any], prediction: Dict[str, Any]):
+        """Blend a classify_batch prediction into the incident; a severity reported by the source is kept"""
+        incident_data['relevance_score'] = prediction['relevance_score']
+        if not raw_incident.get('severity'):
+            incident_data['severity'] = models.IncidentSeverity(prediction['severity'])
+        category = prediction['category']
+        if category != 'unknown' and category not in incident_data['tags']:
+            incident_data['tags'] = incident_data['tags'] + [category]
+
     def _determine_sector(self, raw_incident: Dict[str, Any]) -> str:
         """Determine the most likely sector based on incident content"""
         content = f"{raw_incident.get('title', '')} {raw_incident.get('description', '')}"
-        content_lower = content.lower()
-        
-        sector_keywords = {
-            'banking': ['bank', 'financial', 'payment', 'atm', 'credit card', 'sbi', 'icici', 'hdfc'],
-            'government': ['government', 'ministry', 'dept', 'department', 'gov.in', 'nic', 'digital india'],
-            'healthcare': ['hospital', 'medical', 'health', 'patient', 'aiims', 'healthcare'],
-            'energy': ['power', 'electricity', 'grid', 'ntpc', 'ongc', 'oil', 'gas', 'energy'],
-            'telecom': ['telecom', 'mobile', 'phone', 'airtel', 'jio', 'bsnl', 'network'],
-            'defense': ['defense', 'military', 'army', 'navy', 'air force', 'drdo', 'isro'],
-            'education': ['university', 'college', 'school', 'education', 'student', 'academic'],
-            'retail': ['retail', 'shopping', 'ecommerce', 'flipkart', 'amazon', 'store']
-        }
-        
-        for sector_type, keywords in sector_keywords.items():
-            if any(keyword in content_lower for keyword in keywords):
-                sector = self.db.query(models.Sector)\
-                               .filter(models.Sector.sector_type == models.SectorType(sector_type))\
-                               .first()
-                if sector:
-                    return sector.id
-        
-        # Default to 'other' sector
-        other_sector = self.db.query(models.Sector)\
-                             .filter(models.Sector.sector_type == models.SectorType.other)\
-                             .first()
-        return other_sector.id if other_sector else None
+        return entity_resolver.resolve_sector(content)
 
     def _determine_apt_group(self, raw_incident: Dict[str, Any]) -> str:
         """Determine if an APT group is mentioned in the incident"""
         content = f"{raw_incident.get('title', '')} {raw_incident.get('description', '')}"
-        content_lower = content.lower()
-        
-        apt_groups = self.db.query(models.APTGroup).all()
-        
-        for apt_group in apt_groups:
-            # Check group name
-            if apt_group.name.lower() in content_lower:
-                return apt_group.id
-            
-            # Check aliases
-            if apt_group.aliases:
-                for alias in apt_group.aliases:
-                    if alias.lower() in content_lower:
-                        return apt_group.id
-        
-        return None
\ No newline at end of file
+        return entity_resolver.resolve_apt_group(content)
@@ -0,0 +1,173 @@
+"""Parsers for fetched pages and feeds, run in a process pool off the event loop.
+
+The parse functions are pure and module-level so they pickle by reference:
+they take the raw response bytes and return compact incident dicts, the
+only data crossing the process boundary. Keep this module's imports light;
+every pool process imports it.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from bs4 import BeautifulSoup
+import feedparser
+from app.utils.keyword_matcher import keyword_matcher
+import structlog
+
+logger = structlog.get_logger()
+
+# Parse processes per API or worker process, capped at the available cores; 0 runs one per core
+SCRAPER_PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", "2"))
+
+def available_cores() -> int:
+    # Honours CPU affinity (taskset, container cpusets) where the platform exposes it
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def indian_relevance(text: str) -> float:
+    """Calculate relevance score for Indian cyber space"""
+    matches = keyword_matcher.match(text)
+
+    # Normalize score between 0 and 1
+    return min(len(matches.get('indian_relevance', [])) / 10.0, 1.0)
+
+def _first_label(text: str, category: str) -> str:
+    labels = keyword_matcher.labels(keyword_matcher.match(text), category)
+    return labels[0] if labels else 'low'
+
+def _parse_certin_date(date_str: str) -> datetime:
+    # Try different date formats
+    for fmt in ['%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d']:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return datetime.utcnow()
+
+def parse_certin_advisories(body: bytes, encoding: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Advisories from a CERT-In advisory listing page"""
+    soup = BeautifulSoup(body, 'html.parser', from_encoding=encoding)
+
+    incidents = []
+    # Parse CERT-In advisory structure
+    for row in soup.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) < 3:
+            continue
+        title = cells[1].get_text(strip=True)
+        date_str = cells[0].get_text(strip=True)
+        anchor = cells[1].find('a')
+        link = anchor['href'] if anchor else ""
+
+        if title and date_str:
+            incidents.append({
+                'title': title,
+                'url': f"https://www.cert-in.org.in{link}" if link.startswith('/') else link,
+                'incident_date': _parse_certin_date(date_str),
+                'severity': _first_label(title, 'certin_severity'),
+                'description': title,
+                'relevance_score': indian_relevance(title),
+                'tags': keyword_matcher.labels(keyword_matcher.match(title), 'certin_tag')
+            })
+    return incidents
+
+def parse_rss_entries(body: bytes) -> List[Dict[str, Any]]:
+    """Entries of an RSS or Atom feed; feedparser detects the encoding from the bytes"""
+    feed = feedparser.parse(body)
+
+    incidents = []
+    for entry in feed.entries:
+        title = entry.get('title', '')
+        summary = entry.get('summary', '')
+        published = entry.get('published_parsed')
+        incidents.append({
+            'title': title,
+            'description': summary,
+            'content': entry.get('content', [{}])[0].get('value', '') if entry.get('content') else '',
+            'url': entry.get('link', ''),
+            'incident_date': datetime(*published[:6]) if published else datetime.utcnow(),
+            'severity': _first_label(f"{title} {summary}", 'rss_severity'),
+            'tags': keyword_matcher.labels(keyword_matcher.match(f"{title} {summary}"), 'rss_tag'),
+            'relevance_score': indian_relevance(f"{title} {summary}")
+        })
+    return incidents
+
+def parse_pastebin_results(body: bytes, encoding: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+    """Title and url of the first ``limit`` Pastebin search results"""
+    soup = BeautifulSoup(body, 'html.parser', from_encoding=encoding)
+
+    results = []
+    for result in soup.find_all('div', class_='paste_box_line')[:limit]:
+        title_elem = result.find('a')
+        if title_elem:
+            title = title_elem.get_text(strip=True)
+            results.append({
+                'title': title,
+                'url': f"https://pastebin.com{title_elem['href']}",
+                'relevance_score': indian_relevance(title)
+            })
+    return results
+
+class ParsePool:
+    """Process pool for the parse functions above and other CPU-bound ingest work (MinHash signatures).
+
+    Processes are spawned rather than forked, so they never inherit the
+    event loop, open sockets or the locks of other threads. Each child
+    re-imports the parent's main module, so scrape workers start from the
+    light scrapers/__main__.py. The pool starts on first use and is replaced
+    if a process dies mid-parse.
+    """
+
+    def __init__(self, workers: int = SCRAPER_PARSE_WORKERS):
+        # Every API and worker process has its own pool, so keep them small
+        self.workers = min(workers, available_cores()) if workers > 0 else available_cores()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.parsed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    async def run(self, parser: Callable, *args):
+        """Run a parse function in the pool and return its result"""
+        executor = self._get_executor()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(executor, parser, *args)
+        except BrokenProcessPool:
+            self.failed += 1
+            if self._executor is executor:
+                logger.error("Parse pool process died, restarting the pool")
+                self._executor = None
+                self.restarts += 1
+                executor.shutdown(wait=False)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.parsed += 1
+        return result
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._executor is not None,
+            'workers': self.workers,
+            'parsed': self.parsed,
+            'failed': self.failed,
+            'restarts': self.restarts
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+# Initialize global parse pool instance
+parse_pool = ParsePool()
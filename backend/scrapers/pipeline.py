@@ -0,0 +1,268 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+from app.models import models
+from scrapers.parsing import parse_pool
+import structlog
+
+logger = structlog.get_logger()
+
+# Streamed incidents enter the pipeline in micro-batches of this size
+SCRAPER_STREAM_BATCH_SIZE = int(os.getenv("SCRAPER_STREAM_BATCH_SIZE", "50"))
+# Batches waiting in front of each stage; a full queue blocks the stage before it
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+PIPELINE_NORMALIZE_CONCURRENCY = int(os.getenv("PIPELINE_NORMALIZE_CONCURRENCY", "2"))
+PIPELINE_CLASSIFY_CONCURRENCY = int(os.getenv("PIPELINE_CLASSIFY_CONCURRENCY", "2"))
+# Where classify computes MinHash signatures, its CPU-bound part: "process" in the parse pool,
+# "thread" in a thread pool (which still holds the GIL), "none" on the event loop
+PIPELINE_CLASSIFY_EXECUTOR = os.getenv("PIPELINE_CLASSIFY_EXECUTOR", "process")
+# One persister serializes commits, so near-duplicates across concurrent scrapes see each other
+PIPELINE_PERSIST_CONCURRENCY = int(os.getenv("PIPELINE_PERSIST_CONCURRENCY", "1"))
+PIPELINE_NOTIFY_CONCURRENCY = int(os.getenv("PIPELINE_NOTIFY_CONCURRENCY", "1"))
+# Throughput is averaged over this many seconds
+PIPELINE_METRICS_WINDOW = int(os.getenv("PIPELINE_METRICS_WINDOW", "60"))
+
+class StageMetrics:
+    """Counters, latencies and recent throughput of one pipeline stage"""
+
+    SMOOTHING = 0.2
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.failed = 0
+        self.busy = 0
+        self.latency: Optional[float] = None
+        self.wait: Optional[float] = None
+        self._recent: Deque[Tuple[float, int]] = deque()
+
+    def record(self, items: int, latency: float, wait: float):
+        self.batches += 1
+        self.items += items
+        self.latency = latency if self.latency is None else self.latency + self.SMOOTHING * (latency - self.latency)
+        self.wait = wait if self.wait is None else self.wait + self.SMOOTHING * (wait - self.wait)
+        now = time.monotonic()
+        self._recent.append((now, items))
+        while self._recent and self._recent[0][0] < now - PIPELINE_METRICS_WINDOW:
+            self._recent.popleft()
+
+    def items_per_second(self) -> float:
+        cutoff = time.monotonic() - PIPELINE_METRICS_WINDOW
+        return round(sum(items for at, items in self._recent if at >= cutoff) / PIPELINE_METRICS_WINDOW, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'failed': self.failed,
+            'busy': self.busy,
+            'items_per_second': self.items_per_second(),
+            'avg_latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            # Time a batch spent queued in front of the stage (fetch: blocked on the next stage)
+            'avg_wait_ms': round(self.wait * 1000, 1) if self.wait is not None else None
+        }
+
+class ScrapeRun:
+    """Per-scrape state shared by the batches of one source"""
+
+    def __init__(self, source: models.Source):
+        self.source = source
+        # Keys already passed on by earlier batches, so batches in flight never insert each other
+        self.seen: Dict[str, Set[str]] = {'urls': set(), 'external_ids': set(), 'titles': set()}
+        # With PIPELINE_PERSIST_CONCURRENCY > 1, batches of one scrape would otherwise commit concurrently and
+        # miss each other's near-duplicates; a no-op with the default single persister
+        self.persist_lock = asyncio.Lock()
+
+class PipelineItem:
+    """One micro-batch moving through the stages"""
+
+    def __init__(self, run: ScrapeRun, payload: Any, items: int):
+        self.run = run
+        self.payload = payload
+        self.items = items
+        self.raw_count = items
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+class PipelineStage:
+    """A bounded queue drained by ``concurrency`` workers.
+
+    The handler receives a PipelineItem and returns the payload for the next
+    stage, or None when nothing is left to do for the batch. Coroutine
+    handlers are awaited; plain functions run inline on the event loop. The
+    last stage's return value resolves the batch's future; an exception
+    fails it.
+    """
+
+    def __init__(self, name: str, handler: Callable, concurrency: int, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.metrics = StageMetrics(name)
+        self.next_stage: Optional["PipelineStage"] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def put(self, item: PipelineItem):
+        item.enqueued_at = time.monotonic()
+        await self._queue.put(item)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.metrics.to_dict(),
+            concurrency=self.concurrency,
+            queue_depth=self._queue.qsize() if self._queue else 0,
+            queue_size=self.queue_size
+        )
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            started = time.monotonic()
+            wait = started - item.enqueued_at
+            self.metrics.busy += 1
+            try:
+                payload = await self._run(item)
+            except asyncio.CancelledError:
+                if not item.future.done():
+                    item.future.cancel()
+                raise
+            except Exception as e:
+                self.metrics.failed += 1
+                if not item.future.done():
+                    item.future.set_exception(e)
+                continue
+            finally:
+                self.metrics.busy -= 1
+
+            self.metrics.record(item.items, time.monotonic() - started, wait)
+            if payload is None or self.next_stage is None:
+                if not item.future.done():
+                    item.future.set_result(payload)
+                continue
+
+            item.payload = payload
+            try:
+                await self.next_stage.put(item)
+            except asyncio.CancelledError:
+                item.future.cancel()
+                raise
+
+    async def _run(self, item: PipelineItem):
+        if asyncio.iscoroutinefunction(self.handler):
+            return await self.handler(item)
+        return self.handler(item)
+
+class IngestPipeline:
+    """fetch -> normalize/dedup -> classify -> persist -> notify, over bounded queues.
+
+    Fetching and parsing happen in each scrape's own stream, which is cut
+    into micro-batches and pushed into the first queue; when the stages
+    fall behind, their full queues block the scrapes (backpressure), so
+    memory stays bounded. The stage callbacks come from the orchestrator.
+    Stages hand CPU-bound work to run_cpu, which by default uses the parse
+    process pool: pure-Python work in threads would still hold the GIL.
+    Per-stage throughput, latency, queue wait and depth are in get_stats.
+    """
+
+    def __init__(self, orchestrator, batch_size: int = SCRAPER_STREAM_BATCH_SIZE):
+        self.orchestrator = orchestrator
+        self.batch_size = batch_size
+        self.fetch_metrics = StageMetrics("fetch")
+        self.cpu_executor = PIPELINE_CLASSIFY_EXECUTOR
+        self._threads = ThreadPoolExecutor(max_workers=PIPELINE_CLASSIFY_CONCURRENCY, thread_name_prefix="ingest-classify") \
+            if self.cpu_executor == "thread" else None
+        self.stages = [
+            PipelineStage("normalize", orchestrator._normalize_stage, PIPELINE_NORMALIZE_CONCURRENCY),
+            PipelineStage("classify", orchestrator._classify_stage, PIPELINE_CLASSIFY_CONCURRENCY),
+            PipelineStage("persist", orchestrator._persist_stage, PIPELINE_PERSIST_CONCURRENCY),
+            PipelineStage("notify", orchestrator._notify_stage, PIPELINE_NOTIFY_CONCURRENCY),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self._started = False
+
+    async def start(self):
+        if self._started:
+            return
+        self._started = True
+        for stage in self.stages:
+            await stage.start()
+
+    async def stop(self):
+        for stage in self.stages:
+            await stage.stop()
+        self._started = False
+
+    async def ingest(self, source: models.Source, stream: AsyncIterator[Dict[str, Any]]) -> Tuple[List[Any], int]:
+        """Push a scrape's stream through the pipeline.
+
+        Returns the results of the batches that reached the last stage and
+        the number of incidents streamed, once every batch is done.
+        """
+        await self.start()
+        run = ScrapeRun(source)
+        pending: List[asyncio.Future] = []
+        streamed = 0
+        try:
+            batch: List[Dict[str, Any]] = []
+            started = time.monotonic()
+            async for raw_incident in stream:
+                streamed += 1
+                batch.append(raw_incident)
+                if len(batch) >= self.batch_size:
+                    pending.append(await self._submit(run, batch, started))
+                    batch = []
+                    started = time.monotonic()
+            if batch:
+                pending.append(await self._submit(run, batch, started))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.fetch_metrics.failed += 1
+            # Batches already submitted still finish; their results are dropped with the scrape
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+        # Wait for every batch, then report the first failure
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [result for result in results if result is not None], streamed
+
+    async def run_cpu(self, func: Callable, *args):
+        """Run CPU-bound stage work where PIPELINE_CLASSIFY_EXECUTOR says; ``func`` must be picklable for "process"."""
+        if self.cpu_executor == "process":
+            return await parse_pool.run(func, *args)
+        if self._threads:
+            return await asyncio.get_running_loop().run_in_executor(self._threads, func, *args)
+        return func(*args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {'fetch': self.fetch_metrics.to_dict(), 'cpu_executor': self.cpu_executor}
+        stats.update({stage.name: stage.get_stats() for stage in self.stages})
+        return stats
+
+    async def _submit(self, run: ScrapeRun, batch: List[Dict[str, Any]], started: float) -> asyncio.Future:
+        fetched = time.monotonic()
+        item = PipelineItem(run, batch, len(batch))
+        await self.stages[0].put(item)
+        # Latency is the time spent producing the batch, wait the time blocked on a full queue
+        self.fetch_metrics.record(len(batch), fetched - started, time.monotonic() - fetched)
+        return item.future
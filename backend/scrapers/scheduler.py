@@ -0,0 +1,332 @@
+import asyncio
+import heapq
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.models import models
+from database.connection import async_engine
+from scrapers.base_scraper import fetch_host
+from scrapers.orchestrator import ScrapingOrchestrator
+import structlog
+
+logger = structlog.get_logger()
+
+# Every API process may enable it; a Postgres advisory lock elects the one that schedules
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "720190"))
+# How often a standby process retries the lock and the leader checks it still holds it
+SCHEDULER_ELECTION_INTERVAL = int(os.getenv("SCHEDULER_ELECTION_INTERVAL", "30"))
+MAX_CONCURRENT_SCRAPERS = int(os.getenv("MAX_CONCURRENT_SCRAPERS", "5"))
+SCRAPER_PER_HOST_LIMIT = int(os.getenv("SCRAPER_PER_HOST_LIMIT", "2"))
+# Random delay added to each next-due time, as a fraction of the source's interval
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+# How often the source list is reloaded to pick up added, changed or disabled sources
+SCHEDULER_REFRESH_INTERVAL = int(os.getenv("SCHEDULER_REFRESH_INTERVAL", "300"))
+SCHEDULER_JOB_HISTORY = int(os.getenv("SCHEDULER_JOB_HISTORY", "1000"))
+
+class ScrapeJob:
+    """One scrape of one source, scheduled or triggered through the API"""
+
+    def __init__(self, source: models.Source, trigger: str):
+        self.id = str(uuid.uuid4())
+        self.source = source
+        self.trigger = trigger
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'source_id': str(self.source.id),
+            'source_name': self.source.name,
+            'trigger': self.trigger,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'result': self.result,
+            'error': self.error
+        }
+
+class ScrapeScheduler:
+    """Runs source scrapes when they fall due, from a min-heap of next-due times.
+
+    The scheduling loop sleeps until the earliest deadline (or until woken
+    by a new entry) instead of polling every source. Due sources become
+    jobs on a queue drained by a fixed pool of workers; each job also takes
+    a per-host semaphore so one site is never hit by many scrapes at once.
+    A source is rescheduled when its job finishes, at its interval plus
+    random jitter, so sources sharing an interval drift apart.
+
+    Only the process holding the scheduler advisory lock schedules; the
+    others stand by and take over when its connection, and so the lock,
+    goes away. Jobs live in the leader's memory.
+    """
+
+    def __init__(self, orchestrator: Optional[ScrapingOrchestrator] = None, workers: int = MAX_CONCURRENT_SCRAPERS,
+                 per_host_limit: int = SCRAPER_PER_HOST_LIMIT, jitter: float = SCHEDULER_JITTER):
+        self.orchestrator = orchestrator or ScrapingOrchestrator()
+        self.workers = workers
+        self.per_host_limit = per_host_limit
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, UUID]] = []
+        self._counter = 0
+        self._next_due: Dict[UUID, float] = {}
+        self._sources: Dict[UUID, models.Source] = {}
+        self._pending: Dict[UUID, ScrapeJob] = {}
+        self._jobs: "OrderedDict[str, ScrapeJob]" = OrderedDict()
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._election: Optional[asyncio.Task] = None
+        self._lock_connection: Optional[AsyncConnection] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def standby(self) -> bool:
+        return self._election is not None and not self.running
+
+    async def start(self):
+        """Compete for the scheduler lock; scheduling starts once this process holds it"""
+        if self._election:
+            return
+        self._election = asyncio.create_task(self._elect())
+
+    async def stop(self):
+        if self._election:
+            self._election.cancel()
+            await asyncio.gather(self._election, return_exceptions=True)
+            self._election = None
+        await self._stop_scheduling()
+        await self.orchestrator.close()
+
+    async def _elect(self):
+        while True:
+            try:
+                if await self._acquire_lock():
+                    await self._start_scheduling()
+                    await self._hold_lock()
+                    logger.warning("Lost the scrape scheduler lock, standing by")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in scrape scheduler election: {e}")
+            await self._stop_scheduling()
+            await asyncio.sleep(SCHEDULER_ELECTION_INTERVAL)
+
+    async def _acquire_lock(self) -> bool:
+        # Autocommit, so the leader's connection does not sit idle in a transaction
+        connection = await async_engine.connect()
+        try:
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = await connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), {'key': SCHEDULER_LOCK_KEY})
+        except Exception:
+            await connection.close()
+            raise
+        if not acquired:
+            await connection.close()
+            return False
+        self._lock_connection = connection
+        return True
+
+    async def _hold_lock(self):
+        """Return once the lock connection fails; the session, and the lock with it, is gone"""
+        while True:
+            await asyncio.sleep(SCHEDULER_ELECTION_INTERVAL)
+            try:
+                await self._lock_connection.scalar(text("SELECT 1"))
+            except Exception as e:
+                logger.error(f"Scrape scheduler lock connection failed: {e}")
+                return
+
+    async def _release_lock(self):
+        if not self._lock_connection:
+            return
+        # Invalidated rather than returned to the pool, which would keep the session and its lock
+        try:
+            await self._lock_connection.invalidate()
+            await self._lock_connection.close()
+        except Exception as e:
+            logger.error(f"Error releasing the scrape scheduler lock: {e}")
+        self._lock_connection = None
+
+    async def _start_scheduling(self):
+        self._heap = []
+        self._next_due = {}
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        await self.refresh_sources()
+
+        self._tasks = [asyncio.create_task(self._schedule_loop()), asyncio.create_task(self._refresh_loop())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Scrape scheduler started with {self.workers} workers for {len(self._sources)} sources")
+
+    async def _stop_scheduling(self):
+        # Jobs cut short here are not retried; their sources fall due again on the next leader
+        for job in self._pending.values():
+            job.status = "failed"
+            job.error = "Scrape scheduler stopped"
+            job.finished_at = datetime.utcnow()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending = {}
+        await self._release_lock()
+
+    async def refresh_sources(self):
+        """Reload active sources; new ones, and those whose interval changed, are scheduled from their last scrape time"""
+        sources = await self.orchestrator.get_active_sources()
+        previous = self._sources
+        self._sources = {source.id: source for source in sources}
+
+        for source_id in list(self._next_due):
+            if source_id not in self._sources:
+                del self._next_due[source_id]
+
+        for source in sources:
+            # A running source is rescheduled with its current interval when it finishes
+            if source.id in self._pending:
+                continue
+            old = previous.get(source.id)
+            if source.id not in self._next_due or (old and old.scraping_interval != source.scraping_interval):
+                self._schedule(source, self._initial_due(source))
+
+    def enqueue(self, source: models.Source, trigger: str = "manual") -> ScrapeJob:
+        """Queue a scrape now; a source already queued or running returns its pending job"""
+        if source.id in self._pending:
+            return self._pending[source.id]
+
+        job = ScrapeJob(source, trigger)
+        self._pending[source.id] = job
+        self._remember(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ScrapeJob]:
+        return self._jobs.get(job_id)
+
+    def recent_jobs(self, limit: int = 50) -> List[ScrapeJob]:
+        return list(self._jobs.values())[-limit:][::-1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'standby': self.standby,
+            'workers': self.workers,
+            'sources': len(self._sources),
+            'queued': self._queue.qsize() if self._queue else 0,
+            'in_progress': sum(1 for job in self._pending.values() if job.status == "running"),
+            'next_due_in': round(self._heap[0][0] - time.time(), 1) if self._heap else None
+        }
+
+    def _initial_due(self, source: models.Source) -> float:
+        if not source.last_scraped:
+            return time.time() + random.uniform(0, self.jitter * source.scraping_interval)
+        elapsed = (datetime.utcnow() - source.last_scraped).total_seconds()
+        return time.time() + max(source.scraping_interval - elapsed, 0) + \
+            random.uniform(0, self.jitter * source.scraping_interval)
+
+    def _schedule(self, source: models.Source, due: float):
+        # Superseded heap entries are skipped when popped, by comparing with _next_due
+        self._next_due[source.id] = due
+        self._counter += 1
+        heapq.heappush(self._heap, (due, self._counter, source.id))
+        self._wakeup.set()
+
+    def _remember(self, job: ScrapeJob):
+        self._jobs[job.id] = job
+        while len(self._jobs) > SCHEDULER_JOB_HISTORY:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done:
+                break
+            del self._jobs[oldest_id]
+
+    async def _schedule_loop(self):
+        while True:
+            if not self._heap:
+                await self._sleep(None)
+                continue
+
+            due, _, source_id = self._heap[0]
+            delay = due - time.time()
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+
+            heapq.heappop(self._heap)
+            if self._next_due.get(source_id) != due:
+                continue
+
+            del self._next_due[source_id]
+            self.enqueue(self._sources[source_id], "scheduled")
+
+    async def _sleep(self, timeout: Optional[float]):
+        """Sleep until the timeout or until a new entry is scheduled"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(SCHEDULER_REFRESH_INTERVAL)
+            try:
+                await self.refresh_sources()
+            except Exception as e:
+                logger.error(f"Error refreshing scheduler sources: {e}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            source = job.source
+            try:
+                # Keyed on the host actually fetched: every GitHub source shares api.github.com
+                async with self._host_limit(fetch_host(source.source_type, source.url)):
+                    job.status = "running"
+                    job.started_at = datetime.utcnow()
+                    result = await self.orchestrator.scrape_one(source)
+                job.result = {key: result[key] for key in ('inserted', 'skipped', 'duplicates', 'not_modified')}
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = datetime.utcnow()
+                self._pending.pop(source.id, None)
+
+            # Sources removed or disabled meanwhile are not rescheduled
+            current = self._sources.get(source.id)
+            if current:
+                self._schedule(current, time.time() + current.scraping_interval +
+                               random.uniform(0, self.jitter * current.scraping_interval))
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+# Initialize global scheduler instance
+scrape_scheduler = ScrapeScheduler()
@@ -0,0 +1,226 @@
+"""Scrape worker: pulls leased source jobs from the shared queue and scrapes them.
+
+Usage (from the backend directory): python -m scrapers [--concurrency N]
+
+Run any number of workers on any number of nodes with SCRAPE_JOB_BACKEND=postgres.
+Each one also enqueues sources that are due and reclaims expired leases; both are
+idempotent, so it does not matter which worker does it first.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from typing import Optional, Set
+from app.models import models
+from app.services.dashboard_service import invalidate_dashboard_snapshot
+from app.services.source_service import AsyncSourceService
+from app.services.scrape_job_service import JobLease
+from app.utils.event_bus import INCIDENT_EVENTS, EventType, event_bus
+from app.utils.websocket_manager import WebSocketManager
+from scrapers.fingerprint_index import fingerprint_index
+from scrapers.http_client import http_client
+from scrapers.job_queue import scrape_job_queue
+from scrapers.orchestrator import ScrapingOrchestrator
+from scrapers.parsing import parse_pool
+from ml.threat_classifier import ML_WARMUP_ON_STARTUP, threat_classifier
+import structlog
+
+logger = structlog.get_logger()
+
+SCRAPE_WORKER_CONCURRENCY = int(os.getenv("SCRAPE_WORKER_CONCURRENCY", "5"))
+SCRAPE_WORKER_POLL_INTERVAL = float(os.getenv("SCRAPE_WORKER_POLL_INTERVAL", "2"))
+# How often each worker enqueues due sources, reclaims expired leases and purges old jobs
+SCRAPE_WORKER_MAINTENANCE_INTERVAL = int(os.getenv("SCRAPE_WORKER_MAINTENANCE_INTERVAL", "60"))
+
+class ScrapeWorker:
+    """Claims up to ``concurrency`` jobs at a time and keeps their leases alive.
+
+    A heartbeat extends each lease while its scrape runs. If a heartbeat
+    finds the lease gone (it expired and another worker took the job), the
+    scrape is cancelled rather than finished twice.
+    """
+
+    def __init__(self, queue, orchestrator: Optional[ScrapingOrchestrator] = None,
+                 concurrency: int = SCRAPE_WORKER_CONCURRENCY, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.orchestrator = orchestrator or ScrapingOrchestrator()
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._active: Set[asyncio.Task] = set()
+        self._tasks = []
+        self.succeeded = 0
+        self.failed = 0
+        self.leases_lost = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._tasks = [asyncio.create_task(self._claim_loop()), asyncio.create_task(self._maintenance_loop())]
+        logger.info(f"Scrape worker {self.worker_id} started on the {self.queue.name} queue "
+                    f"with concurrency {self.concurrency}")
+
+    async def stop(self):
+        # Jobs cut short here are picked up again once their leases expire
+        tasks = self._tasks + list(self._active)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        await self.orchestrator.close()
+
+    def get_stats(self):
+        return {
+            'worker_id': self.worker_id,
+            'running': self.running,
+            'concurrency': self.concurrency,
+            'active': len(self._active),
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'leases_lost': self.leases_lost
+        }
+
+    async def _claim_loop(self):
+        while True:
+            free = self.concurrency - len(self._active)
+            if free <= 0:
+                await asyncio.wait(self._active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                leases = await self.queue.claim(self.worker_id, free)
+            except Exception as e:
+                logger.error(f"Error claiming scrape jobs: {e}")
+                leases = []
+
+            for lease in leases:
+                task = asyncio.create_task(self._run_job(lease))
+                self._active.add(task)
+                task.add_done_callback(self._active.discard)
+
+            if not leases:
+                await asyncio.sleep(SCRAPE_WORKER_POLL_INTERVAL)
+
+    async def _maintenance_loop(self):
+        while True:
+            try:
+                reclaimed = await self.queue.reclaim_expired()
+                if reclaimed:
+                    logger.warning(f"Reclaimed {reclaimed} scrape jobs with expired leases")
+                await self._enqueue_due_sources()
+                await self.queue.purge_finished()
+            except Exception as e:
+                logger.error(f"Error in scrape worker maintenance: {e}")
+            await asyncio.sleep(SCRAPE_WORKER_MAINTENANCE_INTERVAL)
+
+    async def _enqueue_due_sources(self):
+        for source in await self.orchestrator.get_active_sources():
+            if self.orchestrator._is_due_for_scraping(source):
+                # The cooldown keeps failed or dead-lettered sources from being requeued every pass
+                await self.queue.enqueue(source.id, "scheduled", cooldown=source.scraping_interval)
+
+    async def _run_job(self, lease: JobLease):
+        try:
+            source = await self._load_source(lease)
+        except Exception as e:
+            await self._fail(lease, f"Error loading source: {e}")
+            return
+
+        if not source:
+            await self._complete(lease, {'skipped': 'source missing or inactive'})
+            return
+
+        scrape = asyncio.create_task(self.orchestrator.scrape_one(source))
+        heartbeat = asyncio.create_task(self._heartbeat(lease, scrape))
+        try:
+            result = await scrape
+        except asyncio.CancelledError:
+            if heartbeat.done():
+                self.leases_lost += 1
+                return
+            scrape.cancel()
+            raise
+        except Exception as e:
+            await self._fail(lease, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        await self._complete(lease, {key: result[key] for key in ('inserted', 'skipped', 'duplicates', 'not_modified')})
+
+    async def _load_source(self, lease: JobLease) -> Optional[models.Source]:
+        async with self.orchestrator.session_factory() as db:
+            source = await AsyncSourceService(db).get_source_by_id(lease.source_id)
+        return source if source and source.is_active else None
+
+    async def _heartbeat(self, lease: JobLease, scrape: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                held = await self.queue.heartbeat(lease.job_id, self.worker_id)
+            except Exception as e:
+                logger.error(f"Error extending lease on scrape job {lease.job_id}: {e}")
+                continue
+            if not held:
+                logger.warning(f"Lost lease on scrape job {lease.job_id}, cancelling scrape")
+                scrape.cancel()
+                return
+
+    async def _complete(self, lease: JobLease, result):
+        try:
+            if await self.queue.complete(lease.job_id, self.worker_id, result):
+                self.succeeded += 1
+            else:
+                self.leases_lost += 1
+        except Exception as e:
+            logger.error(f"Error completing scrape job {lease.job_id}: {e}")
+
+    async def _fail(self, lease: JobLease, error: str):
+        self.failed += 1
+        try:
+            await self.queue.fail(lease.job_id, self.worker_id, error)
+        except Exception as e:
+            logger.error(f"Error failing scrape job {lease.job_id}: {e}")
+
+async def run_worker(concurrency: int):
+    if scrape_job_queue is None or scrape_job_queue.name != "postgres":
+        logger.error("Scrape workers need the shared queue: set SCRAPE_JOB_BACKEND=postgres")
+        return
+
+    # Alerts and cache invalidations reach the API processes through the backplane and shared cache
+    websocket_manager = WebSocketManager()
+    await websocket_manager.start()
+    event_bus.subscribe(INCIDENT_EVENTS, invalidate_dashboard_snapshot)
+    event_bus.subscribe(INCIDENT_EVENTS + (EventType.source_scraped,), websocket_manager.handle_events)
+
+    fingerprint_index.start_warm_up()
+    # Ingest classifies with the models once they are loaded, and with the scrapers' heuristics until then
+    if ML_WARMUP_ON_STARTUP:
+        threat_classifier.start_warm_up()
+    worker = ScrapeWorker(scrape_job_queue, concurrency=concurrency)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    await worker.start()
+    try:
+        await stopping.wait()
+    finally:
+        logger.info(f"Stopping scrape worker {worker.worker_id}")
+        await worker.stop()
+        await event_bus.drain()
+        fingerprint_index.save()
+        await websocket_manager.close()
+        await http_client.close()
+        parse_pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a scrape worker")
+    parser.add_argument("--concurrency", type=int, default=SCRAPE_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.concurrency))
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from structlog.testing import capture_logs
+from app.utils.event_bus import EventBus, EventType
+
+class Recorder:
+    """Event handler keeping each batch it receives"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, events):
+        self.batches.append([event.payload['n'] for event in events])
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_events_within_the_window_are_delivered_as_one_batch():
+    bus, handler = EventBus(), Recorder()
+    bus.subscribe((EventType.incident_created,), handler, window=0.05)
+
+    for n in range(3):
+        bus.publish(EventType.incident_created, {'n': n})
+    await settle()
+    assert handler.batches == []
+    assert bus.get_stats()['pending'] == 3
+
+    await asyncio.sleep(0.1)
+    assert handler.batches == [[0, 1, 2]]
+
+    # The next event opens a new window
+    bus.publish(EventType.incident_created, {'n': 3})
+    await asyncio.sleep(0.1)
+    assert handler.batches == [[0, 1, 2], [3]]
+    assert bus.batches_delivered == 2
+
+@pytest.mark.asyncio
+async def test_full_batch_is_delivered_without_waiting_for_the_window():
+    bus, handler = EventBus(), Recorder()
+    bus.subscribe((EventType.incident_created,), handler, window=60, max_batch=2)
+
+    for n in range(5):
+        bus.publish(EventType.incident_created, {'n': n})
+    await settle()
+    assert handler.batches == [[0, 1], [2, 3]]
+
+    await bus.drain()
+    assert handler.batches == [[0, 1], [2, 3], [4]]
+    assert bus.get_stats()['pending'] == 0
+
+@pytest.mark.asyncio
+async def test_subscribers_only_receive_their_event_types():
+    bus, created, deleted = EventBus(), Recorder(), Recorder()
+    bus.subscribe((EventType.incident_created,), created, window=60)
+    bus.subscribe((EventType.incident_deleted, EventType.incident_created), deleted, window=60)
+
+    bus.publish(EventType.incident_created, {'n': 1})
+    bus.publish(EventType.incident_deleted, {'n': 2})
+    bus.publish(EventType.source_scraped, {'n': 3})
+    await bus.drain()
+
+    assert created.batches == [[1]]
+    assert deleted.batches == [[1, 2]]
+    assert bus.published == 3
+
+@pytest.mark.asyncio
+async def test_failing_handler_does_not_affect_other_subscribers():
+    bus, handler = EventBus(), Recorder()
+
+    async def broken(events):
+        raise RuntimeError("subscriber down")
+
+    bus.subscribe((EventType.incident_created,), broken, window=60)
+    bus.subscribe((EventType.incident_created,), handler, window=60)
+    with capture_logs() as logs:
+        bus.publish(EventType.incident_created, {'n': 1})
+        await bus.drain()
+
+    assert handler.batches == [[1]]
+    assert bus.batches_delivered == 1
+    assert any("subscriber down" in log['event'] for log in logs if log['log_level'] == 'error')
+
+@pytest.mark.asyncio
+async def test_unsubscribed_handler_receives_nothing_pending():
+    bus, handler = EventBus(), Recorder()
+    subscription = bus.subscribe((EventType.incident_created,), handler, window=0.05)
+
+    bus.publish(EventType.incident_created, {'n': 1})
+    bus.unsubscribe(subscription)
+    await asyncio.sleep(0.1)
+    assert handler.batches == []
+
+def test_events_published_outside_the_event_loop_are_dropped_and_logged():
+    bus = EventBus()
+    bus.subscribe((EventType.incident_created,), Recorder())
+
+    with capture_logs() as logs:
+        bus.publish(EventType.incident_created, {'n': 1})
+        # Nothing subscribes to this type, so nothing is lost
+        bus.publish(EventType.source_scraped, {'n': 2})
+
+    assert bus.get_stats()['dropped'] == 2
+    assert bus.published == 0
+    assert [(log['log_level'], log['event']) for log in logs] == [
+        ('warning', "Dropping incident.created event published outside the event loop")
+    ]
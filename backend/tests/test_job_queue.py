@@ -0,0 +1,108 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from scrapers.job_queue import InMemoryJobQueue
+
+async def claim_one(queue: InMemoryJobQueue, worker_id: str):
+    leases = await queue.claim(worker_id)
+    assert len(leases) == 1
+    return leases[0]
+
+async def make_available(queue: InMemoryJobQueue, job_id):
+    (await queue.get_job(job_id)).available_at = datetime.utcnow() - timedelta(seconds=1)
+
+@pytest.mark.asyncio
+async def test_claim_leases_each_job_to_one_worker():
+    queue = InMemoryJobQueue()
+    first, second = uuid.uuid4(), uuid.uuid4()
+    job_id = await queue.enqueue(first)
+    await queue.enqueue(second)
+
+    # A source has at most one active job
+    assert await queue.enqueue(first) == job_id
+
+    lease = await claim_one(queue, "worker-1")
+    other = await queue.claim("worker-2", limit=5)
+    assert len(other) == 1
+    assert {lease.source_id, other[0].source_id} == {first, second}
+    assert lease.attempts == 1
+    assert await queue.claim("worker-3", limit=5) == []
+
+    job = await queue.get_job(lease.job_id)
+    assert job.status == "running"
+    assert job.leased_by == "worker-1"
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed_and_the_old_holder_loses_it():
+    queue = InMemoryJobQueue()
+    job_id = await queue.enqueue(uuid.uuid4())
+    await claim_one(queue, "worker-1")
+    assert await queue.heartbeat(job_id, "worker-1")
+
+    (await queue.get_job(job_id)).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert await queue.reclaim_expired() == 1
+
+    lease = await claim_one(queue, "worker-2")
+    assert lease.attempts == 2
+    assert not await queue.heartbeat(job_id, "worker-1")
+    assert not await queue.complete(job_id, "worker-1", {'inserted': 1})
+
+    assert await queue.complete(job_id, "worker-2", {'inserted': 2})
+    job = await queue.get_job(job_id)
+    assert job.status == "succeeded"
+    assert job.result == {'inserted': 2}
+    assert job.leased_by is None
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_with_exponential_backoff():
+    queue = InMemoryJobQueue(retry_backoff=60, max_attempts=3)
+    job_id = await queue.enqueue(uuid.uuid4())
+
+    await claim_one(queue, "worker-1")
+    before = datetime.utcnow()
+    assert await queue.fail(job_id, "worker-1", "timeout")
+    job = await queue.get_job(job_id)
+    assert job.status == "queued"
+    assert job.last_error == "timeout"
+    assert job.available_at >= before + timedelta(seconds=60)
+
+    # Not claimable until the backoff has passed
+    assert await queue.claim("worker-1") == []
+
+    await make_available(queue, job_id)
+    await claim_one(queue, "worker-1")
+    before = datetime.utcnow()
+    assert await queue.fail(job_id, "worker-1", "timeout")
+    assert job.available_at >= before + timedelta(seconds=120)
+
+@pytest.mark.asyncio
+async def test_job_is_dead_lettered_after_max_attempts():
+    queue = InMemoryJobQueue(retry_backoff=60, max_attempts=2)
+    source_id = uuid.uuid4()
+    job_id = await queue.enqueue(source_id)
+
+    await claim_one(queue, "worker-1")
+    await queue.fail(job_id, "worker-1", "boom")
+    await make_available(queue, job_id)
+    await claim_one(queue, "worker-1")
+    await queue.fail(job_id, "worker-1", "boom")
+
+    job = await queue.get_job(job_id)
+    assert job.status == "dead"
+    assert job.finished_at is not None
+    assert await queue.claim("worker-1") == []
+    assert await queue.get_stats() == {'dead': 1}
+
+    # Within the cooldown a dead job is not requeued; without one it is
+    assert await queue.enqueue(source_id, cooldown=3600) is None
+    assert await queue.enqueue(source_id) not in (None, job_id)
+
+@pytest.mark.asyncio
+async def test_expired_lease_on_last_attempt_is_dead_lettered():
+    queue = InMemoryJobQueue(max_attempts=1)
+    job_id = await queue.enqueue(uuid.uuid4())
+    await claim_one(queue, "worker-1")
+
+    (await queue.get_job(job_id)).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert await queue.reclaim_expired() == 1
+    assert (await queue.get_job(job_id)).status == "dead"
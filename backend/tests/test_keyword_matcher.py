@@ -0,0 +1,64 @@
+from app.utils.keyword_matcher import KeywordMatcher, keyword_matcher
+
+def make_matcher(**categories):
+    return KeywordMatcher({category: (1.0, keywords) for category, keywords in categories.items()})
+
+def test_keywords_match_only_at_word_boundaries():
+    matcher = make_matcher(threat=['ransomware', 'atm', 'gov.in'])
+
+    assert matcher.match("New RANSOMWARE strain") == {'threat': ['ransomware']}
+    assert matcher.match("(ransomware)") == {'threat': ['ransomware']}
+    assert matcher.match("antiransomware tooling") == {}
+    assert matcher.match("ransomwarekit sold") == {}
+    assert matcher.match("an atmosphere of fear") == {}
+    assert matcher.match("defaced example.gov.in portal") == {'threat': ['gov.in']}
+
+def test_plural_s_and_es_suffixes_match_the_keyword():
+    matcher = make_matcher(threat=['breach', 'exploit', 'patch'])
+
+    assert matcher.match("two exploits and several breaches") == {'threat': ['breach', 'exploit']}
+    assert matcher.match("patches released") == {'threat': ['patch']}
+    # Other suffixes still break the word
+    assert matcher.match("exploited, breached") == {}
+
+def test_star_keywords_match_as_prefixes():
+    matcher = make_matcher(banking=['bank*'], other=['bank'])
+
+    hits = matcher.find_all("Banking trojans hit the banks")
+    assert [(hit.keyword, hit.category, hit.start, hit.end) for hit in hits] == [
+        ('bank', 'banking', 0, 4),
+        ('bank', 'banking', 24, 28),
+        ('bank', 'other', 24, 28),
+    ]
+    # A prefix still needs a word boundary on its left
+    assert matcher.match("databanking") == {}
+
+def test_overlapping_keywords_are_all_found():
+    matcher = make_matcher(threat=['data breach', 'breach'], region=['india'])
+
+    assert matcher.match("India data breach") == {'threat': ['data breach', 'breach'], 'region': ['india']}
+
+def test_categories_and_keywords_follow_definition_order():
+    matcher = make_matcher(**{
+        'sector:banking': ['payment', 'bank*'],
+        'sector:healthcare': ['hospital'],
+        'sector:government': ['ministry'],
+    })
+
+    matches = matcher.match("Ministry says hospital payment systems and banks were hit")
+    assert list(matches) == ['sector:banking', 'sector:healthcare', 'sector:government']
+    assert matches['sector:banking'] == ['payment', 'bank']
+    assert matcher.labels(matches, 'sector') == ['banking', 'healthcare', 'government']
+
+def test_sector_priority_uses_the_keyword_set_order():
+    # Banking is defined before healthcare, whichever appears first in the text
+    matches = keyword_matcher.match("hospital staff targeted by bank phishing")
+    assert keyword_matcher.labels(matches, 'sector')[:2] == ['banking', 'healthcare']
+
+def test_score_sums_category_weights_over_distinct_keywords():
+    matcher = KeywordMatcher({'high': (2.0, ['apt', 'zero-day']), 'low': (0.5, ['scan'])})
+
+    matches = matcher.match("APT uses a zero-day after a scan, then another scan")
+    assert matches == {'high': ['apt', 'zero-day'], 'low': ['scan']}
+    assert matcher.score(matches, 'high', 'low') == 4.5
+    assert matcher.weight('missing') == 1.0
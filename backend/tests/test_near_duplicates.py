@@ -0,0 +1,122 @@
+import sys
+import uuid
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta
+from app.utils.minhash import MINHASH_PERMUTATIONS, minhash_signature, minhash_signatures, similarity, unpack_signature
+from app.utils.near_duplicates import LSH_BANDS, LSH_ROWS, LSHIndex, NearDuplicateIndex
+
+ADVISORY = ("Critical vulnerability in Apache Struts exploited",
+            "Attackers are exploiting a remote code execution flaw in Apache Struts to breach government portals "
+            "across several states, CERT-In warned on Monday.")
+REWORDED = ("Critical vulnerability in Apache Struts exploited",
+            "Attackers are exploiting a remote code execution flaw in Apache Struts to breach government portals "
+            "across several states, CERT-In warned on Tuesday.")
+UNRELATED = ("Phishing campaign targets bank customers",
+             "A wave of SMS messages impersonating a large private bank asks customers to update KYC details.")
+
+Row = namedtuple("Row", ["id", "minhash_signature", "created_at"])
+
+def pack(values):
+    signature = array("I", values)
+    if sys.byteorder == "big":
+        signature.byteswap()
+    return signature.tobytes()
+
+def variant(base, shared_bands, equal_per_other_band=0):
+    """A copy of ``base`` sharing whole bands, and some values of the other bands"""
+    values = list(base)
+    for band in range(shared_bands, LSH_BANDS):
+        for row in range(equal_per_other_band, LSH_ROWS):
+            values[band * LSH_ROWS + row] += 1
+    return values
+
+class FakeSession:
+    """Answers the near-duplicate refresh query with incidents created since its filter"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def query(self, *columns):
+        return self
+
+    def filter(self, *criteria):
+        since = criteria[0].right.value
+        self.result = sorted((row for row in self.rows if row.created_at >= since), key=lambda row: row.created_at)
+        return self
+
+    def order_by(self, *columns):
+        return self
+
+    def all(self):
+        return self.result
+
+def test_signature_is_deterministic_and_tracks_similarity():
+    signature = minhash_signature(*ADVISORY)
+
+    assert len(signature) == MINHASH_PERMUTATIONS * 4
+    assert minhash_signature(*ADVISORY) == signature
+    assert minhash_signature(ADVISORY[0].upper(), ADVISORY[1] + "!!") == signature
+    assert minhash_signature(None, "") is None
+    assert minhash_signatures([ADVISORY, (None, None)]) == [signature, None]
+
+    values = unpack_signature(signature)
+    assert similarity(values, unpack_signature(minhash_signature(*REWORDED))) > 0.8
+    assert similarity(values, unpack_signature(minhash_signature(*UNRELATED))) < 0.2
+
+def test_lsh_only_compares_items_sharing_a_whole_band():
+    base = list(range(MINHASH_PERMUTATIONS))
+    index = LSHIndex()
+    index.add("base", pack(base))
+
+    # Seven of every eight values equal, but no band is whole: never a candidate
+    assert similarity(array("I", base), array("I", variant(base, 0, LSH_ROWS - 1))) > 0.85
+    assert index.query(pack(variant(base, 0, LSH_ROWS - 1)), 0.7) is None
+
+    # One shared band makes a candidate, which is then held to the threshold
+    assert index.query(pack(variant(base, 1)), 0.7) is None
+    assert index.query(pack(variant(base, 1)), 0.05) == ("base", 1 / LSH_BANDS)
+    assert index.query(pack(variant(base, 12)), 0.7) == ("base", 0.75)
+
+    index.remove("base")
+    assert len(index) == 0 and index.bucket_count() == 0
+    assert index.query(pack(base), 0.0) is None
+
+def test_match_batch_matches_stored_incidents_then_earlier_items():
+    index = NearDuplicateIndex(threshold=0.7, enabled=True)
+    stored_id = uuid.uuid4()
+    index.add(stored_id, minhash_signature(*UNRELATED))
+
+    matches = index.match_batch(minhash_signatures([ADVISORY, UNRELATED, REWORDED, (None, None), ADVISORY]))
+
+    assert matches[0] is None
+    assert matches[1].canonical_id == stored_id and matches[1].batch_position is None
+    # Within the batch, duplicates point at the first item of their group
+    assert matches[2].canonical_id is None and matches[2].batch_position == 0
+    assert matches[2].similarity >= 0.7
+    assert matches[3] is None
+    assert (matches[4].batch_position, matches[4].similarity) == (0, 1.0)
+    assert index.duplicates_found == 3
+
+def test_refresh_indexes_the_window_and_evicts_incidents_that_leave_it():
+    now = datetime.utcnow()
+    recent, old = uuid.uuid4(), uuid.uuid4()
+    session = FakeSession([
+        Row(old, minhash_signature(*UNRELATED), now - timedelta(days=31)),
+        Row(recent, minhash_signature(*ADVISORY), now - timedelta(days=29)),
+    ])
+    index = NearDuplicateIndex(threshold=0.7, window_days=30, refresh_interval=0, enabled=True)
+    # Indexed as it was stored, a month ago
+    index.add(old, minhash_signature(*UNRELATED), now - timedelta(days=31))
+
+    index.refresh_if_stale(session)
+    assert old not in index._lsh and recent in index._lsh
+    assert index.get_stats()['indexed'] == 1
+    assert index.match_batch([minhash_signature(*REWORDED)])[0].canonical_id == recent
+    assert index.match_batch([minhash_signature(*UNRELATED)]) == [None]
+
+def test_disabled_index_matches_nothing():
+    index = NearDuplicateIndex(enabled=False)
+    index.add(uuid.uuid4(), minhash_signature(*ADVISORY))
+
+    assert index.match_batch(minhash_signatures([ADVISORY, ADVISORY])) == [None, None]
@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from scrapers.pipeline import IngestPipeline, PipelineItem, PipelineStage, ScrapeRun
+
+SOURCE = SimpleNamespace(id=1, name="test source")
+
+async def passthrough(item: PipelineItem):
+    return item.payload
+
+def make_pipeline(batch_size: int = 2, queue_size: int = 4, **handlers):
+    """An ingest pipeline over plain async handlers, one worker per stage"""
+    orchestrator = SimpleNamespace(**{
+        f"_{name}_stage": handlers.get(name, passthrough) for name in ("normalize", "classify", "persist", "notify")
+    })
+    pipeline = IngestPipeline(orchestrator, batch_size=batch_size)
+    for stage in pipeline.stages:
+        stage.concurrency = 1
+        stage.queue_size = queue_size
+    return pipeline
+
+async def stream(count: int, produced: list = None):
+    for index in range(count):
+        if produced is not None:
+            produced.append(index)
+        yield {'title': f"incident {index}"}
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_batches_flow_through_every_stage():
+    async def classify(item):
+        return [raw['title'].upper() for raw in item.payload]
+
+    def persist(item):
+        # Plain functions run inline; None ends the batch early
+        return item.payload if len(item.payload) > 1 else None
+
+    pipeline = make_pipeline(classify=classify, persist=persist)
+    try:
+        results, streamed = await pipeline.ingest(SOURCE, stream(5))
+    finally:
+        await pipeline.stop()
+
+    assert streamed == 5
+    assert results == [["INCIDENT 0", "INCIDENT 1"], ["INCIDENT 2", "INCIDENT 3"]]
+    stats = pipeline.get_stats()
+    assert stats['fetch']['items'] == 5
+    assert stats['classify']['batches'] == 3
+    assert stats['notify']['batches'] == 2
+
+@pytest.mark.asyncio
+async def test_full_queues_block_the_stream():
+    release = asyncio.Event()
+
+    async def normalize(item):
+        await release.wait()
+        return item.payload
+
+    produced = []
+    pipeline = make_pipeline(batch_size=1, queue_size=1, normalize=normalize)
+    ingest = asyncio.create_task(pipeline.ingest(SOURCE, stream(10, produced)))
+    try:
+        await settle()
+        # One batch held by the normalize worker, one queued, one blocked in put()
+        assert len(produced) == 3
+        assert not ingest.done()
+        assert pipeline.stages[0].get_stats()['queue_depth'] == 1
+
+        release.set()
+        results, streamed = await ingest
+    finally:
+        await pipeline.stop()
+
+    assert streamed == 10 and len(produced) == 10
+    assert len(results) == 10
+
+@pytest.mark.asyncio
+async def test_stage_failure_fails_its_batch_and_the_scrape():
+    reached_persist = []
+
+    async def classify(item):
+        if item.payload[0]['title'] == "incident 2":
+            raise ValueError("classifier exploded")
+        return item.payload
+
+    async def persist(item):
+        reached_persist.append(item.payload[0]['title'])
+        return item.payload
+
+    pipeline = make_pipeline(classify=classify, persist=persist)
+    try:
+        with pytest.raises(ValueError, match="classifier exploded"):
+            await pipeline.ingest(SOURCE, stream(6))
+    finally:
+        await pipeline.stop()
+
+    # The other batches still ran to completion before the failure was reported
+    assert reached_persist == ["incident 0", "incident 4"]
+    assert pipeline.stages[1].metrics.failed == 1
+
+@pytest.mark.asyncio
+async def test_stage_resolves_the_future_of_the_last_stage():
+    stage = PipelineStage("only", passthrough, concurrency=1, queue_size=1)
+    await stage.start()
+    try:
+        item = PipelineItem(ScrapeRun(SOURCE), ["payload"], 1)
+        await stage.put(item)
+        assert await asyncio.wait_for(item.future, 1) == ["payload"]
+    finally:
+        await stage.stop()
+
+@pytest.mark.asyncio
+async def test_stopping_a_stage_cancels_the_batch_in_flight():
+    started = asyncio.Event()
+
+    async def handler(item):
+        started.set()
+        await asyncio.Event().wait()
+
+    stage = PipelineStage("stuck", handler, concurrency=1, queue_size=1)
+    await stage.start()
+    item = PipelineItem(ScrapeRun(SOURCE), ["payload"], 1)
+    await stage.put(item)
+    await started.wait()
+    await stage.stop()
+
+    assert item.future.cancelled()
+    assert stage.metrics.busy == 0
+
+@pytest.mark.asyncio
+async def test_cancelling_a_scrape_cancels_ingest():
+    async def normalize(item):
+        await asyncio.Event().wait()
+
+    produced = []
+    pipeline = make_pipeline(batch_size=1, queue_size=1, normalize=normalize)
+    ingest = asyncio.create_task(pipeline.ingest(SOURCE, stream(10, produced)))
+    try:
+        await settle()
+        ingest.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await ingest
+        await settle()
+    finally:
+        await pipeline.stop()
+
+    # The stream stops being read where it was blocked on the full queue
+    assert len(produced) == 3
+    assert pipeline.fetch_metrics.failed == 0
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from app.utils.cache import InProcessCacheBackend, SnapshotCache
+
+class Snapshot:
+    """compute() callback counting its calls, optionally held until released"""
+
+    def __init__(self, hold: bool = False):
+        self.calls = 0
+        self.release = asyncio.Event()
+        if not hold:
+            self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        await self.release.wait()
+        return {'build': call}
+
+def make_cache(ttl: int = 30, stale_ttl: int = 600) -> SnapshotCache:
+    return SnapshotCache(InProcessCacheBackend(), "test:snapshot", ttl, stale_ttl)
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_fresh_snapshot_is_served_until_invalidated():
+    cache, compute = make_cache(), Snapshot()
+
+    assert await cache.get(compute) == {'build': 1}
+    assert await cache.get(compute) == {'build': 1}
+    assert compute.calls == 1
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    await cache.invalidate()
+    # The stale snapshot is served while it is rebuilt in the background
+    assert await cache.get(compute) == {'build': 1}
+    await settle()
+    assert await cache.get(compute) == {'build': 2}
+    assert (cache.stale_hits, cache.hits) == (1, 2)
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_rebuild():
+    cache, compute = make_cache(), Snapshot(hold=True)
+
+    callers = [asyncio.create_task(cache.get(compute)) for _ in range(5)]
+    await settle()
+    assert compute.calls == 1
+    assert cache.get_stats()['rebuilding']
+
+    compute.release.set()
+    assert await asyncio.gather(*callers) == [{'build': 1}] * 5
+    assert compute.calls == 1 and cache.misses == 5
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_rebuild():
+    cache, compute = make_cache(), Snapshot(hold=True)
+
+    first = asyncio.create_task(cache.get(compute))
+    second = asyncio.create_task(cache.get(compute))
+    await settle()
+    first.cancel()
+    compute.release.set()
+
+    assert await second == {'build': 1}
+    assert first.cancelled()
+    assert compute.calls == 1
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_is_served_during_a_single_background_rebuild():
+    cache, compute = make_cache(), Snapshot()
+    await cache.get(compute)
+    await cache.invalidate()
+    compute.release.clear()
+
+    assert [await cache.get(compute) for _ in range(3)] == [{'build': 1}] * 3
+    await settle()
+    assert compute.calls == 2
+    assert await cache.get(compute) == {'build': 1}
+    assert cache.stale_hits == 4
+
+    compute.release.set()
+    await settle()
+    assert await cache.get(compute) == {'build': 2}
+    assert not cache.get_stats()['rebuilding']
+
+@pytest.mark.asyncio
+async def test_expired_snapshot_is_stale():
+    cache, compute = make_cache(ttl=0), Snapshot()
+
+    await cache.get(compute)
+    assert await cache.get(compute) == {'build': 1}
+    await settle()
+    assert compute.calls == 2
+    assert cache.stale_hits == 1
+
+@pytest.mark.asyncio
+async def test_write_during_rebuild_keeps_the_new_snapshot_stale():
+    cache, compute = make_cache(), Snapshot(hold=True)
+
+    rebuild = asyncio.create_task(cache.get(compute))
+    await settle()
+    # The rebuild read the version before this write, so its result is already outdated
+    await cache.invalidate()
+    compute.release.set()
+    assert await rebuild == {'build': 1}
+
+    assert await cache.get(compute) == {'build': 1}
+    await settle()
+    assert compute.calls == 2
+    assert await cache.get(compute) == {'build': 2}
+
+@pytest.mark.asyncio
+async def test_failed_rebuild_fails_the_waiting_callers_and_is_retried():
+    cache = make_cache()
+
+    async def broken():
+        raise RuntimeError("database unavailable")
+
+    with pytest.raises(RuntimeError, match="database unavailable"):
+        await cache.get(broken)
+    assert await cache.get(Snapshot()) == {'build': 1}
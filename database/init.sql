@@ -21,6 +21,36 @@ CREATE TABLE sources (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- HTTP validators for conditional scraping (ETag / Last-Modified / body hash)
+CREATE TABLE source_http_cache (
+    source_id UUID PRIMARY KEY REFERENCES sources(id) ON DELETE CASCADE,
+    etag TEXT,
+    last_modified VARCHAR(100),
+    content_hash VARCHAR(64),
+    last_outcome VARCHAR(50), -- 'modified' or 'not_modified'
+    last_checked TIMESTAMP,
+    last_changed TIMESTAMP
+);
+
+-- Scrape jobs leased by distributed scrape workers (SELECT ... FOR UPDATE SKIP LOCKED)
+CREATE TABLE scrape_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    source_id UUID NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, succeeded, dead
+    trigger VARCHAR(20) NOT NULL DEFAULT 'scheduled', -- scheduled, manual
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    leased_by VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    result JSONB,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
 -- APT Groups table
 CREATE TABLE apt_groups (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -66,7 +96,26 @@ CREATE TABLE cyber_incidents (
     relevance_score FLOAT DEFAULT 0.5,
     is_verified BOOLEAN DEFAULT false,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'C')
+    ) STORED,
+    minhash_signature BYTEA -- MinHash of title+description shingles (near-duplicate detection)
+);
+
+-- Near-duplicate reports linked to the incident they repeat
+CREATE TABLE incident_duplicates (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    canonical_incident_id UUID NOT NULL REFERENCES cyber_incidents(id) ON DELETE CASCADE,
+    source_id UUID REFERENCES sources(id) ON DELETE CASCADE,
+    title VARCHAR(500) NOT NULL,
+    url TEXT,
+    external_id VARCHAR(255),
+    similarity FLOAT NOT NULL,
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_incident_duplicates_report UNIQUE (canonical_incident_id, source_id, title)
 );
 
 -- Classifications table for ML categorization
@@ -88,6 +137,24 @@ CREATE TABLE incident_classifications (
     PRIMARY KEY (incident_id, classification_id)
 );
 
+-- Daily incident rollups for analytics, maintained by triggers on cyber_incidents
+CREATE TABLE incident_daily_rollups (
+    id SERIAL PRIMARY KEY,
+    day DATE, -- discovered_date::date
+    sector_id UUID,
+    severity incident_severity,
+    status incident_status,
+    source_id UUID,
+    apt_group_id UUID,
+    location VARCHAR(255),
+    incident_count INTEGER NOT NULL DEFAULT 0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    relevance_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_incident_date TIMESTAMP,
+    CONSTRAINT uq_incident_daily_rollups UNIQUE NULLS NOT DISTINCT
+        (day, sector_id, severity, status, source_id, apt_group_id, location)
+);
+
 -- Users table for authentication
 CREATE TABLE users (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -105,15 +172,31 @@ CREATE INDEX idx_incidents_severity ON cyber_incidents(severity);
 CREATE INDEX idx_incidents_status ON cyber_incidents(status);
 CREATE INDEX idx_incidents_date ON cyber_incidents(incident_date);
 CREATE INDEX idx_incidents_discovered ON cyber_incidents(discovered_date);
+CREATE INDEX idx_incidents_discovered_id ON cyber_incidents(discovered_date DESC, id DESC); -- keyset pagination
 CREATE INDEX idx_incidents_relevance ON cyber_incidents(relevance_score);
 CREATE INDEX idx_incidents_sector ON cyber_incidents(sector_id);
 CREATE INDEX idx_incidents_apt ON cyber_incidents(apt_group_id);
 CREATE INDEX idx_incidents_source ON cyber_incidents(source_id);
+CREATE INDEX idx_incidents_source_title ON cyber_incidents(source_id, title);
+CREATE INDEX idx_incidents_created ON cyber_incidents(created_at); -- fingerprint and near-duplicate index catch-up
+CREATE INDEX idx_incident_duplicates_url ON incident_duplicates(url); -- ingest dedup of linked reports
+CREATE INDEX idx_incident_duplicates_external_id ON incident_duplicates(external_id);
+CREATE INDEX idx_incident_duplicates_source_title ON incident_duplicates(source_id, title);
+
+CREATE INDEX idx_incident_rollups_day ON incident_daily_rollups(day);
+
+-- Scrape job queue: ready jobs, expired leases, at most one active job per source
+CREATE INDEX idx_scrape_jobs_ready ON scrape_jobs(available_at) WHERE status = 'queued';
+CREATE INDEX idx_scrape_jobs_lease ON scrape_jobs(lease_expires_at) WHERE status = 'running';
+CREATE INDEX idx_scrape_jobs_source_finished ON scrape_jobs(source_id, finished_at);
+CREATE UNIQUE INDEX uq_scrape_jobs_active_source ON scrape_jobs(source_id) WHERE status IN ('queued', 'running');
 
--- Full-text search indexes
-CREATE INDEX idx_incidents_title_search ON cyber_incidents USING gin(to_tsvector('english', title));
-CREATE INDEX idx_incidents_description_search ON cyber_incidents USING gin(to_tsvector('english', description));
-CREATE INDEX idx_incidents_content_search ON cyber_incidents USING gin(to_tsvector('english', content));
+-- Unique keys used by bulk ingest (INSERT ... ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX uq_incidents_url ON cyber_incidents(url) WHERE url IS NOT NULL;
+CREATE UNIQUE INDEX uq_incidents_external_id ON cyber_incidents(external_id) WHERE external_id IS NOT NULL;
+
+-- Full-text search index over the stored weighted document
+CREATE INDEX idx_incidents_search_vector ON cyber_incidents USING gin(search_vector);
 
 -- Trigram indexes for fuzzy search
 CREATE INDEX idx_incidents_title_trgm ON cyber_incidents USING gin(title gin_trgm_ops);
@@ -169,4 +252,86 @@ $$ language 'plpgsql';
 -- Create triggers for updated_at
 CREATE TRIGGER update_sources_modtime BEFORE UPDATE ON sources FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 CREATE TRIGGER update_incidents_modtime BEFORE UPDATE ON cyber_incidents FOR EACH ROW EXECUTE FUNCTION update_modified_column();
-CREATE TRIGGER update_apt_groups_modtime BEFORE UPDATE ON apt_groups FOR EACH ROW EXECUTE FUNCTION update_modified_column();
\ No newline at end of file
+CREATE TRIGGER update_apt_groups_modtime BEFORE UPDATE ON apt_groups FOR EACH ROW EXECUTE FUNCTION update_modified_column();
+
+-- Add (delta = 1) or remove (delta = -1) one incident from its rollup row
+CREATE OR REPLACE FUNCTION apply_incident_rollup(incident cyber_incidents, delta INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    rollup_id INTEGER;
+    remaining INTEGER;
+    last_date TIMESTAMP;
+BEGIN
+    -- Upsert the delta so removals also find their row through the unique index
+    INSERT INTO incident_daily_rollups AS r (day, sector_id, severity, status, source_id, apt_group_id, location,
+                                             incident_count, critical_count, relevance_sum, last_incident_date)
+    VALUES (incident.discovered_date::date, incident.sector_id, incident.severity, incident.status,
+            incident.source_id, incident.apt_group_id, incident.geographical_location,
+            delta, delta * COALESCE((incident.severity = 'critical')::int, 0),
+            delta * COALESCE(incident.relevance_score, 0),
+            CASE WHEN delta > 0 THEN incident.incident_date END)
+    ON CONFLICT ON CONSTRAINT uq_incident_daily_rollups DO UPDATE SET
+        incident_count = r.incident_count + EXCLUDED.incident_count,
+        critical_count = r.critical_count + EXCLUDED.critical_count,
+        relevance_sum = r.relevance_sum + EXCLUDED.relevance_sum,
+        last_incident_date = GREATEST(r.last_incident_date, EXCLUDED.last_incident_date)
+    RETURNING r.id, r.incident_count, r.last_incident_date INTO rollup_id, remaining, last_date;
+
+    IF remaining <= 0 THEN
+        DELETE FROM incident_daily_rollups WHERE id = rollup_id;
+    ELSIF delta < 0 AND incident.incident_date >= last_date THEN
+        -- The removed incident may have been the latest one of its group
+        UPDATE incident_daily_rollups SET last_incident_date = (
+            SELECT max(c.incident_date) FROM cyber_incidents c
+            WHERE ((c.discovered_date >= incident.discovered_date::date
+                    AND c.discovered_date < incident.discovered_date::date + 1)
+                   OR (incident.discovered_date IS NULL AND c.discovered_date IS NULL))
+              AND c.sector_id IS NOT DISTINCT FROM incident.sector_id
+              AND c.severity IS NOT DISTINCT FROM incident.severity
+              AND c.status IS NOT DISTINCT FROM incident.status
+              AND c.source_id IS NOT DISTINCT FROM incident.source_id
+              AND c.apt_group_id IS NOT DISTINCT FROM incident.apt_group_id
+              AND c.geographical_location IS NOT DISTINCT FROM incident.geographical_location
+        ) WHERE id = rollup_id;
+    END IF;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION maintain_incident_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_incident_rollup(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_incident_rollup(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Recompute every rollup row from cyber_incidents (backfill); returns the number of rows written
+CREATE OR REPLACE FUNCTION rebuild_incident_rollups()
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    -- Block incident writes so no trigger delta is lost while rebuilding
+    LOCK TABLE cyber_incidents IN SHARE MODE;
+    DELETE FROM incident_daily_rollups;
+    INSERT INTO incident_daily_rollups (day, sector_id, severity, status, source_id, apt_group_id, location,
+                                        incident_count, critical_count, relevance_sum, last_incident_date)
+    SELECT discovered_date::date, sector_id, severity, status, source_id, apt_group_id, geographical_location,
+           count(*), count(*) FILTER (WHERE severity = 'critical'),
+           COALESCE(sum(relevance_score), 0), max(incident_date)
+    FROM cyber_incidents
+    GROUP BY discovered_date::date, sector_id, severity, status, source_id, apt_group_id, geographical_location;
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER maintain_incident_rollups
+    AFTER INSERT OR DELETE OR UPDATE OF discovered_date, sector_id, severity, status, source_id, apt_group_id,
+                                        geographical_location, relevance_score, incident_date
+    ON cyber_incidents FOR EACH ROW EXECUTE FUNCTION maintain_incident_rollups();
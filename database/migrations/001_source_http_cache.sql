@@ -0,0 +1,17 @@
+-- HTTP validators for conditional scraping (ETag / Last-Modified / body hash)
+--
+-- Usage: psql cyber_intelligence < database/migrations/001_source_http_cache.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS source_http_cache (
+    source_id UUID PRIMARY KEY REFERENCES sources(id) ON DELETE CASCADE,
+    etag TEXT,
+    last_modified VARCHAR(100),
+    content_hash VARCHAR(64),
+    last_outcome VARCHAR(50), -- 'modified' or 'not_modified'
+    last_checked TIMESTAMP,
+    last_changed TIMESTAMP
+);
+
+COMMIT;
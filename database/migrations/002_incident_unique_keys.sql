@@ -0,0 +1,56 @@
+-- Unique keys used by bulk ingest (INSERT ... ON CONFLICT DO NOTHING) and the
+-- per-source title index used by ingest dedup.
+--
+-- Rows repeating another incident's url or external_id are folded into the
+-- oldest one: their classifications move to it and then they are deleted.
+-- The analytics rollups do not exist yet; 005 builds them from what is left.
+--
+-- Usage: psql cyber_intelligence < database/migrations/002_incident_unique_keys.sql
+
+BEGIN;
+
+-- Keep ingest from inserting new repeats until the indexes exist
+LOCK TABLE cyber_incidents IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TEMP TABLE repeated_incidents (
+    id UUID PRIMARY KEY,
+    keep_id UUID NOT NULL
+) ON COMMIT DROP;
+
+CREATE FUNCTION pg_temp.fold_repeated_incidents(key_column TEXT) RETURNS INTEGER AS $$
+DECLARE
+    folded INTEGER;
+BEGIN
+    TRUNCATE repeated_incidents;
+    EXECUTE format(
+        'INSERT INTO repeated_incidents (id, keep_id)
+         SELECT id, keep_id FROM (
+             SELECT id, first_value(id) OVER (PARTITION BY %1$I ORDER BY created_at, id) AS keep_id
+             FROM cyber_incidents
+             WHERE %1$I IS NOT NULL
+         ) ranked
+         WHERE id <> keep_id',
+        key_column
+    );
+    GET DIAGNOSTICS folded = ROW_COUNT;
+
+    INSERT INTO incident_classifications (incident_id, classification_id, confidence_score)
+    SELECT r.keep_id, ic.classification_id, ic.confidence_score
+    FROM incident_classifications ic
+    JOIN repeated_incidents r ON r.id = ic.incident_id
+    ON CONFLICT DO NOTHING;
+
+    -- Cascades remove what was copied above
+    DELETE FROM cyber_incidents c USING repeated_incidents r WHERE c.id = r.id;
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT pg_temp.fold_repeated_incidents('url') AS folded_by_url;
+SELECT pg_temp.fold_repeated_incidents('external_id') AS folded_by_external_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_incidents_url ON cyber_incidents(url) WHERE url IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_incidents_external_id ON cyber_incidents(external_id) WHERE external_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_incidents_source_title ON cyber_incidents(source_id, title);
+
+COMMIT;
@@ -0,0 +1,5 @@
+-- Index behind keyset cursor pagination of GET /api/incidents
+--
+-- Usage: psql cyber_intelligence < database/migrations/003_incident_keyset_index.sql
+
+CREATE INDEX IF NOT EXISTS idx_incidents_discovered_id ON cyber_incidents(discovered_date DESC, id DESC);
@@ -0,0 +1,20 @@
+-- Stored weighted tsvector for ranked full-text search, replacing the three
+-- per-column expression indexes. Adding the generated column rewrites
+-- cyber_incidents, so run it in a quiet period.
+--
+-- Usage: psql cyber_intelligence < database/migrations/004_incident_search_vector.sql
+
+BEGIN;
+
+ALTER TABLE cyber_incidents ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'C')
+) STORED;
+
+DROP INDEX IF EXISTS idx_incidents_title_search;
+DROP INDEX IF EXISTS idx_incidents_description_search;
+DROP INDEX IF EXISTS idx_incidents_content_search;
+CREATE INDEX IF NOT EXISTS idx_incidents_search_vector ON cyber_incidents USING gin(search_vector);
+
+COMMIT;
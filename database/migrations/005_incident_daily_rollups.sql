@@ -0,0 +1,112 @@
+-- Daily incident rollups for analytics, maintained by triggers on cyber_incidents,
+-- then backfilled from the incidents already stored.
+--
+-- Usage: psql cyber_intelligence < database/migrations/005_incident_daily_rollups.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS incident_daily_rollups (
+    id SERIAL PRIMARY KEY,
+    day DATE, -- discovered_date::date
+    sector_id UUID,
+    severity incident_severity,
+    status incident_status,
+    source_id UUID,
+    apt_group_id UUID,
+    location VARCHAR(255),
+    incident_count INTEGER NOT NULL DEFAULT 0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    relevance_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_incident_date TIMESTAMP,
+    CONSTRAINT uq_incident_daily_rollups UNIQUE NULLS NOT DISTINCT
+        (day, sector_id, severity, status, source_id, apt_group_id, location)
+);
+
+CREATE INDEX IF NOT EXISTS idx_incident_rollups_day ON incident_daily_rollups(day);
+
+-- Add (delta = 1) or remove (delta = -1) one incident from its rollup row
+CREATE OR REPLACE FUNCTION apply_incident_rollup(incident cyber_incidents, delta INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    rollup_id INTEGER;
+    remaining INTEGER;
+    last_date TIMESTAMP;
+BEGIN
+    -- Upsert the delta so removals also find their row through the unique index
+    INSERT INTO incident_daily_rollups AS r (day, sector_id, severity, status, source_id, apt_group_id, location,
+                                             incident_count, critical_count, relevance_sum, last_incident_date)
+    VALUES (incident.discovered_date::date, incident.sector_id, incident.severity, incident.status,
+            incident.source_id, incident.apt_group_id, incident.geographical_location,
+            delta, delta * COALESCE((incident.severity = 'critical')::int, 0),
+            delta * COALESCE(incident.relevance_score, 0),
+            CASE WHEN delta > 0 THEN incident.incident_date END)
+    ON CONFLICT ON CONSTRAINT uq_incident_daily_rollups DO UPDATE SET
+        incident_count = r.incident_count + EXCLUDED.incident_count,
+        critical_count = r.critical_count + EXCLUDED.critical_count,
+        relevance_sum = r.relevance_sum + EXCLUDED.relevance_sum,
+        last_incident_date = GREATEST(r.last_incident_date, EXCLUDED.last_incident_date)
+    RETURNING r.id, r.incident_count, r.last_incident_date INTO rollup_id, remaining, last_date;
+
+    IF remaining <= 0 THEN
+        DELETE FROM incident_daily_rollups WHERE id = rollup_id;
+    ELSIF delta < 0 AND incident.incident_date >= last_date THEN
+        -- The removed incident may have been the latest one of its group
+        UPDATE incident_daily_rollups SET last_incident_date = (
+            SELECT max(c.incident_date) FROM cyber_incidents c
+            WHERE ((c.discovered_date >= incident.discovered_date::date
+                    AND c.discovered_date < incident.discovered_date::date + 1)
+                   OR (incident.discovered_date IS NULL AND c.discovered_date IS NULL))
+              AND c.sector_id IS NOT DISTINCT FROM incident.sector_id
+              AND c.severity IS NOT DISTINCT FROM incident.severity
+              AND c.status IS NOT DISTINCT FROM incident.status
+              AND c.source_id IS NOT DISTINCT FROM incident.source_id
+              AND c.apt_group_id IS NOT DISTINCT FROM incident.apt_group_id
+              AND c.geographical_location IS NOT DISTINCT FROM incident.geographical_location
+        ) WHERE id = rollup_id;
+    END IF;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION maintain_incident_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_incident_rollup(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_incident_rollup(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Recompute every rollup row from cyber_incidents (backfill); returns the number of rows written
+CREATE OR REPLACE FUNCTION rebuild_incident_rollups()
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    -- Block incident writes so no trigger delta is lost while rebuilding
+    LOCK TABLE cyber_incidents IN SHARE MODE;
+    DELETE FROM incident_daily_rollups;
+    INSERT INTO incident_daily_rollups (day, sector_id, severity, status, source_id, apt_group_id, location,
+                                        incident_count, critical_count, relevance_sum, last_incident_date)
+    SELECT discovered_date::date, sector_id, severity, status, source_id, apt_group_id, geographical_location,
+           count(*), count(*) FILTER (WHERE severity = 'critical'),
+           COALESCE(sum(relevance_score), 0), max(incident_date)
+    FROM cyber_incidents
+    GROUP BY discovered_date::date, sector_id, severity, status, source_id, apt_group_id, geographical_location;
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE TRIGGER maintain_incident_rollups
+    AFTER INSERT OR DELETE OR UPDATE OF discovered_date, sector_id, severity, status, source_id, apt_group_id,
+                                        geographical_location, relevance_score, incident_date
+    ON cyber_incidents FOR EACH ROW EXECUTE FUNCTION maintain_incident_rollups();
+
+-- Backfill; takes a share lock on cyber_incidents so no trigger delta is lost
+SELECT rebuild_incident_rollups() AS rollup_rows;
+
+COMMIT;
@@ -0,0 +1,31 @@
+-- Scrape jobs leased by distributed scrape workers (SELECT ... FOR UPDATE SKIP LOCKED)
+--
+-- Usage: psql cyber_intelligence < database/migrations/006_scrape_jobs.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    source_id UUID NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, succeeded, dead
+    trigger VARCHAR(20) NOT NULL DEFAULT 'scheduled', -- scheduled, manual
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    leased_by VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    result JSONB,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Ready jobs, expired leases, at most one active job per source
+CREATE INDEX IF NOT EXISTS idx_scrape_jobs_ready ON scrape_jobs(available_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_scrape_jobs_lease ON scrape_jobs(lease_expires_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_scrape_jobs_source_finished ON scrape_jobs(source_id, finished_at);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_scrape_jobs_active_source ON scrape_jobs(source_id) WHERE status IN ('queued', 'running');
+
+COMMIT;
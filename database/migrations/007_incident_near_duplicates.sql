@@ -0,0 +1,29 @@
+-- MinHash signatures on incidents and the near-duplicate reports linked to them.
+-- Incidents stored before this migration have no signature; fill them in
+-- afterwards with (from backend/) python -m database.backfill_minhash
+--
+-- Usage: psql cyber_intelligence < database/migrations/007_incident_near_duplicates.sql
+
+BEGIN;
+
+ALTER TABLE cyber_incidents ADD COLUMN IF NOT EXISTS minhash_signature BYTEA;
+
+CREATE TABLE IF NOT EXISTS incident_duplicates (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    canonical_incident_id UUID NOT NULL REFERENCES cyber_incidents(id) ON DELETE CASCADE,
+    source_id UUID REFERENCES sources(id) ON DELETE CASCADE,
+    title VARCHAR(500) NOT NULL,
+    url TEXT,
+    external_id VARCHAR(255),
+    similarity FLOAT NOT NULL,
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_incident_duplicates_report UNIQUE (canonical_incident_id, source_id, title)
+);
+
+-- Fingerprint and near-duplicate index catch-up; ingest dedup of linked reports
+CREATE INDEX IF NOT EXISTS idx_incidents_created ON cyber_incidents(created_at);
+CREATE INDEX IF NOT EXISTS idx_incident_duplicates_url ON incident_duplicates(url);
+CREATE INDEX IF NOT EXISTS idx_incident_duplicates_external_id ON incident_duplicates(external_id);
+CREATE INDEX IF NOT EXISTS idx_incident_duplicates_source_title ON incident_duplicates(source_id, title);
+
+COMMIT;
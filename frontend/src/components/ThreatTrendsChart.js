@@ -1,34 +1,64 @@
 import React from 'react';
-import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
+import { AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
+
+const SEVERITY_SERIES = [
+  { key: 'low', name: 'Low', color: '#82ca9d' },
+  { key: 'medium', name: 'Medium', color: '#8884d8' },
+  { key: 'high', name: 'High', color: '#ffc658' },
+  { key: 'critical', name: 'Critical', color: '#ff7300' }
+];
 
 const ThreatTrendsChart = ({ data }) => {
   if (!data || data.length === 0) {
     return <div>No trend data available</div>;
   }
 
+  // Stack the per-severity counts when the trend carries a breakdown
+  const hasBreakdown = data.some(item => item.severity_breakdown && Object.keys(item.severity_breakdown).length > 0);
+  const chartData = data.map(item => ({
+    date: item.date,
+    incident_count: item.incident_count,
+    ...(item.severity_breakdown || {})
+  }));
+
   return (
     <ResponsiveContainer width="100%" height={300}>
-      <LineChart data={data}>
+      <AreaChart data={chartData}>
         <CartesianGrid strokeDasharray="3 3" />
         <XAxis 
           dataKey="date"
           tickFormatter={(value) => new Date(value).toLocaleDateString()}
         />
-        <YAxis />
+        <YAxis allowDecimals={false} />
         <Tooltip 
           labelFormatter={(value) => new Date(value).toLocaleDateString()}
-          formatter={(value) => [value, 'Incidents']}
-        />
-        <Line 
-          type="monotone" 
-          dataKey="incident_count" 
-          stroke="#8884d8" 
-          strokeWidth={2}
-          dot={{ fill: '#8884d8' }}
+          formatter={(value, name) => [value, hasBreakdown ? name : 'Incidents']}
         />
-      </LineChart>
+        {hasBreakdown ? (
+          SEVERITY_SERIES.map(series => (
+            <Area
+              key={series.key}
+              type="monotone"
+              dataKey={series.key}
+              name={series.name}
+              stackId="severity"
+              stroke={series.color}
+              fill={series.color}
+            />
+          ))
+        ) : (
+          <Area 
+            type="monotone" 
+            dataKey="incident_count" 
+            stroke="#8884d8" 
+            fill="#8884d8"
+            strokeWidth={2}
+          />
+        )}
+        {hasBreakdown && <Legend />}
+      </AreaChart>
     </ResponsiveContainer>
   );
 };
 
-export default ThreatTrendsChart;
\ No newline at end of file
+export default ThreatTrendsChart;
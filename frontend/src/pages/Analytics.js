@@ -82,7 +82,8 @@ const Analytics = () => {
                 <ThreatTrendsChart 
                   data={trends.trends.map(item => ({
                     date: item.date,
-                    incident_count: item.count
+                    incident_count: item.count,
+                    severity_breakdown: item.severity_breakdown
                   }))} 
                 />
               )}
@@ -100,9 +100,9 @@ export const dashboardService = {
 };
 
 export const analyticsService = {
-  getIncidentTrends: async (days = 30, sectorId = null, severity = null) => {
+  getIncidentTrends: async (days = 30, sectorId = null, severity = null, bucket = 'day', bySector = false) => {
     const response = await apiClient.get('/analytics/trends', {
-      params: { days, sector_id: sectorId, severity }
+      params: { days, sector_id: sectorId, severity, bucket, by_sector: bySector }
     });
     return response.data;
   },